@@ -0,0 +1,42 @@
+from posts.feeds import decode_cursor, encode_cursor, merged_rows, older_than
+
+
+class FeedKeyset:
+    """Курсор по (created, id) от новых к старым, как в лентах постов."""
+
+    def after(self, queryset, cursor):
+        return older_than(queryset, *decode_cursor(cursor))
+
+    def rows(self, querysets, limit):
+        return merged_rows(querysets, limit)
+
+    def cursor(self, obj):
+        return encode_cursor(obj.created, obj.pk)
+
+
+class IdKeyset:
+    """Курсор по id по возрастанию для справочников."""
+
+    def after(self, queryset, cursor):
+        return queryset.filter(pk__gt=int(cursor))
+
+    def rows(self, querysets, limit):
+        queryset, = querysets
+        return queryset.order_by('pk')[:limit].iterator()
+
+    def cursor(self, obj):
+        return str(obj.pk)
+
+
+FEED = FeedKeyset()
+BY_ID = IdKeyset()
+
+
+def paginate(querysets, keyset, cursor, limit):
+    """Строки страницы и ещё одна сверх limit, если дальше что-то есть.
+
+    Испорченный курсор — ValueError.
+    """
+    if cursor:
+        querysets = [keyset.after(queryset, cursor) for queryset in querysets]
+    return keyset.rows(querysets, limit + 1)
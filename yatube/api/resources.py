@@ -0,0 +1,133 @@
+from operator import attrgetter
+
+from django.core.exceptions import ObjectDoesNotExist
+
+
+class Field:
+    """Поле ответа API: как получить значение и какие колонки оно читает.
+
+    related — связи для select_related, если значение берётся из них.
+    """
+
+    def __init__(self, value, *columns, related=()):
+        self.value = value
+        self.columns = columns
+        self.related = related
+
+
+def column(name):
+    return Field(attrgetter(name), name)
+
+
+def timestamp(name):
+    return Field(lambda obj: getattr(obj, name).isoformat(), name)
+
+
+def image_url(obj):
+    return obj.image.url if obj.image else None
+
+
+def follow_count(name):
+    """Счётчик подписок пользователя из FollowCounter, 0 без строки."""
+    def value(user):
+        try:
+            return getattr(user.follow_counter, name)
+        except ObjectDoesNotExist:
+            return 0
+    return Field(
+        value, f'follow_counter__{name}', related=('follow_counter',)
+    )
+
+
+class Resource:
+    """Поля ресурса API и их проекция на запрос к базе.
+
+    Параметр fields= выбирает поля ответа, а в запрос через only()
+    попадают только нужные им колонки и key_columns, по которым строится
+    курсор, так что, например, text без запроса не читается.
+    """
+
+    def __init__(self, fields, key_columns=()):
+        self.fields = fields
+        self.key_columns = key_columns
+
+    def select(self, param):
+        """Имена полей из fields=; ValueError на неизвестных."""
+        if not param:
+            return tuple(self.fields)
+        names = tuple(dict.fromkeys(param.split(',')))
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ValueError(f'Неизвестные поля: {", ".join(unknown)}')
+        return names
+
+    def project(self, queryset, names):
+        fields = [self.fields[name] for name in names]
+        related = {name for field in fields for name in field.related}
+        if related:
+            queryset = queryset.select_related(*related)
+        columns = {column for field in fields for column in field.columns}
+        return queryset.only(*self.key_columns, *columns)
+
+    def serialize(self, obj, names):
+        return {name: self.fields[name].value(obj) for name in names}
+
+
+POST = Resource(
+    {
+        'id': Field(attrgetter('pk')),
+        'text': column('text'),
+        'html': Field(
+            lambda post: post.rendered_text(), 'text', 'text_html'
+        ),
+        'created': timestamp('created'),
+        'author': column('author_id'),
+        'group': column('group_id'),
+        'image': Field(image_url, 'image'),
+        'views': column('views'),
+    },
+    key_columns=('created',),
+)
+
+COMMENT = Resource(
+    {
+        'id': Field(attrgetter('pk')),
+        'text': column('text'),
+        'html': Field(
+            lambda comment: comment.rendered_text(), 'text', 'text_html'
+        ),
+        'created': timestamp('created'),
+        'author': column('author_id'),
+        'post': column('post_id'),
+        'parent': column('parent_id'),
+        'depth': column('depth'),
+        'replies_count': column('replies_count'),
+    },
+    key_columns=('created',),
+)
+
+GROUP = Resource({
+    'id': Field(attrgetter('pk')),
+    'title': column('title'),
+    'slug': column('slug'),
+    'description': column('description'),
+})
+
+PROFILE = Resource({
+    'id': Field(attrgetter('pk')),
+    'username': column('username'),
+    'first_name': column('first_name'),
+    'last_name': column('last_name'),
+    'posts_count': Field(lambda user: user.posts.count()),
+    'followers_count': follow_count('followers'),
+    'following_count': follow_count('following'),
+})
+
+FOLLOW = Resource({
+    'id': Field(attrgetter('pk')),
+    'author': column('author_id'),
+    'username': Field(
+        attrgetter('author.username'), 'author', 'author__username',
+        related=('author',)
+    ),
+})
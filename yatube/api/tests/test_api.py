@@ -0,0 +1,256 @@
+import gzip
+import json
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpRequest, HttpResponse
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.tests.utils import use_shared_cache
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+def content(response):
+    if response.streaming:
+        return json.loads(b''.join(response.streaming_content))
+    return response.json()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Пост {number}', group=cls.group
+            )
+            for number in range(5)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_sparse_fields_are_not_loaded(self):
+        """fields= ограничивает и ответ, и колонки в запросе к базе."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('api:v1:posts'), {'fields': 'id,author'}
+            )
+        results = response.json()['results']
+        self.assertEqual(results[0], {
+            'id': self.posts[-1].pk, 'author': self.author.pk
+        })
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('"posts_post"."text"', sql)
+
+    def test_cursor_pagination(self):
+        """Страницы по курсору идут от новых к старым без повторов."""
+        url = reverse('api:v1:posts')
+        seen = []
+        cursor = ''
+        while True:
+            data = self.client.get(
+                url, {'limit': 2, 'cursor': cursor, 'fields': 'id'}
+            ).json()
+            seen += [post['id'] for post in data['results']]
+            cursor = data['next']
+            if cursor is None:
+                break
+        self.assertEqual(seen, [post.pk for post in reversed(self.posts)])
+
+    def test_resources(self):
+        """Группы, профили, комментарии и подписки отдаются в JSON."""
+        self.client.force_login(self.reader)
+        cases = {
+            reverse('api:v1:post', args=[self.posts[0].pk]): 'Пост 0',
+            reverse('api:v1:comments', args=[self.posts[0].pk]):
+                'Комментарий',
+            reverse('api:v1:groups'): 'Группа',
+            reverse('api:v1:group', args=['group']): 'Описание',
+            reverse('api:v1:group_posts', args=['group']): 'Пост 4',
+            reverse('api:v1:profile', args=['author']): '"posts_count":5',
+            reverse('api:v1:profile_posts', args=['author']): 'Пост 4',
+            reverse('api:v1:follows'): '"username":"author"',
+        }
+        for url, expected in cases.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(expected, response.content.decode())
+
+    def test_errors(self):
+        """Ошибки запроса отдаются в JSON с нужным статусом."""
+        cases = {
+            (reverse('api:v1:posts'), 'fields=id,secret'): 400,
+            (reverse('api:v1:posts'), 'cursor=bad'): 400,
+            (reverse('api:v1:posts'), 'limit=0'): 400,
+            (reverse('api:v1:post', args=[0]), ''): 404,
+            (reverse('api:v1:profile', args=['nobody']), ''): 404,
+            (reverse('api:v1:follows'), ''): 401,
+        }
+        for (url, query), status in cases.items():
+            with self.subTest(url=url, query=query):
+                response = self.client.get(f'{url}?{query}')
+                self.assertEqual(response.status_code, status)
+                self.assertIn('error', response.json())
+
+    def test_gzip_conditional_and_streaming(self):
+        """Ответы сжимаются, поддерживают 304, большие идут потоком."""
+        use_shared_cache(self)
+        url = reverse('api:v1:posts')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            json.loads(gzip.decompress(response.content))['results'][0]['id'],
+            self.posts[-1].pk,
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(url, {'limit': 500})
+        self.assertTrue(response.streaming)
+        self.assertEqual(len(content(response)['results']), 5)
+
+    def test_profile_etag_follows_following_count(self):
+        """Подписки самого профиля меняют ETag его страницы."""
+        use_shared_cache(self)
+        url = reverse('api:v1:profile', args=['reader'])
+        etag = self.client.get(url)['ETag']
+        Follow.objects.filter(user=self.reader).delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('"following_count":0', response.content.decode())
+
+
+class BatchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Post.objects.create(author=cls.author, text='Пост')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def batch(self, requests):
+        return self.client.post(
+            reverse('api:v1:batch'),
+            json.dumps({'requests': requests}),
+            content_type='application/json',
+        )
+
+    def test_batch_runs_sub_requests(self):
+        """Пакет возвращает ответы всех подзапросов одним JSON."""
+        data = self.batch({
+            'profile': '/api/v1/profiles/author/?fields=username,'
+                       'followers_count',
+            'posts': '/api/v1/profiles/author/posts/?fields=text',
+            'state': '/api/v1/follows/author/',
+            'missing': '/api/v1/profiles/nobody/',
+            'html': '/about/author/',
+        }).json()
+        self.assertEqual(data['profile'], {'status': 200, 'body': {
+            'username': 'author', 'followers_count': 1
+        }})
+        self.assertEqual(
+            data['posts']['body']['results'], [{'text': 'Пост'}]
+        )
+        self.assertEqual(data['state']['body'], {'following': True})
+        self.assertEqual(data['missing']['status'], 404)
+        self.assertEqual(data['html']['status'], 404)
+
+    def test_lookups_are_shared(self):
+        """Одинаковый поиск автора выполняется один раз на пакет."""
+        with CaptureQueriesContext(connection) as queries:
+            self.batch({
+                'profile': '/api/v1/profiles/author/',
+                'posts': '/api/v1/profiles/author/posts/',
+                'state': '/api/v1/follows/author/',
+            })
+        lookups = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith(
+                'SELECT "auth_user"."id" FROM "auth_user" WHERE '
+                '"auth_user"."username" = \'author\''
+            )
+        ]
+        self.assertEqual(len(lookups), 1)
+
+    def test_batch_ignores_conditional_headers(self):
+        """Условные заголовки пакета не доходят до подзапросов."""
+        response = self.client.post(
+            reverse('api:v1:batch'),
+            json.dumps({'requests': {'p': '/api/v1/profiles/author/'}}),
+            content_type='application/json',
+            HTTP_IF_MATCH='"nope"',
+            HTTP_IF_NONE_MATCH='*',
+            HTTP_IF_UNMODIFIED_SINCE='Thu, 01 Jan 1970 00:00:00 GMT',
+        )
+        data = response.json()
+        self.assertEqual(data['p']['status'], 200)
+        self.assertEqual(data['p']['body']['username'], 'author')
+
+    def test_batch_wraps_bodies_that_are_not_json(self):
+        """Тело не в JSON приходит строкой, пустое — null."""
+        responses = iter([
+            HttpResponse(status=304), HttpResponse('<p>Текст</p>'),
+        ])
+        match = mock.Mock(
+            func=lambda request: next(responses), args=(), kwargs={}
+        )
+        with mock.patch(
+            'api.views.sub_request', return_value=(HttpRequest(), match)
+        ):
+            data = self.batch({
+                'empty': '/api/v1/posts/', 'html': '/api/v1/posts/',
+            }).json()
+        self.assertEqual(data['empty'], {'status': 304, 'body': None})
+        self.assertEqual(
+            data['html'], {'status': 200, 'body': '<p>Текст</p>'}
+        )
+
+    def test_bad_batch(self):
+        """Неверное тело пакета — ошибка 400."""
+        response = self.client.post(
+            reverse('api:v1:batch'), 'nope', content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.batch(['/api/v1/posts/']).status_code, 400)
+
+    def test_bulk_follows(self):
+        """POST на подписки подписывает и отписывает списком."""
+        User.objects.create_user(username='other')
+        response = self.client.post(
+            reverse('api:v1:follows'),
+            json.dumps({'follow': ['author', 'other', 'nobody'],
+                        'unfollow': []}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.json(), {'follow': 1, 'unfollow': 0})
+        response = self.client.post(
+            reverse('api:v1:follows'),
+            json.dumps({'unfollow': ['author']}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.json(), {'follow': 0, 'unfollow': 1})
+        self.assertEqual(
+            list(Follow.objects.values_list('author__username', flat=True)),
+            ['other'],
+        )
@@ -0,0 +1,34 @@
+from django.urls import include, path
+
+from . import views
+
+app_name = 'api'
+
+v1_patterns = [
+    path('posts/', views.posts, name='posts'),
+    path('posts/trending/', views.trending, name='trending'),
+    path('posts/<int:post_id>/', views.post, name='post'),
+    path(
+        'posts/<int:post_id>/comments/', views.comments, name='comments'
+    ),
+    path('groups/', views.groups, name='groups'),
+    path('groups/<slug:slug>/', views.group, name='group'),
+    path(
+        'groups/<slug:slug>/posts/', views.group_posts, name='group_posts'
+    ),
+    path('profiles/<str:username>/', views.profile, name='profile'),
+    path(
+        'profiles/<str:username>/posts/',
+        views.profile_posts,
+        name='profile_posts'
+    ),
+    path('follows/', views.follows, name='follows'),
+    path(
+        'follows/<str:username>/', views.follow_state, name='follow_state'
+    ),
+    path('batch/', views.batch, name='batch'),
+]
+
+urlpatterns = [
+    path('v1/', include((v1_patterns, 'v1'))),
+]
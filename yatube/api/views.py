@@ -0,0 +1,409 @@
+import json
+from contextvars import ContextVar
+from functools import wraps
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import (HttpRequest, HttpResponse, JsonResponse, QueryDict,
+                         StreamingHttpResponse)
+from django.urls import Resolver404, resolve
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_GET, require_POST
+
+from core.pagecache import conditional_page
+from core.writequeue import execute_write
+from posts.follows import follow_many, unfollow_many
+from posts.graph import follow_graph
+from posts.models import Comment, Follow, Group, Post
+from posts.sharding import (author_querysets, load_posts, post_shard,
+                            shard_querysets)
+from posts.trending import trending_ids
+from posts.views import index_scopes, post_detail_scopes
+
+from . import resources
+from .pagination import BY_ID, FEED, paginate
+
+User = get_user_model()
+
+JSON = 'application/json'
+
+CHANGES = {'follow': follow_many, 'unfollow': unfollow_many}
+
+# Условные заголовки относятся к самому пакету: в подзапросах они дали
+# бы 304 или 412 без тела.
+SUB_REQUEST_SKIPPED_META = (
+    'HTTP_ACCEPT_ENCODING', 'CONTENT_LENGTH', 'HTTP_IF_MATCH',
+    'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE',
+    'HTTP_IF_UNMODIFIED_SINCE', 'HTTP_IF_RANGE',
+)
+
+batch_lookups = ContextVar('batch_lookups', default=None)
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def shared(func):
+    """Внутри пакетного запроса выполняет func один раз на аргументы.
+
+    Так подзапросы к одному автору или группе не повторяют одинаковые
+    запросы к базе.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        lookups = batch_lookups.get()
+        if lookups is None:
+            return func(*args, **kwargs)
+        key = (func, args, tuple(sorted(kwargs.items())))
+        if key not in lookups:
+            lookups[key] = func(*args, **kwargs)
+        return lookups[key]
+    return wrapper
+
+
+def api_view(get_scopes, login=False, max_age=None):
+    """Общая обвязка ресурса API.
+
+    Только GET, условные запросы по версиям областей get_scopes, gzip и
+    ответы об ошибках в JSON. С login=True гостям отвечает 401, max_age
+    передаётся в conditional_page для ответов, устаревающих по времени.
+    """
+    def decorator(view):
+        conditional = conditional_page(shared(get_scopes), max_age)(
+            gzip_page(view)
+        )
+
+        @require_GET
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                if login and not request.user.is_authenticated:
+                    raise ApiError(401, 'Нужно войти')
+                return conditional(request, *args, **kwargs)
+            except ApiError as error:
+                return JsonResponse(
+                    {'error': str(error)}, status=error.status,
+                    json_dumps_params={'ensure_ascii': False},
+                )
+        return wrapper
+    return decorator
+
+
+def select_fields(request, resource):
+    try:
+        return resource.select(request.GET.get('fields'))
+    except ValueError as error:
+        raise ApiError(400, str(error))
+
+
+def page_limit(request):
+    limit = request.GET.get('limit', '')
+    if not limit:
+        return settings.API_PAGE_SIZE
+    if not limit.isdigit() or not 0 < int(limit) <= settings.API_MAX_LIMIT:
+        raise ApiError(
+            400, f'limit должен быть от 1 до {settings.API_MAX_LIMIT}'
+        )
+    return int(limit)
+
+
+def render_list(resource, names, rows, limit, keyset):
+    """Куски JSON списка; строка сверх limit превращается в курсор next."""
+    yield '{"results":['
+    last = None
+    for index, obj in enumerate(rows):
+        if index == limit:
+            yield f'],"next":{dumps(keyset.cursor(last))}}}'
+            return
+        yield (',' if index else '') + dumps(resource.serialize(obj, names))
+        last = obj
+    yield '],"next":null}'
+
+
+def list_response(request, resource, querysets, keyset):
+    """Страница ресурса по курсору cursor= с полями fields=.
+
+    Страницы больше API_STREAM_FROM строк отдаются потоком, не собираясь
+    целиком в памяти.
+    """
+    names = select_fields(request, resource)
+    limit = page_limit(request)
+    querysets = [resource.project(queryset, names) for queryset in querysets]
+    try:
+        rows = paginate(querysets, keyset, request.GET.get('cursor'), limit)
+    except ValueError:
+        raise ApiError(400, 'Неверный курсор')
+    chunks = render_list(resource, names, rows, limit, keyset)
+    if limit > settings.API_STREAM_FROM:
+        return StreamingHttpResponse(chunks, content_type=JSON)
+    return HttpResponse(''.join(chunks), content_type=JSON)
+
+
+def detail_response(request, resource, queryset, **lookup):
+    names = select_fields(request, resource)
+    obj = resource.project(queryset, names).filter(**lookup).first()
+    if obj is None:
+        raise ApiError(404, 'Не найдено')
+    return HttpResponse(
+        dumps(resource.serialize(obj, names)), content_type=JSON
+    )
+
+
+def user_only_scopes(*args, **kwargs):
+    """Ответ зависит только от пользователя и его подписок."""
+    return ()
+
+
+def groups_scopes():
+    return ('groups',)
+
+
+@shared
+def get_author_id(username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    if author_id is None:
+        raise ApiError(404, 'Не найдено')
+    return author_id
+
+
+@shared
+def get_group_id(slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    if group_id is None:
+        raise ApiError(404, 'Не найдено')
+    return group_id
+
+
+def group_scopes(slug):
+    return (f'group:{get_group_id(slug)}',)
+
+
+def author_scopes(username):
+    return (f'author:{get_author_id(username)}',)
+
+
+def profile_scopes(username):
+    author_id = get_author_id(username)
+    return (
+        f'author:{author_id}', f'user:{author_id}', f'followers:{author_id}',
+        f'follows:{author_id}',
+    )
+
+
+@api_view(index_scopes)
+def posts(request):
+    return list_response(
+        request, resources.POST, shard_querysets(Post.objects.all()), FEED
+    )
+
+
+@api_view(index_scopes, max_age=settings.TRENDING_TIMEOUT)
+def trending(request):
+    """Популярные посты: просмотры, затухающие с возрастом поста."""
+    names = select_fields(request, resources.POST)
+    queryset = resources.POST.project(Post.objects.all(), names)
+    results = [
+        resources.POST.serialize(post, names)
+        for post in load_posts(queryset, trending_ids())
+    ]
+    return HttpResponse(dumps({'results': results}), content_type=JSON)
+
+
+@api_view(post_detail_scopes)
+def post(request, post_id):
+    return detail_response(
+        request, resources.POST, Post.objects.using(post_shard(post_id)),
+        pk=post_id,
+    )
+
+
+@api_view(post_detail_scopes)
+def comments(request, post_id):
+    queryset = Comment.objects.using(post_shard(post_id)).filter(
+        post_id=post_id
+    )
+    return list_response(request, resources.COMMENT, [queryset], FEED)
+
+
+@api_view(groups_scopes)
+def groups(request):
+    return list_response(
+        request, resources.GROUP, [Group.objects.all()], BY_ID
+    )
+
+
+@api_view(group_scopes)
+def group(request, slug):
+    return detail_response(
+        request, resources.GROUP, Group.objects.all(), slug=slug
+    )
+
+
+@api_view(group_scopes)
+def group_posts(request, slug):
+    queryset = Post.objects.filter(group_id=get_group_id(slug))
+    return list_response(
+        request, resources.POST, shard_querysets(queryset), FEED
+    )
+
+
+@api_view(profile_scopes)
+def profile(request, username):
+    return detail_response(
+        request, resources.PROFILE, User.objects.all(), username=username
+    )
+
+
+@api_view(author_scopes)
+def profile_posts(request, username):
+    querysets = author_querysets(
+        Post.objects.all(), [get_author_id(username)]
+    )
+    return list_response(request, resources.POST, querysets, FEED)
+
+
+@api_view(user_only_scopes, login=True)
+def follow_list(request):
+    return list_response(
+        request,
+        resources.FOLLOW,
+        [Follow.objects.filter(user=request.user)],
+        BY_ID,
+    )
+
+
+@require_POST
+def change_follows(request):
+    """Массовая подписка и отписка по спискам имён follow и unfollow."""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Нужно войти'}, status=401)
+    try:
+        data = json.loads(request.body)
+        names = {key: list(data.get(key, [])) for key in CHANGES}
+        if not all(
+            isinstance(name, str) for key in CHANGES for name in names[key]
+        ):
+            raise ValueError
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'error': 'Неверный запрос'}, status=400)
+    ids = dict(User.objects.filter(
+        username__in=names['follow'] + names['unfollow']
+    ).values_list('username', 'pk'))
+    changed = {}
+    for key, change in CHANGES.items():
+        author_ids = [ids[name] for name in names[key] if name in ids]
+        changed[key] = len(
+            execute_write(change, request.user.pk, author_ids)
+        )
+    return JsonResponse(changed)
+
+
+def follows(request):
+    """GET — подписки пользователя, POST — массовая подписка и отписка."""
+    if request.method == 'POST':
+        return change_follows(request)
+    return follow_list(request)
+
+
+@api_view(user_only_scopes, login=True)
+def follow_state(request, username):
+    following = follow_graph.is_following(
+        request.user.pk, get_author_id(username)
+    )
+    return HttpResponse(dumps({'following': following}), content_type=JSON)
+
+
+def sub_request(request, path):
+    """GET-подзапрос пакета к JSON API с сессией и пользователем пакета."""
+    url = urlsplit(path)
+    match = resolve(url.path)
+    if match.namespaces != ['api', 'v1'] or match.url_name == 'batch':
+        raise Resolver404(path)
+    sub = HttpRequest()
+    sub.method = 'GET'
+    sub.path = sub.path_info = url.path
+    sub.META = {
+        key: value for key, value in request.META.items()
+        if key not in SUB_REQUEST_SKIPPED_META
+    }
+    sub.META.update(
+        REQUEST_METHOD='GET', PATH_INFO=url.path, QUERY_STRING=url.query
+    )
+    sub.GET = QueryDict(url.query)
+    sub.COOKIES = request.COOKIES
+    sub.session = request.session
+    sub.user = request.user
+    sub.resolver_match = match
+    return sub, match
+
+
+def run_sub_request(request, path):
+    """Статус и тело ответа подзапроса в виде готового JSON.
+
+    Тело JSON вставляется как есть, пустое тело становится null, а
+    любое другое — строкой JSON.
+    """
+    try:
+        sub, match = sub_request(request, path)
+    except Resolver404:
+        return 404, dumps({'error': 'Неизвестный адрес'})
+    response = match.func(sub, *match.args, **match.kwargs)
+    if response.streaming:
+        body = b''.join(response.streaming_content)
+    else:
+        body = response.content
+    if not body:
+        return response.status_code, 'null'
+    body = body.decode(response.charset, errors='replace')
+    if response.get('Content-Type', '').split(';')[0] != JSON:
+        return response.status_code, dumps(body)
+    return response.status_code, body
+
+
+@csrf_exempt
+@require_POST
+@gzip_page
+def batch(request):
+    """Выполняет несколько GET-запросов к API за один круг.
+
+    Тело — {"requests": {"имя": "/api/v1/..."}}, ответ —
+    {"имя": {"status": ..., "body": ...}}. Подзапросы идут по очереди
+    через одно соединение с базой, а одинаковые поиски автора, группы
+    и областей версий выполняются один раз на весь пакет. Подзапросы
+    только читают, поэтому пакет не требует CSRF-токена.
+    """
+    try:
+        paths = json.loads(request.body)['requests']
+        if not isinstance(paths, dict) or not all(
+            isinstance(path, str) for path in paths.values()
+        ):
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Неверный пакет'}, status=400)
+    if len(paths) > settings.API_BATCH_LIMIT:
+        return JsonResponse(
+            {'error': f'Не больше {settings.API_BATCH_LIMIT} запросов'},
+            status=400,
+        )
+    token = batch_lookups.set({})
+    try:
+        parts = []
+        for name, path in paths.items():
+            status, body = run_sub_request(request, path)
+            parts.append(
+                f'{dumps(name)}:{{"status":{status},"body":{body}}}'
+            )
+    finally:
+        batch_lookups.reset(token)
+    return HttpResponse('{' + ','.join(parts) + '}', content_type=JSON)
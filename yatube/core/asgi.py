@@ -0,0 +1,217 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qsl
+
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import caches
+from django.db import close_old_connections
+from django.urls import Resolver404, resolve
+from django.utils.encoding import escape_uri_path, iri_to_uri
+from django.utils.module_loading import import_string
+
+from .pagecache import is_guest_request, page_key
+
+_executor = None
+
+
+def get_executor():
+    """Общий пул из ASGI_THREADS потоков для синхронного кода."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.ASGI_THREADS, thread_name_prefix='asgi'
+        )
+    return _executor
+
+
+async def run_in_pool(func, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(
+        get_executor(), partial(func, *args, **kwargs)
+    )
+
+
+class PathRouter:
+    """ASGI-приложение, выбирающее обработчик по префиксу пути.
+
+    Запросы, не попавшие ни в один префикс, уходят в default — обычно
+    это Django, обёрнутый из WSGI.
+    """
+
+    def __init__(self, routes, default):
+        self.routes = sorted(routes.items(), key=lambda item: -len(item[0]))
+        self.default = default
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        for prefix, app in self.routes:
+            if scope['type'] == 'http' and scope['path'].startswith(prefix):
+                return await app(scope, receive, send)
+        return await self.default(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def query_params(scope):
+    return dict(parse_qsl(scope.get('query_string', b'').decode()))
+
+
+def header(scope, name):
+    name = name.lower().encode()
+    for key, value in scope.get('headers', ()):
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def database_sync_to_async(func):
+    """Выполняет функцию с ORM в общем пуле, закрывая старые соединения."""
+    def call(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    async def wrapper(*args, **kwargs):
+        return await run_in_pool(call, *args, **kwargs)
+    return wrapper
+
+
+@database_sync_to_async
+def get_user_id(scope):
+    """id пользователя по сессионной cookie запроса или None."""
+    cookie = SimpleCookie(header(scope, 'cookie') or '')
+    morsel = cookie.get(settings.SESSION_COOKIE_NAME)
+    if morsel is None:
+        return None
+    engine = import_string(f'{settings.SESSION_ENGINE}.SessionStore')
+    user_id = engine(morsel.value).get(SESSION_KEY)
+    return int(user_id) if user_id is not None else None
+
+
+async def send_response(send, status, body=b'', content_type='text/plain'):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', f'{content_type}; charset=utf-8'.encode()),
+            (b'cache-control', b'no-cache'),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class AsyncCache:
+    """Асинхронный клиент кеша Django поверх общего пула потоков."""
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    async def get(self, key, default=None):
+        return await run_in_pool(caches[self.alias].get, key, default)
+
+    async def get_many(self, keys):
+        return await run_in_pool(caches[self.alias].get_many, keys)
+
+    async def set(self, key, value, timeout=None):
+        await run_in_pool(caches[self.alias].set, key, value, timeout)
+
+
+class PooledWsgiToAsgiInstance(WsgiToAsgiInstance):
+    async def run_wsgi_app(self, body):
+        # asgiref выполняет все WSGI-вызовы в одном общем потоке, поэтому
+        # исходная синхронная функция запускается в нашем пуле.
+        run_wsgi_app = WsgiToAsgiInstance.__dict__['run_wsgi_app'].func
+        await run_in_pool(run_wsgi_app, self, body)
+
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    """Django из WSGI, запросы которого выполняются в пуле ASGI_THREADS."""
+
+    async def __call__(self, scope, receive, send):
+        await PooledWsgiToAsgiInstance(self.wsgi_application)(
+            scope, receive, send
+        )
+
+
+def full_path(scope):
+    """То же, что request.get_full_path() для ASGI-запроса."""
+    path = escape_uri_path(scope['path'])
+    query_string = scope.get('query_string', b'').decode('latin-1')
+    return f'{path}?{iri_to_uri(query_string)}' if query_string else path
+
+
+class GuestPageCache:
+    """Отдаёт гостям готовые страницы из кеша страниц без Django.
+
+    Для адреса представления с cache_page_with_holes области версий
+    считаются в пуле потоков, а страница читается асинхронным клиентом
+    кеша. Запросы с сессией, условные запросы и промахи уходят в app.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.cache = AsyncCache()
+
+    async def __call__(self, scope, receive, send):
+        page = await self.cached_page(scope)
+        if page is None:
+            return await self.app(scope, receive, send)
+        content, content_type = page
+        body = content.encode()
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', content_type.encode()),
+                (b'content-length', str(len(body)).encode()),
+                (b'vary', b'Cookie'),
+            ],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': b'' if scope['method'] == 'HEAD' else body,
+        })
+
+    async def cached_page(self, scope):
+        cookies = SimpleCookie(header(scope, 'cookie') or '')
+        if (
+            scope['type'] != 'http'
+            or scope['method'] not in ('GET', 'HEAD')
+            or not settings.PAGE_CACHE_TIMEOUT
+            or header(scope, 'if-none-match')
+            or header(scope, 'if-modified-since')
+            or not is_guest_request(cookies)
+        ):
+            return None
+        try:
+            match = resolve(scope['path'])
+        except Resolver404:
+            return None
+        page_cache = getattr(match.func, 'page_cache', None)
+        if page_cache is None:
+            return None
+        key = await database_sync_to_async(self.guest_key)(
+            scope, page_cache[0], match.args, match.kwargs
+        )
+        if key is None:
+            return None
+        return await self.cache.get(key)
+
+    def guest_key(self, scope, get_scopes, args, kwargs):
+        scopes = get_scopes(*args, **kwargs)
+        if scopes is None:
+            return None
+        return page_key(full_path(scope), scopes, guest=True)
@@ -0,0 +1,106 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections
+
+from core.metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+_counters = []
+
+
+class BufferedCounter:
+    """Счётчики в памяти процесса, которые пачками сбрасываются в базу.
+
+    incr() только прибавляет к словарю под блокировкой. Раз в
+    COUNTER_FLUSH_SECONDS фоновый поток из start() забирает всё
+    накопленное и передаёт flush_func одним словарем {ключ: приращение};
+    flush_func прибавляет приращения к значениям в базе, поэтому
+    процессы со своими буферами не мешают друг другу. В процессах без
+    потока, например в командах, сброс делает incr(), заставший
+    истёкший интервал. Если запись не удалась, приращения возвращаются
+    в буфер, а остаток сбрасывается при завершении процесса.
+    """
+
+    def __init__(self, flush_func, interval=None):
+        self.flush_func = flush_func
+        self.interval = interval
+        self.metrics = Metrics()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = Counter()
+        self._flushed_at = time.monotonic()
+        self._timer = None
+        _counters.append(self)
+        atexit.register(self.flush)
+
+    def get_interval(self):
+        if self.interval is None:
+            return settings.COUNTER_FLUSH_SECONDS
+        return self.interval
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            self._pending[key] += amount
+        if time.monotonic() - self._flushed_at >= self.get_interval():
+            self.flush()
+
+    def start(self):
+        """Запускает поток, сбрасывающий счётчики по таймеру."""
+        if self._timer is None:
+            self._timer = threading.Thread(
+                target=self._run, name='counter-flush', daemon=True
+            )
+            self._timer.start()
+
+    def _run(self):
+        while True:
+            time.sleep(max(self.get_interval(), 0.1))
+            try:
+                self.flush()
+            finally:
+                connections.close_all()
+
+    def pending(self, key):
+        """Ещё не записанное в базу приращение ключа."""
+        with self._lock:
+            return self._pending.get(key, 0)
+
+    def flush(self):
+        """Записывает накопленное; сброс идёт в одном потоке за раз."""
+        if not self._flush_lock.acquire(blocking=False):
+            return 0
+        try:
+            with self._lock:
+                pending, self._pending = self._pending, Counter()
+                self._flushed_at = time.monotonic()
+            if not pending:
+                return 0
+            started = time.monotonic()
+            try:
+                self.flush_func(dict(pending))
+            except Exception:
+                logger.exception('Не удалось записать счётчики')
+                with self._lock:
+                    self._pending.update(pending)
+                return 0
+            self.metrics.timing('flush', time.monotonic() - started)
+            self.metrics.incr('flushed_keys', len(pending))
+            return sum(pending.values())
+        finally:
+            self._flush_lock.release()
+
+
+def start_flushing():
+    """Запускает сброс по таймеру для всех счётчиков процесса.
+
+    Вызывается из точек входа WSGI и ASGI: в тестах и командах потоков
+    нет, и запись в базу идёт только из их собственного потока.
+    """
+    for counter in _counters:
+        counter.start()
@@ -0,0 +1,26 @@
+from django.db import transaction
+
+
+class AtomicWrite(transaction.Atomic):
+    """atomic(), чья внешняя транзакция в SQLite начинается с BEGIN IMMEDIATE.
+
+    Флаг соединения читает бэкенд core.db.backends.sqlite3 при открытии
+    транзакции; другие бэкенды его не замечают.
+    """
+
+    def __enter__(self):
+        connection = transaction.get_connection(self.using)
+        connection.begin_immediate = True
+        try:
+            super().__enter__()
+        finally:
+            connection.begin_immediate = False
+
+
+def atomic_write(using=None):
+    """Транзакция для блоков, которые пишут в базу.
+
+    Блокировка на запись берётся сразу, где её можно дождаться и
+    повторить. Читающие транзакции остаются DEFERRED и не ждут писателей.
+    """
+    return AtomicWrite(using, savepoint=True)
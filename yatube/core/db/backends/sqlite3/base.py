@@ -0,0 +1,105 @@
+"""SQLite с WAL, настроенными PRAGMA и повтором при блокировке.
+
+Подключается через ENGINE = 'core.db.backends.sqlite3'. Значения PRAGMA
+берутся из ключа PRAGMAS настроек базы и дополняют DEFAULT_PRAGMAS.
+"""
+import random
+import time
+
+from django.db.backends.sqlite3 import base
+from django.db.backends.sqlite3.base import Database
+
+from core.metrics import Metrics
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+LOCK_RETRIES = 5
+
+LOCK_RETRY_DELAY = 0.05
+
+lock_metrics = Metrics()
+
+
+def apply_pragmas(connection, pragmas):
+    """Выполняет PRAGMA на соединении sqlite3."""
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name} = {value}')
+
+
+def is_locked_error(error):
+    message = str(error)
+    return 'database is locked' in message or 'database is busy' in message
+
+
+def retry_on_lock(func, *args, retries=LOCK_RETRIES, delay=LOCK_RETRY_DELAY):
+    """Вызывает func, повторяя с экспоненциальной задержкой при блокировке.
+
+    Время ожидания и число повторов попадают в lock_metrics.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return func(*args)
+        except Database.OperationalError as error:
+            if not is_locked_error(error) or attempt == retries:
+                if is_locked_error(error):
+                    lock_metrics.incr('lock_failures')
+                raise
+            pause = delay * 2 ** attempt * random.uniform(0.5, 1.5)
+            lock_metrics.incr('lock_retries')
+            lock_metrics.timing('lock_wait', pause)
+            time.sleep(pause)
+
+
+class RetryingCursorWrapper(base.SQLiteCursorWrapper):
+    """Курсор, повторяющий запрос при блокировке базы.
+
+    Внутри транзакции запрос не повторяется: SQLite не продвигает
+    устаревший снимок, и повтор только продлит ожидание.
+    """
+
+    def execute(self, query, params=None):
+        if self.connection.in_transaction:
+            return super().execute(query, params)
+        return retry_on_lock(super().execute, query, params)
+
+    def executemany(self, query, param_list):
+        if self.connection.in_transaction:
+            return super().executemany(query, param_list)
+        return retry_on_lock(super().executemany, query, param_list)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # Выставляется core.db.atomic_write на время открытия транзакции.
+    begin_immediate = False
+
+    @property
+    def pragmas(self):
+        return {**DEFAULT_PRAGMAS, **self.settings_dict.get('PRAGMAS', {})}
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        apply_pragmas(conn, self.pragmas)
+        return conn
+
+    def create_cursor(self, name=None):
+        return self.connection.cursor(factory=RetryingCursorWrapper)
+
+    def _start_transaction_under_autocommit(self):
+        """Начинает транзакцию; пишущую — сразу с блокировкой на запись.
+
+        С BEGIN IMMEDIATE блокировка берётся в начале транзакции, где
+        её можно дождаться и повторить, а не на первой записи, где
+        SQLite сразу возвращает ошибку. Читающим транзакциям она не
+        нужна, поэтому без atomic_write остаётся обычный BEGIN.
+        """
+        if self.begin_immediate:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        else:
+            self.cursor().execute('BEGIN')
@@ -0,0 +1,48 @@
+import re
+from urllib.parse import parse_qsl, urlencode
+
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+HOLE_RE = re.compile(r'<!--hole:(?P<name>[\w-]+):(?P<args>[^<>]*?)-->')
+
+_holes = {}
+
+
+def register(name, template, guest_cache=True):
+    """Регистрирует «дырку» — часть страницы, своя для каждого пользователя.
+
+    Декорируемая функция получает request и аргументы дырки строками и
+    возвращает контекст для template. Дырка с guest_cache=False должна
+    выполняться на каждый запрос, и страница с ней не попадает в кеш
+    готовых страниц гостей.
+    """
+    def decorator(func):
+        _holes[name] = (template, func, guest_cache)
+        return func
+    return decorator
+
+
+def render_hole(request, name, kwargs):
+    template, func, guest_cache = _holes[name]
+    if not guest_cache:
+        request.skip_guest_cache = True
+    return render_to_string(template, func(request, **kwargs), request)
+
+
+def hole_marker(name, kwargs):
+    return mark_safe(f'<!--hole:{name}:{urlencode(kwargs)}-->')
+
+
+def fill_holes(request, content):
+    """Заменяет метки дырок в закешированной странице их содержимым."""
+    return HOLE_RE.sub(
+        lambda match: render_hole(
+            request, match['name'],
+            dict(parse_qsl(match['args'], keep_blank_values=True)),
+        ),
+        content,
+    )
+
+
+register('header', 'includes/header.html')(lambda request: {})
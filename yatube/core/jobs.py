@@ -0,0 +1,104 @@
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from core.db import atomic_write
+
+logger = logging.getLogger(__name__)
+
+JOB_TIMEOUT = 60 * 60 * 24
+
+_executors = {}
+_lock = threading.Lock()
+
+
+def get_executor(name='batch-job', workers=None):
+    """Пул потоков name; по умолчанию — BACKGROUND_JOBS_WORKERS потоков.
+
+    У раскладки лент свой пул, чтобы долгая задача админки её не
+    задерживала.
+    """
+    with _lock:
+        if name not in _executors:
+            _executors[name] = ThreadPoolExecutor(
+                max_workers=workers or settings.BACKGROUND_JOBS_WORKERS,
+                thread_name_prefix=name,
+            )
+        return _executors[name]
+
+
+def job_key(job_id):
+    return f'job:{job_id}'
+
+
+def get_progress(job_id):
+    """Возвращает состояние задачи или None, если задача неизвестна."""
+    return cache.get(job_key(job_id))
+
+
+def _save(job_id, **progress):
+    cache.set(job_key(job_id), progress, JOB_TIMEOUT)
+
+
+def _run(job_id, name, ids, handler, batch_size):
+    done = 0
+    try:
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            with atomic_write():
+                handler(batch)
+            done += len(batch)
+            _save(
+                job_id, name=name, total=len(ids), done=done,
+                status='running'
+            )
+        _save(job_id, name=name, total=len(ids), done=done, status='done')
+    except Exception:
+        logger.exception('Фоновая задача %s (%s) упала', name, job_id)
+        _save(job_id, name=name, total=len(ids), done=done, status='failed')
+    finally:
+        if not settings.BACKGROUND_JOBS_EAGER:
+            connections.close_all()
+
+
+def run_in_batches(name, ids, handler, batch_size=None):
+    """Запускает обработку ids пакетами в фоновом потоке.
+
+    Каждый пакет обрабатывается handler(batch) в отдельной транзакции,
+    поэтому другие писатели не блокируются надолго. Прогресс хранится
+    в кеше и доступен через get_progress(job_id).
+    """
+    ids = list(ids)
+    batch_size = batch_size or settings.BULK_ACTION_BATCH_SIZE
+    job_id = uuid.uuid4().hex
+    _save(job_id, name=name, total=len(ids), done=0, status='queued')
+    if settings.BACKGROUND_JOBS_EAGER:
+        _run(job_id, name, ids, handler, batch_size)
+    else:
+        get_executor().submit(_run, job_id, name, ids, handler, batch_size)
+    return job_id
+
+
+def _call(func, args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Фоновая задача %s упала', func.__name__)
+    finally:
+        connections.close_all()
+
+
+def run_later(pool, workers, func, *args):
+    """Выполняет func(*args) в пуле pool из workers потоков.
+
+    С BACKGROUND_JOBS_EAGER вызов идёт сразу в текущем потоке.
+    """
+    if settings.BACKGROUND_JOBS_EAGER:
+        func(*args)
+    else:
+        get_executor(pool, workers).submit(_call, func, args)
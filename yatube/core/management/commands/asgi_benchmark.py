@@ -0,0 +1,193 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.test import RequestFactory, override_settings
+
+from core.asgi import GuestPageCache, PooledWsgiToAsgi
+from posts.live import live_posts
+
+CLIENT_ADDR = '10.0.0.1'
+
+
+def rss_kb():
+    """Текущий RSS процесса в КБ или 0, если /proc недоступен."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+class PeakUsage:
+    """Фоново замеряет пиковый прирост RSS и число потоков в блоке with."""
+
+    def __init__(self):
+        self.memory = 0
+        self.threads = 0
+        self._stop = threading.Event()
+
+    def sample(self):
+        while not self._stop.wait(0.02):
+            self.memory = max(self.memory, rss_kb() - self.base)
+            self.threads = max(self.threads, threading.active_count())
+
+    def __enter__(self):
+        self.base = rss_kb()
+        self._thread = threading.Thread(target=self.sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def with_latency(application, latency):
+    """WSGI-приложение, которое ждёт latency секунд, как медленная БД."""
+    def wrapper(environ, start_response):
+        time.sleep(latency)
+        return application(environ, start_response)
+    return wrapper
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает WSGI- и ASGI-развёртывание при одинаковой нагрузке '
+        'гостей и одинаковой задержке бэкенда: запросы в секунду, '
+        'задержку, прирост памяти и число потоков. Кеш страниц на время '
+        'замера включается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/')
+        parser.add_argument(
+            '--clients', type=int, default=32,
+            help='Одновременных клиентов (и потоков WSGI-сервера).'
+        )
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument(
+            '--latency', type=float, default=0.02,
+            help='Задержка бэкенда на каждый запрос в Django, в секундах.'
+        )
+        parser.add_argument(
+            '--idle', type=int, default=500,
+            help='Открытых соединений живой ленты на время замера.'
+        )
+
+    def run_wsgi(self, application, path, clients, requests, idle):
+        factory = RequestFactory()
+        release = threading.Event()
+        # Потоковый WSGI-сервер держит по потоку на открытое соединение.
+        idle_threads = [
+            threading.Thread(target=release.wait, daemon=True)
+            for _ in range(idle)
+        ]
+        for thread in idle_threads:
+            thread.start()
+
+        def call(_):
+            environ = factory.get(path, REMOTE_ADDR=CLIENT_ADDR).environ
+            started = time.monotonic()
+            b''.join(application(environ, lambda *args: None))
+            return time.monotonic() - started
+
+        try:
+            with ThreadPoolExecutor(max_workers=clients) as pool:
+                return list(pool.map(call, range(requests)))
+        finally:
+            release.set()
+
+    def run_asgi(self, application, path, clients, requests, idle):
+        async def call(scope, semaphore):
+            async with semaphore:
+                sent = asyncio.Event()
+
+                async def receive():
+                    return {'type': 'http.request', 'body': b''}
+
+                async def send(message):
+                    if message['type'] == 'http.response.body':
+                        if not message.get('more_body'):
+                            sent.set()
+
+                started = time.monotonic()
+                await application(scope, receive, send)
+                await sent.wait()
+                return time.monotonic() - started
+
+        async def main():
+            release = asyncio.Event()
+
+            async def receive_idle():
+                await release.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send_idle(message):
+                pass
+
+            idle_tasks = [
+                asyncio.ensure_future(live_posts(
+                    self.scope('/live/posts/'), receive_idle, send_idle
+                ))
+                for _ in range(idle)
+            ]
+            semaphore = asyncio.Semaphore(clients)
+            tasks = [
+                call(self.scope(path), semaphore) for _ in range(requests)
+            ]
+            try:
+                return await asyncio.gather(*tasks)
+            finally:
+                release.set()
+                await asyncio.gather(*idle_tasks)
+
+        return asyncio.run(main())
+
+    def scope(self, path):
+        return {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': 'GET',
+            'path': path,
+            'query_string': b'',
+            'root_path': '',
+            'headers': [(b'host', b'localhost')],
+            'client': (CLIENT_ADDR, 0),
+            'server': ('localhost', 80),
+        }
+
+    def report(self, title, latencies, elapsed, usage):
+        latencies = sorted(latencies)
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        self.stdout.write(
+            f'{title}: {len(latencies) / elapsed:.0f} запросов/с, '
+            f'задержка p50 {statistics.median(latencies) * 1000:.1f} мс, '
+            f'p95 {p95 * 1000:.1f} мс, прирост RSS {usage.memory / 1024:.1f} '
+            f'МБ, потоков до {usage.threads}'
+        )
+
+    def handle(self, *args, **options):
+        wsgi = with_latency(get_wsgi_application(), options['latency'])
+        modes = (
+            ('WSGI', self.run_wsgi, wsgi),
+            ('ASGI', self.run_asgi, GuestPageCache(PooledWsgiToAsgi(wsgi))),
+        )
+        with override_settings(PAGE_CACHE_TIMEOUT=60):
+            for title, run, application in modes:
+                run(application, options['path'], 1, 1, 0)
+                with PeakUsage() as usage:
+                    started = time.monotonic()
+                    latencies = run(
+                        application, options['path'], options['clients'],
+                        options['requests'], options['idle'],
+                    )
+                    elapsed = time.monotonic() - started
+                self.report(title, latencies, elapsed, usage)
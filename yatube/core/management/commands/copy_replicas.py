@@ -0,0 +1,59 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.routers import set_replica_position
+
+
+class Command(BaseCommand):
+    help = (
+        'Имитирует репликацию: периодически копирует основную SQLite-базу '
+        'в файлы реплик из REPLICA_DATABASES.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Задержка репликации в секундах.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Скопировать один раз и выйти.'
+        )
+
+    def copy(self):
+        # Всё, что закоммичено до начала копирования, попадёт в реплики.
+        position = int(time.time() * 1_000_000)
+        primary = sqlite3.connect(
+            connections['default'].settings_dict['NAME']
+        )
+        try:
+            for alias in settings.REPLICA_DATABASES:
+                replica = sqlite3.connect(
+                    connections[alias].settings_dict['NAME']
+                )
+                with replica:
+                    primary.backup(replica)
+                replica.close()
+                set_replica_position(alias, position)
+        finally:
+            primary.close()
+
+    def handle(self, *args, **options):
+        if not settings.REPLICA_DATABASES:
+            raise CommandError(
+                'Реплики не настроены, задайте переменную DATABASE_REPLICAS.'
+            )
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('Копирование поддерживается только для SQLite.')
+        while True:
+            self.copy()
+            self.stdout.write(
+                f'Скопировано в {", ".join(settings.REPLICA_DATABASES)}'
+            )
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,87 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.db.backends.sqlite3.base import (DEFAULT_PRAGMAS, apply_pragmas,
+                                           is_locked_error, lock_metrics,
+                                           retry_on_lock)
+
+SCHEMA = (
+    'CREATE TABLE post ('
+    'id INTEGER PRIMARY KEY AUTOINCREMENT, author_id INTEGER, text TEXT)'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест записи в SQLite: сравнивает пропускную '
+        'способность стандартного журнала и настроек core-бэкенда.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=500)
+
+    def run_mode(self, path, pragmas, retry, threads, writes):
+        with sqlite3.connect(path) as connection:
+            apply_pragmas(connection, pragmas)
+            connection.execute(SCHEMA)
+        errors = []
+        lock_metrics.reset()
+
+        def writer(number):
+            connection = sqlite3.connect(path, isolation_level=None)
+            apply_pragmas(connection, pragmas)
+            for index in range(writes):
+                statement = (
+                    'INSERT INTO post (author_id, text) VALUES (?, ?)',
+                    (number, f'Пост {index} автора {number}'),
+                )
+                try:
+                    if retry:
+                        retry_on_lock(connection.execute, *statement)
+                    else:
+                        connection.execute(*statement)
+                except sqlite3.OperationalError as error:
+                    if not is_locked_error(error):
+                        raise
+                    errors.append(error)
+            connection.close()
+
+        workers = [
+            threading.Thread(target=writer, args=(number,))
+            for number in range(threads)
+        ]
+        started = time.monotonic()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.monotonic() - started
+        with sqlite3.connect(path) as connection:
+            written = connection.execute(
+                'SELECT COUNT(*) FROM post'
+            ).fetchone()[0]
+        return written, elapsed, len(errors), lock_metrics.snapshot()
+
+    def handle(self, *args, **options):
+        modes = (
+            ('по умолчанию', {'journal_mode': 'DELETE'}, False),
+            ('core.db.backends.sqlite3', DEFAULT_PRAGMAS, True),
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for number, (title, pragmas, retry) in enumerate(modes):
+                path = os.path.join(directory, f'load_{number}.sqlite3')
+                written, elapsed, errors, metrics = self.run_mode(
+                    path, pragmas, retry,
+                    options['threads'], options['writes']
+                )
+                self.stdout.write(
+                    f'{title}: записано {written} строк за {elapsed:.2f} с '
+                    f'({written / elapsed:.0f} записей/с), '
+                    f'ошибок блокировки {errors}, метрики {metrics}'
+                )
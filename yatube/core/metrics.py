@@ -0,0 +1,29 @@
+import threading
+from collections import defaultdict
+
+
+class Metrics:
+    """Потокобезопасные счётчики и суммарные длительности в процессе."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(int)
+        self._timings = defaultdict(float)
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def timing(self, name, seconds):
+        with self._lock:
+            self._counters[f'{name}_count'] += 1
+            self._timings[f'{name}_seconds'] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {**self._counters, **self._timings}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
@@ -0,0 +1,40 @@
+from django.conf import settings
+
+from .routers import primary_written, replica_reads
+
+
+class ReplicaPinningMiddleware:
+    """Разрешает чтение из реплик и закрепляет писавших за основной базой.
+
+    После записи пользователь получает cookie на REPLICA_PIN_SECONDS и всё
+    это время читает из основной базы, поэтому видит свои посты и
+    комментарии, даже если реплика отстаёт.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        written = primary_written.set(False)
+        reads = replica_reads.set(False)
+        try:
+            response = self.get_response(request)
+            if primary_written.get():
+                response.set_cookie(
+                    settings.REPLICA_PIN_COOKIE,
+                    '1',
+                    max_age=settings.REPLICA_PIN_SECONDS,
+                    httponly=True,
+                )
+            return response
+        finally:
+            primary_written.reset(written)
+            replica_reads.reset(reads)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        replica_reads.set(
+            request.method in ('GET', 'HEAD')
+            and settings.REPLICA_PIN_COOKIE not in request.COOKIES
+            and request.resolver_match.view_name
+            in settings.REPLICA_READ_VIEWS
+        )
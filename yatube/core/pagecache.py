@@ -0,0 +1,167 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import condition
+
+from .holes import fill_holes
+from .routers import replica_fresh
+from .versioning import get_versions, make_key, versions_shared
+
+
+def page_key(full_path, scopes, guest=False):
+    """Ключ общей страницы или, при guest=True, готовой страницы гостя."""
+    path = hashlib.md5(full_path.encode()).hexdigest()
+    prefix = 'guest-page' if guest else 'page'
+    return make_key(f'{prefix}:{path}', *scopes)
+
+
+def is_guest_request(cookies):
+    return settings.SESSION_COOKIE_NAME not in cookies
+
+
+def remember_guest_page(request, response, scopes, timeout):
+    """Сохраняет заполненную страницу гостя для core.asgi.GuestPageCache.
+
+    Страница без сессии одинакова для всех гостей, если её дырки не
+    выставили cookie вроде CSRF и не требуют выполнения на каждый запрос.
+    """
+    if (
+        is_guest_request(request.COOKIES)
+        and not request.META.get('CSRF_COOKIE_USED')
+        and not getattr(request, 'skip_guest_cache', False)
+        and not connection.in_atomic_block
+        and replica_fresh(get_versions(*scopes).values())
+    ):
+        cache.add(
+            page_key(request.get_full_path(), scopes, guest=True),
+            (response.content.decode(response.charset),
+             response['Content-Type']),
+            timeout,
+        )
+
+
+def render_with_holes(view, request, *args, **kwargs):
+    """Выполняет представление, оставляя в ответе метки дырок."""
+    request.punch_holes = True
+    try:
+        return view(request, *args, **kwargs)
+    finally:
+        request.punch_holes = False
+
+
+def cache_page_with_holes(get_scopes, max_age=None):
+    """Кеширует страницу целиком, оставляя в ней дырки под пользователя.
+
+    get_scopes(*args, **kwargs) получает аргументы представления и
+    возвращает области версий, от которых зависит страница, или None,
+    если страницу кешировать не нужно. Страница хранится одна для всех
+    посетителей, а части из {% hole %} дорисовываются на каждый запрос.
+    Выключено, пока PAGE_CACHE_TIMEOUT равен нулю. Если часть страницы
+    кешируется по времени, страница хранится не дольше max_age секунд.
+    Страница, прочитанная из отстающей реплики, не кешируется. Гостям
+    без сессии ASGI-развёртывание отдаёт уже заполненную страницу, не
+    запуская Django.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            timeout = settings.PAGE_CACHE_TIMEOUT
+            if not timeout or request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            timeout = min(timeout, max_age or timeout)
+            scopes = get_scopes(*args, **kwargs)
+            if scopes is None:
+                return view(request, *args, **kwargs)
+            key = page_key(request.get_full_path(), scopes)
+            page = cache.get(key)
+            if page is None:
+                response = render_with_holes(view, request, *args, **kwargs)
+                if response.streaming:
+                    return response
+                content = response.content.decode(response.charset)
+                if response.status_code != 200:
+                    response.content = fill_holes(request, content)
+                    return response
+                page = (content, response['Content-Type'])
+                if not connection.in_atomic_block and replica_fresh(
+                    get_versions(*scopes).values()
+                ):
+                    cache.set(key, page, timeout)
+            content, content_type = page
+            response = HttpResponse(
+                fill_holes(request, content), content_type=content_type
+            )
+            patch_vary_headers(response, ('Cookie',))
+            remember_guest_page(request, response, scopes, timeout)
+            return response
+        wrapper.page_cache = (get_scopes, max_age)
+        return wrapper
+    return decorator
+
+
+def page_versions(request, get_scopes, *args, **kwargs):
+    """Версии областей страницы, один раз за запрос."""
+    if not hasattr(request, '_page_versions'):
+        scopes = get_scopes(*args, **kwargs)
+        if scopes is not None and request.user.is_authenticated:
+            user_id = request.user.pk
+            scopes = (*scopes, f'user:{user_id}', f'follows:{user_id}')
+        request._page_versions = (
+            None if scopes is None else get_versions(*scopes)
+        )
+    return request._page_versions
+
+
+def conditional_page(get_scopes, max_age=None):
+    """Отвечает 304 на условные запросы, не выполняя представление.
+
+    ETag собирается из адреса страницы, пользователя и версий областей
+    get_scopes, поэтому меняется и при изменении данных, и при смене
+    пользователя или его подписок. Last-Modified — время последнего
+    изменения областей — отдаётся только гостям: у вошедших пользователей
+    страница зависит ещё и от них самих. Если часть страницы кешируется
+    по времени, max_age заставляет валидаторы меняться не реже раза
+    в max_age секунд. Если версии у каждого процесса свои, валидаторы
+    не отдаются: процесс, не видевший изменения, отвечал бы 304.
+    """
+    def period_start():
+        return int(time.time() // max_age * max_age) if max_age else 0
+
+    def etag(request, *args, **kwargs):
+        versions = page_versions(request, get_scopes, *args, **kwargs)
+        if versions is None:
+            return None
+        parts = [
+            request.get_full_path(), str(request.user.pk), str(period_start())
+        ]
+        parts += [f'{scope}={versions[scope]}' for scope in sorted(versions)]
+        return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return None
+        versions = page_versions(request, get_scopes, *args, **kwargs)
+        if not versions:
+            return None
+        changed = max(max(versions.values()) / 1_000_000, period_start())
+        return datetime.fromtimestamp(changed, tz=timezone.utc)
+
+    def decorator(view):
+        conditional = condition(
+            etag_func=etag, last_modified_func=last_modified
+        )(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if versions_shared():
+                return conditional(request, *args, **kwargs)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
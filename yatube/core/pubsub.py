@@ -0,0 +1,87 @@
+import asyncio
+import threading
+from collections import deque
+
+
+class Subscription:
+    """Подписка асинхронного клиента на события Broker.
+
+    Издатель только будит подписку через цикл событий её клиента, а
+    сами события клиент читает из истории брокера по номеру последнего.
+    """
+
+    def __init__(self, broker, match):
+        self.broker = broker
+        self.match = match
+        self.loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+
+    def notify(self):
+        self.loop.call_soon_threadsafe(self._event.set)
+
+    async def wait(self, timeout):
+        """Ждёт подходящего события; False, если истёк timeout."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self._event.clear()
+        return True
+
+    def __enter__(self):
+        self.broker.subscribe(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    """Шина событий внутри процесса.
+
+    publish можно вызывать из любого потока, подписчики живут в цикле
+    событий ASGI-сервера и не занимают поток каждый. Последние
+    history событий хранятся с порядковыми номерами, поэтому клиент
+    после переподключения получает пропущенное.
+    """
+
+    def __init__(self, history=1000):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._history = deque(maxlen=history)
+        self._last_seq = 0
+
+    @property
+    def last_seq(self):
+        return self._last_seq
+
+    def subscribe(self, subscription):
+        with self._lock:
+            self._subscribers.add(subscription)
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, **event):
+        with self._lock:
+            self._last_seq += 1
+            event['seq'] = self._last_seq
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            if subscription.match(event):
+                try:
+                    subscription.notify()
+                except RuntimeError:
+                    self.unsubscribe(subscription)
+        return event
+
+    def since(self, seq, match):
+        """События с номером больше seq, подходящие под match."""
+        with self._lock:
+            history = list(self._history)
+        return [
+            event for event in history
+            if event['seq'] > seq and match(event)
+        ]
@@ -0,0 +1,73 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+replica_reads = ContextVar('replica_reads', default=False)
+primary_written = ContextVar('primary_written', default=False)
+
+
+class PrimaryReplicaRouter:
+    """Направляет запись в основную базу, а чтение — в реплики.
+
+    Чтение моделей из REPLICA_READ_APPS уходит в реплики только внутри
+    представлений из REPLICA_READ_VIEWS, это разрешает
+    ReplicaPinningMiddleware. Любая
+    запись отмечается, чтобы middleware закрепило пользователя за
+    основной базой.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            model._meta.app_label in settings.REPLICA_READ_APPS
+            and reading_replicas()
+        ):
+            return random.choice(settings.REPLICA_DATABASES)
+        return None
+
+    def db_for_write(self, model, **hints):
+        primary_written.set(True)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
+
+
+def reading_replicas():
+    """Читает ли текущий запрос из реплик, которые могут отставать."""
+    return bool(settings.REPLICA_DATABASES) and replica_reads.get()
+
+
+def replica_key(alias):
+    return f'replica-position:{alias}'
+
+
+def set_replica_position(alias, position):
+    """Запоминает, что реплика содержит все изменения до position, мкс."""
+    cache.set(replica_key(alias), position, None)
+
+
+def replica_fresh(versions):
+    """Можно ли кешировать прочитанное под ключом этих версий.
+
+    Версии сдвигаются при записи в основную базу, поэтому прочитанное
+    из отстающей реплики под новыми версиями осталось бы в кеше до
+    следующего изменения. Кешировать можно, только если каждая реплика
+    скопирована не раньше самой новой из версий.
+    """
+    if not reading_replicas():
+        return True
+    keys = [replica_key(alias) for alias in settings.REPLICA_DATABASES]
+    positions = cache.get_many(keys)
+    if len(positions) < len(keys):
+        return False
+    return max(versions, default=0) <= min(positions.values())
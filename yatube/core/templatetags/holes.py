@@ -0,0 +1,19 @@
+from django import template
+
+from core.holes import hole_marker, render_hole
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, **kwargs):
+    """Выводит часть страницы, зависящую от пользователя.
+
+    При рендере для кеша страниц вместо содержимого остаётся метка,
+    которую core.pagecache заполняет для каждого запроса отдельно.
+    """
+    request = getattr(context, 'request', None)
+    kwargs = {key: str(value) for key, value in kwargs.items()}
+    if getattr(request, 'punch_holes', False):
+        return hole_marker(name, kwargs)
+    return render_hole(request, name, kwargs)
@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import (Client, SimpleTestCase, TransactionTestCase,
+                         override_settings)
+
+from core.asgi import AsyncCache, GuestPageCache, PooledWsgiToAsgi
+from posts.models import Post
+
+User = get_user_model()
+
+
+def call(application, path, headers=()):
+    """Выполняет ASGI-запрос и возвращает статус и тело ответа."""
+    scope = {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': 'GET',
+        'path': path,
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'host', b'localhost'), *headers],
+        'server': ('localhost', 80),
+    }
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        sent.append(message)
+
+    async def run():
+        await application(scope, receive, send)
+
+    asyncio.run(run())
+    body = b''.join(message.get('body', b'') for message in sent[1:])
+    return sent[0]['status'], body.decode()
+
+
+async def django_not_called(scope, receive, send):
+    raise AssertionError('Запрос не должен доходить до Django')
+
+
+class PooledWsgiTest(SimpleTestCase):
+    def test_requests_run_in_parallel(self):
+        """WSGI-запросы выполняются в пуле, а не в одном потоке."""
+        threads = set()
+
+        def slow(environ, start_response):
+            threads.add(threading.current_thread().name)
+            time.sleep(0.2)
+            start_response('200 OK', [])
+            return [b'ok']
+
+        application = PooledWsgiToAsgi(slow)
+
+        async def run_many():
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(
+                loop.run_in_executor(None, call, application, '/')
+                for _ in range(4)
+            ))
+
+        started = time.monotonic()
+        asyncio.run(run_many())
+        self.assertLess(time.monotonic() - started, 0.6)
+        self.assertTrue(all(name.startswith('asgi') for name in threads))
+
+    def test_async_cache(self):
+        """Асинхронный клиент читает и пишет в кеш Django."""
+        async def roundtrip():
+            client = AsyncCache()
+            await client.set('async-key', 42)
+            return await client.get('async-key')
+
+        self.assertEqual(asyncio.run(roundtrip()), 42)
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=60)
+class GuestPageCacheTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.author, text='Гостям')
+
+    def test_guest_page_served_without_django(self):
+        """Гость получает готовую страницу из кеша без Django."""
+        url = f'/profile/{self.author.username}/'
+        Client().get(url)
+        status, body = call(GuestPageCache(django_not_called), url)
+        self.assertEqual(status, 200)
+        self.assertIn('Гостям', body)
+        self.assertIn('Войти', body)
+
+    def test_post_views_are_counted(self):
+        """Страницу поста со счётчиком просмотров всегда рисует Django."""
+        url = f'/posts/{self.post.pk}/'
+        Client().get(url)
+        with self.assertRaises(AssertionError):
+            call(GuestPageCache(django_not_called), url)
+
+    def test_sessions_and_changes_go_to_django(self):
+        """Запросы с сессией и устаревшие страницы обрабатывает Django."""
+        Client().get('/')
+        cookie = f'{settings.SESSION_COOKIE_NAME}=abc'.encode()
+        with self.assertRaises(AssertionError):
+            call(
+                GuestPageCache(django_not_called), '/',
+                headers=((b'cookie', cookie),)
+            )
+        Post.objects.create(author=self.author, text='Новый')
+        with self.assertRaises(AssertionError):
+            call(GuestPageCache(django_not_called), '/')
@@ -0,0 +1,62 @@
+import threading
+
+from django.test import SimpleTestCase
+
+from core.counters import BufferedCounter
+
+
+class BufferedCounterTest(SimpleTestCase):
+    def setUp(self):
+        self.written = []
+        self.fail = False
+
+    def write(self, deltas):
+        if self.fail:
+            raise RuntimeError('база недоступна')
+        self.written.append(deltas)
+
+    def test_increments_are_flushed_in_one_batch(self):
+        """Приращения копятся в памяти и пишутся одним сбросом."""
+        counter = BufferedCounter(self.write, interval=3600)
+        for key in ('a', 'b', 'a'):
+            counter.incr(key)
+        self.assertEqual(self.written, [])
+        self.assertEqual(counter.pending('a'), 2)
+        self.assertEqual(counter.flush(), 3)
+        self.assertEqual(self.written, [{'a': 2, 'b': 1}])
+        self.assertEqual(counter.pending('a'), 0)
+        self.assertEqual(counter.flush(), 0)
+
+    def test_flush_piggybacks_on_increment(self):
+        """По истечении интервала сброс делает очередной incr()."""
+        counter = BufferedCounter(self.write, interval=0)
+        counter.incr('a')
+        counter.incr('a', 2)
+        self.assertEqual(self.written, [{'a': 1}, {'a': 2}])
+
+    def test_timer_flushes_quiet_counter(self):
+        """Поток start() сбрасывает счётчик без новых вызовов incr()."""
+        written = threading.Event()
+
+        def write(deltas):
+            self.written.append(deltas)
+            written.set()
+
+        counter = BufferedCounter(write, interval=3600)
+        counter.incr('a')
+        counter.interval = 0.1
+        counter.start()
+        self.assertTrue(written.wait(5))
+        self.assertEqual(self.written, [{'a': 1}])
+
+    def test_failed_flush_keeps_counts(self):
+        """Если запись не удалась, приращения остаются в буфере."""
+        counter = BufferedCounter(self.write, interval=3600)
+        counter.incr('a')
+        self.fail = True
+        with self.assertLogs('core.counters', 'ERROR'):
+            self.assertEqual(counter.flush(), 0)
+        counter.incr('a')
+        self.fail = False
+        counter.flush()
+        self.assertEqual(self.written, [{'a': 2}])
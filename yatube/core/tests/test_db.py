@@ -0,0 +1,83 @@
+import os
+import sqlite3
+import tempfile
+from unittest import mock
+
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.db import atomic_write
+from core.db.backends.sqlite3.base import (apply_pragmas, lock_metrics,
+                                           retry_on_lock)
+
+
+class SQLiteBackendTest(TestCase):
+    def test_pragmas_applied_on_connect(self):
+        """При подключении выставляются PRAGMA из настроек."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+
+class TransactionModeTest(TransactionTestCase):
+    def begin(self, atomic):
+        with CaptureQueriesContext(connection) as queries:
+            with atomic():
+                pass
+        return queries.captured_queries[0]['sql']
+
+    def test_reads_begin_deferred(self):
+        """Обычная транзакция не берёт блокировку на запись."""
+        self.assertEqual(self.begin(transaction.atomic), 'BEGIN')
+
+    def test_writes_begin_immediate(self):
+        """atomic_write начинает транзакцию с BEGIN IMMEDIATE."""
+        self.assertEqual(self.begin(atomic_write), 'BEGIN IMMEDIATE')
+        self.assertEqual(self.begin(transaction.atomic), 'BEGIN')
+
+
+class RetryOnLockTest(SimpleTestCase):
+    def setUp(self):
+        lock_metrics.reset()
+
+    def test_wal_enabled_for_file_database(self):
+        """Для файловой базы включается WAL."""
+        with tempfile.TemporaryDirectory() as directory:
+            db = sqlite3.connect(os.path.join(directory, 'test.sqlite3'))
+            apply_pragmas(db, {'journal_mode': 'WAL'})
+            mode = db.execute('PRAGMA journal_mode').fetchone()[0]
+            db.close()
+        self.assertEqual(mode, 'wal')
+
+    def test_retries_locked_database(self):
+        """Запрос повторяется, пока база заблокирована."""
+        func = mock.Mock(side_effect=[
+            sqlite3.OperationalError('database is locked'),
+            sqlite3.OperationalError('database is locked'),
+            'ok',
+        ])
+        with mock.patch('time.sleep'):
+            self.assertEqual(retry_on_lock(func, 'SELECT 1'), 'ok')
+        self.assertEqual(func.call_count, 3)
+        self.assertEqual(lock_metrics.snapshot()['lock_retries'], 2)
+
+    def test_gives_up_after_retries(self):
+        """После исчерпания повторов ошибка пробрасывается."""
+        func = mock.Mock(
+            side_effect=sqlite3.OperationalError('database is locked')
+        )
+        with mock.patch('time.sleep'):
+            with self.assertRaises(sqlite3.OperationalError):
+                retry_on_lock(func, retries=2)
+        self.assertEqual(func.call_count, 3)
+        self.assertEqual(lock_metrics.snapshot()['lock_failures'], 1)
+
+    def test_other_errors_not_retried(self):
+        """Прочие ошибки не повторяются."""
+        func = mock.Mock(side_effect=sqlite3.OperationalError('no table'))
+        with self.assertRaises(sqlite3.OperationalError):
+            retry_on_lock(func)
+        self.assertEqual(func.call_count, 1)
@@ -0,0 +1,35 @@
+import asyncio
+import threading
+
+from django.test import SimpleTestCase
+
+from core.pubsub import Broker, Subscription
+
+
+class BrokerTest(SimpleTestCase):
+    def test_publish_from_thread_wakes_matching_subscribers(self):
+        """Событие из другого потока будит только подходящих подписчиков."""
+        broker = Broker()
+
+        async def listen():
+            with Subscription(broker, lambda e: e['kind'] == 'a') as first:
+                with Subscription(broker, lambda e: e['kind'] == 'b') as sec:
+                    threading.Thread(
+                        target=broker.publish, kwargs={'kind': 'a'}
+                    ).start()
+                    return await first.wait(1), await sec.wait(0.1)
+
+        self.assertEqual(asyncio.run(listen()), (True, False))
+
+    def test_since_uses_sequence_and_history(self):
+        """История хранит последние события с номерами по порядку."""
+        broker = Broker(history=3)
+        for number in range(5):
+            broker.publish(number=number)
+        events = broker.since(0, lambda event: True)
+        self.assertEqual([event['seq'] for event in events], [3, 4, 5])
+        self.assertEqual(
+            broker.since(3, lambda event: event['number'] % 2 == 0),
+            [{'number': 4, 'seq': 5}],
+        )
+        self.assertEqual(broker.last_seq, 5)
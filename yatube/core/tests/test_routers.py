@@ -0,0 +1,90 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import resolve
+
+from core.middleware import ReplicaPinningMiddleware
+from core.routers import replica_fresh, replica_reads, set_replica_position
+from core.versioning import get_version
+from posts.models import Post
+
+User = get_user_model()
+
+
+@override_settings(REPLICA_DATABASES=['replica_0'])
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.used_db = None
+
+    def run_request(self, path, method='get', write=False, **kwargs):
+        """Пропускает запрос через middleware и запоминает базу чтения."""
+        request = getattr(self.factory, method)(path, **kwargs)
+        request.resolver_match = resolve(path)
+
+        def view(request):
+            self.used_db = router.db_for_read(Post)
+            if write:
+                router.db_for_write(Post)
+            return HttpResponse()
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = ReplicaPinningMiddleware(get_response)
+        return middleware(request)
+
+    def test_read_views_use_replica(self):
+        """Ленты читают из реплики."""
+        self.run_request('/')
+        self.assertEqual(self.used_db, 'replica_0')
+
+    def test_sessions_and_users_use_primary(self):
+        """Сессии и пользователи читаются из основной базы даже в лентах."""
+        token = replica_reads.set(True)
+        try:
+            self.assertEqual(router.db_for_read(Post), 'replica_0')
+            self.assertEqual(router.db_for_read(User), 'default')
+            self.assertEqual(router.db_for_read(Session), 'default')
+        finally:
+            replica_reads.reset(token)
+
+    def test_other_views_use_primary(self):
+        """Прочие представления и POST-запросы читают из основной базы."""
+        self.run_request('/create/')
+        self.assertEqual(self.used_db, 'default')
+        self.run_request('/', method='post')
+        self.assertEqual(self.used_db, 'default')
+
+    def test_write_pins_to_primary(self):
+        """После записи пользователь закреплён за основной базой."""
+        response = self.run_request('/posts/1/comment/', write=True)
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        self.run_request('/', HTTP_COOKIE=f'{settings.REPLICA_PIN_COOKIE}=1')
+        self.assertEqual(self.used_db, 'default')
+
+    def test_writes_and_migrations_go_to_primary(self):
+        """Запись и миграции не попадают в реплики."""
+        self.assertEqual(router.db_for_write(Post), 'default')
+        self.assertFalse(router.allow_migrate('replica_0', 'posts'))
+        self.assertTrue(router.allow_migrate('default', 'posts'))
+
+    def test_stale_replica_reads_are_not_cached(self):
+        """Прочитанное из отстающей реплики не кешируется под новой версией."""
+        cache.clear()
+        version = get_version('posts')
+        token = replica_reads.set(True)
+        try:
+            self.assertFalse(replica_fresh([version]))
+            set_replica_position('replica_0', version - 1)
+            self.assertFalse(replica_fresh([version]))
+            set_replica_position('replica_0', version)
+            self.assertTrue(replica_fresh([version]))
+        finally:
+            replica_reads.reset(token)
+        self.assertTrue(replica_fresh([version + 1]))
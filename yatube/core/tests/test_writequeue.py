@@ -0,0 +1,67 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core.writequeue import WriteQueue, execute_write, write_queue
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class WriteQueueTest(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+
+    def test_queued_writes_are_batched(self):
+        """Записи, накопленные пока писатель занят, идут одним пакетом."""
+        queue = WriteQueue(batch_size=100)
+        started = threading.Event()
+        release = threading.Event()
+
+        def block():
+            started.set()
+            release.wait(timeout=10)
+
+        blocker = queue.submit(block)
+        self.assertTrue(started.wait(timeout=10))
+        futures = [
+            queue.submit(
+                Post.objects.create, author=self.user, text=f'Пост {number}'
+            )
+            for number in range(20)
+        ]
+        release.set()
+        blocker.result(timeout=10)
+        posts = [future.result(timeout=10) for future in futures]
+        self.assertEqual(Post.objects.count(), 20)
+        self.assertTrue(all(post.pk for post in posts))
+        metrics = queue.metrics.snapshot()
+        self.assertEqual(metrics['batches'], 2)
+        self.assertEqual(metrics['writes'], 21)
+
+    def test_failed_write_does_not_break_batch(self):
+        """Ошибка одной записи не откатывает остальные записи пакета."""
+        queue = WriteQueue()
+        failing = queue.submit(Post.objects.create, author=None, text='')
+        ok = queue.submit(Post.objects.create, author=self.user, text='Пост')
+        with self.assertRaises(Exception):
+            failing.result(timeout=10)
+        self.assertEqual(ok.result(timeout=10).text, 'Пост')
+        self.assertTrue(Post.objects.filter(text='Пост').exists())
+
+    @override_settings(WRITE_QUEUE_ENABLED=True)
+    def test_views_read_their_writes(self):
+        """После записи через очередь представление видит свой комментарий."""
+        post = Post.objects.create(author=self.user, text='Пост')
+        self.client.force_login(self.user)
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            {'text': 'Комментарий'},
+        )
+        self.assertTrue(Comment.objects.filter(text='Комментарий').exists())
+        self.assertEqual(
+            execute_write(Post.objects.count), Post.objects.count()
+        )
+        self.assertGreater(write_queue.metrics.snapshot()['writes'], 0)
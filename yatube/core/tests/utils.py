@@ -0,0 +1,15 @@
+import tempfile
+
+from django.test import override_settings
+
+
+def use_shared_cache(test):
+    """Включает на время теста файловый кеш, общий для процессов."""
+    location = tempfile.TemporaryDirectory()
+    test.addCleanup(location.cleanup)
+    shared = override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': location.name,
+    }})
+    shared.enable()
+    test.addCleanup(shared.disable)
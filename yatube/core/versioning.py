@@ -0,0 +1,79 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+KEY_PREFIX = 'version'
+
+# Кеши, которые у каждого процесса свои.
+LOCAL_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def _key(scope):
+    return f'{KEY_PREFIX}:{scope}'
+
+
+def _now():
+    return int(time.time() * 1_000_000)
+
+
+def get_versions(*scopes):
+    """Возвращает словарь {область: версия}.
+
+    Версия области — метка времени последнего изменения в микросекундах.
+    Если версии нет в кеше, она создаётся текущим временем: всё, что было
+    закешировано со старой версией, становится недоступным.
+    """
+    keys = {_key(scope): scope for scope in scopes}
+    found = cache.get_many(keys)
+    missing = {key: _now() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return {keys[key]: value for key, value in found.items()}
+
+
+def versions_shared():
+    """Видят ли все процессы одни и те же версии.
+
+    В кеше процесса сдвиг версии из другого процесса не виден, поэтому
+    «ничего не менялось» по таким версиям утверждать нельзя.
+    """
+    return settings.CACHES['default']['BACKEND'] not in LOCAL_BACKENDS
+
+
+def get_version(scope):
+    return get_versions(scope)[scope]
+
+
+def _bump(scopes):
+    keys = [_key(scope) for scope in scopes]
+    now = _now()
+    old = cache.get_many(keys)
+    cache.set_many(
+        {key: max(now, old.get(key, 0) + 1) for key in keys},
+        timeout=None
+    )
+
+
+def bump(*scopes, using=None):
+    """Отмечает области изменёнными, сбрасывая зависящие от них кеши.
+
+    Внутри транзакции базы using версии меняются ещё раз после коммита:
+    иначе параллельный запрос успел бы закешировать данные до изменения
+    под уже новой версией. Для изменений на шарде using — его алиас.
+    """
+    _bump(scopes)
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(lambda: _bump(scopes), using=using)
+
+
+def make_key(prefix, *scopes):
+    """Собирает ключ кеша, зависящий от версий перечисленных областей."""
+    versions = get_versions(*scopes)
+    parts = (f'{scope}={versions[scope]}' for scope in scopes)
+    return ':'.join((prefix, *parts))
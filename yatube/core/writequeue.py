@@ -0,0 +1,105 @@
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from core.db import atomic_write
+from core.metrics import Metrics
+from core.routers import primary_written
+
+logger = logging.getLogger(__name__)
+
+
+class WriteQueue:
+    """Очередь записей, которые выполняет один поток-писатель.
+
+    Писатель забирает из очереди до batch_size задач и выполняет их в
+    одной транзакции, каждую в своей точке сохранения: ошибка одной задачи
+    не откатывает остальные. Результаты отдаются только после коммита,
+    поэтому запрос, дождавшийся future, сразу видит свою запись.
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size
+        self.metrics = Metrics()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, func, *args, **kwargs):
+        future = Future()
+        self._queue.put((future, func, args, kwargs))
+        self._ensure_started()
+        return future
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='write-queue', daemon=True
+                )
+                self._thread.start()
+
+    def _take_batch(self):
+        batch = [self._queue.get()]
+        batch_size = self.batch_size or settings.WRITE_QUEUE_BATCH_SIZE
+        while len(batch) < batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            close_old_connections()
+            self.metrics.incr('batches')
+            self.metrics.incr('writes', len(batch))
+            try:
+                results = self._execute(batch)
+            except Exception as error:
+                logger.exception('Не удалось записать пакет')
+                for future, *_ in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            for future, result, failed in results:
+                if failed:
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _execute(self, batch):
+        results = []
+        with atomic_write():
+            for future, func, args, kwargs in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    with transaction.atomic():
+                        results.append((future, func(*args, **kwargs), False))
+                except Exception as error:
+                    results.append((future, error, True))
+        return results
+
+
+write_queue = WriteQueue()
+
+
+def execute_write(func, *args, **kwargs):
+    """Выполняет запись через общую очередь писателя и ждёт результата.
+
+    Если WRITE_QUEUE_ENABLED выключена, запись выполняется сразу в
+    текущем потоке. Запись через очередь тоже закрепляет пользователя
+    за основной базой, хотя роутер вызывается в потоке-писателе.
+    """
+    if not settings.WRITE_QUEUE_ENABLED:
+        return func(*args, **kwargs)
+    future = write_queue.submit(func, *args, **kwargs)
+    result = future.result(timeout=settings.WRITE_QUEUE_TIMEOUT)
+    primary_written.set(True)
+    return result
@@ -1,10 +1,149 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.cache import cache
+from django.http import Http404, JsonResponse
+from django.urls import path, reverse
+
+from core.jobs import get_progress, run_in_batches
+from core.versioning import bump, make_key
 
 from .models import Comment, Follow, Group, Post
+from .search import search_posts
+from .timeline import move_posts
+from .utils import CachedCountPaginator
+
+
+def group_choices():
+    """Список групп (pk, название), кешируемый до изменения любой группы."""
+    key = make_key('admin-groups', 'groups')
+    choices = cache.get(key)
+    if choices is None:
+        choices = list(Group.objects.values_list('pk', 'title'))
+        cache.set(key, choices)
+    return choices
+
+
+class CachedGroupSelect(AutocompleteSelect):
+    """Автодополнение группы без запроса к БД на каждую строку списка.
+
+    Подпись выбранной группы берётся из кешированного списка групп.
+    """
+
+    def optgroups(self, name, value, attr=None):
+        labels = {str(pk): title for pk, title in group_choices()}
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        selected = [str(pk) for pk in value if str(pk) in labels]
+        for index, pk in enumerate(selected, start=len(options)):
+            options.append(
+                self.create_option(name, pk, labels[pk], True, index)
+            )
+        return [(None, options, 0)]
+
+
+class CachedGroupFilter(admin.SimpleListFilter):
+    """Фильтр по группе со списком групп из кеша."""
+    title = 'группа'
+    parameter_name = 'group'
+
+    def lookups(self, request, model_admin):
+        return group_choices()
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(group_id=self.value())
+        return queryset
+
+
+class PostActionForm(ActionForm):
+    group = forms.TypedChoiceField(
+        label='Группа',
+        choices=lambda: [('', '---------'), *group_choices()],
+        coerce=int,
+        empty_value=None,
+        required=False,
+    )
+
+
+def delete_batch(model):
+    def handler(batch):
+        model.objects.filter(pk__in=batch).delete()
+    return handler
+
+
+def regroup_batch(group_id):
+    def handler(batch):
+        posts = Post.objects.filter(pk__in=batch)
+        scopes = {'posts'}
+        for pk, author_id, old_group_id in posts.values_list(
+            'pk', 'author_id', 'group_id'
+        ):
+            scopes.add(f'post:{pk}')
+            scopes.add(f'author:{author_id}')
+            scopes.add(f'group:{old_group_id}')
+        scopes.add(f'group:{group_id}')
+        scopes.discard('group:None')
+        posts.update(group_id=group_id)
+        # update() не шлёт сигналов, поэтому записи лент правятся здесь.
+        move_posts(batch, group_id)
+        bump(*scopes)
+    return handler
+
+
+class PerformanceAdmin(admin.ModelAdmin):
+    """Базовая админка для больших таблиц.
+
+    Не считает полное количество строк, берёт оценку СУБД вместо
+    COUNT(*) для очень больших выборок и выполняет массовые действия
+    фоновыми задачами пакетами по BULK_ACTION_BATCH_SIZE строк.
+    """
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+    actions = ('delete_in_background',)
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path(
+                'jobs/<str:job_id>/',
+                self.admin_site.admin_view(self.job_progress_view),
+                name='%s_%s_job' % info,
+            ),
+        ] + super().get_urls()
+
+    def job_progress_view(self, request, job_id):
+        progress = get_progress(job_id)
+        if progress is None:
+            raise Http404('Задача не найдена')
+        return JsonResponse(progress)
+
+    def start_job(self, request, queryset, name, handler):
+        job_id = run_in_batches(
+            name, queryset.values_list('pk', flat=True), handler
+        )
+        info = self.model._meta.app_label, self.model._meta.model_name
+        url = reverse('admin:%s_%s_job' % info, args=(job_id,))
+        self.message_user(
+            request,
+            f'Задача «{name}» запущена, ход выполнения: {url}',
+            messages.SUCCESS,
+        )
+
+    def delete_in_background(self, request, queryset):
+        self.start_job(
+            request, queryset, 'Удаление', delete_batch(self.model)
+        )
+    delete_in_background.allowed_permissions = ('delete',)
+    delete_in_background.short_description = (
+        'Удалить выбранные в фоне пакетами'
+    )
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(PerformanceAdmin):
     list_display = (
         'pk',
         'text',
@@ -13,9 +152,44 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    raw_id_fields = ('author',)
     search_fields = ('text',)
-    list_filter = ('created',)
+    list_filter = ('created', CachedGroupFilter)
     empty_value_display = '-пусто-'
+    action_form = PostActionForm
+    actions = ('delete_in_background', 'move_to_group')
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'group':
+            kwargs['widget'] = CachedGroupSelect(
+                db_field.remote_field, self.admin_site
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_search_results(self, request, queryset, search_term):
+        if search_term:
+            found = search_posts(queryset, search_term)
+            if found is not None:
+                return found, False
+        return super().get_search_results(request, queryset, search_term)
+
+    def move_to_group(self, request, queryset):
+        form = self.action_form(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        group_id = form.cleaned_data['group'] if form.is_valid() else None
+        if group_id is None:
+            self.message_user(
+                request, 'Выберите группу для переноса.', messages.ERROR
+            )
+            return
+        self.start_job(
+            request, queryset, 'Перенос в группу', regroup_batch(group_id)
+        )
+    move_to_group.allowed_permissions = ('change',)
+    move_to_group.short_description = (
+        'Перенести выбранные в группу в фоне пакетами'
+    )
 
 
 @admin.register(Group)
@@ -26,12 +200,12 @@ class GroupAdmin(admin.ModelAdmin):
         'slug',
         'description',
     )
-    search_fields = ('description',)
+    search_fields = ('title', 'description')
     list_filter = ('title',)
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(PerformanceAdmin):
     list_display = (
         'pk',
         'author',
@@ -39,15 +213,19 @@ class CommentAdmin(admin.ModelAdmin):
         'text',
         'created',
     )
+    list_select_related = ('author', 'post')
+    raw_id_fields = ('author', 'post', 'parent')
     search_fields = ('text',)
     list_filter = ('created',)
 
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(PerformanceAdmin):
     list_display = (
         'pk',
         'author',
         'user',
     )
+    list_select_related = ('author', 'user')
+    raw_id_fields = ('author', 'user')
     search_fields = ('author__username',)
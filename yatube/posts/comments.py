@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.db import connections
+from django.db.models import prefetch_related_objects
+
+from .models import PATH_END, Comment
+from .sharding import post_shard, with_relations
+
+
+def _comments(post_id):
+    return with_relations(
+        Comment.objects.using(post_shard(post_id)).filter(post_id=post_id),
+        'author',
+    ).order_by('path')
+
+
+def first_replies(post_id, roots, limit):
+    """Первые limit ответов каждого обсуждения одним запросом.
+
+    Диапазон путей каждого корня читается по индексу (post, path) со
+    своим LIMIT, и диапазоны склеиваются через UNION ALL, поэтому
+    горячее обсуждение с тысячами ответов даёт базе не больше limit
+    строк. Авторы подгружаются отдельным запросом.
+    """
+    comments = Comment.objects.using(post_shard(post_id)).filter(
+        post_id=post_id, depth=1
+    ).order_by('path')
+    parts = []
+    params = []
+    for number, root in enumerate(roots):
+        sql, part_params = comments.filter(
+            path__gt=root.path, path__lt=root.path + PATH_END
+        )[:limit].query.sql_with_params()
+        parts.append(f'SELECT * FROM ({sql}) AS thread_{number}')
+        params += part_params
+    if not parts:
+        return []
+    quote = connections[comments.db].ops.quote_name
+    replies = list(comments.raw(
+        f'{" UNION ALL ".join(parts)} ORDER BY {quote("path")}', params
+    ))
+    prefetch_related_objects(replies, 'author')
+    return replies
+
+
+def attach(parents, rows, limit=None):
+    """Раскладывает rows, упорядоченные по path, по родителям.
+
+    Родитель идёт в пути раньше потомков, поэтому хватает одного прохода.
+    Под каждым комментарием остаётся не больше limit ответов; остальные
+    и всё, что глубже загруженного, считаются в hidden_replies.
+    """
+    nodes = {node.pk: node for node in parents}
+    for node in parents:
+        node.shown_replies = []
+    for row in rows:
+        parent = nodes.get(row.parent_id)
+        if parent is None or (
+            limit is not None and len(parent.shown_replies) >= limit
+        ):
+            continue
+        row.shown_replies = []
+        parent.shown_replies.append(row)
+        nodes[row.pk] = row
+    for node in nodes.values():
+        node.hidden_replies = node.replies_count - len(node.shown_replies)
+    return parents
+
+
+def threads(post_id, after=None, size=None):
+    """Обсуждения поста с первыми ответами и путь для следующей порции.
+
+    Корни выбираются по индексу (post, path) начиная после after, а
+    первые COMMENT_REPLIES_SHOWN ответов каждого — одним запросом из
+    first_replies.
+    """
+    size = size or settings.COMMENT_THREADS
+    roots = _comments(post_id).filter(depth=0)
+    if after:
+        roots = roots.filter(path__gt=after)
+    roots = list(roots[:size + 1])
+    after = roots[size - 1].path if len(roots) > size else None
+    roots = roots[:size]
+    if not roots:
+        return roots, after
+    limit = settings.COMMENT_REPLIES_SHOWN
+    return attach(roots, first_replies(post_id, roots, limit), limit), after
+
+
+def subtree(comment):
+    """Все ответы на comment на COMMENT_FRAGMENT_DEPTH уровней вглубь."""
+    rows = _comments(comment.post_id).filter(
+        path__gt=comment.path,
+        path__lt=comment.path + PATH_END,
+        depth__lte=comment.depth + settings.COMMENT_FRAGMENT_DEPTH,
+    )
+    return attach([comment], rows)[0].shown_replies
@@ -0,0 +1,189 @@
+import heapq
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from operator import attrgetter
+
+FEED_ORDERING = ('-created', '-pk')
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+feed_key = attrgetter('created', 'pk')
+
+# id больше любого настоящего: оценка источника идёт раньше его постов.
+HEAD_PK = 2 ** 63
+
+
+def timestamp_us(moment):
+    """Время в микросекундах от начала эпохи, без потерь на float."""
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+def encode_cursor(created, pk):
+    return f'{timestamp_us(created)}_{pk}'
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор «микросекунды_id»; ValueError, если он испорчен."""
+    moment, pk = cursor.split('_')
+    try:
+        return EPOCH + timedelta(microseconds=int(moment)), int(pk)
+    except OverflowError:
+        raise ValueError(f'Курсор вне диапазона дат: {cursor}')
+
+
+def newer_than(queryset, created, pk):
+    """Посты новее курсора (created, pk), от старых к новым.
+
+    Условие created >= ... позволяет пройти по индексу (created, id)
+    диапазоном, а посты с тем же временем отсекаются по id.
+    """
+    return queryset.filter(created__gte=created).exclude(
+        created=created, pk__lte=pk
+    ).order_by('created', 'pk')
+
+
+def older_than(queryset, created, pk):
+    """Посты старше курсора (created, pk), от новых к старым."""
+    return queryset.filter(created__lte=created).exclude(
+        created=created, pk__gte=pk
+    ).order_by(*FEED_ORDERING)
+
+
+def merged_rows(querysets, limit):
+    """Лениво сливает выборки по FEED_ORDERING, не больше limit строк.
+
+    В отличие от среза MergedFeed строки не собираются в список, поэтому
+    годятся для потоковой отдачи.
+    """
+    sources = [
+        queryset.order_by(*FEED_ORDERING)[:limit].iterator()
+        for queryset in querysets
+    ]
+    return islice(heapq.merge(*sources, key=feed_key, reverse=True), limit)
+
+
+def newer_keys(querysets, created, pk, limit):
+    """Пары (created, id) новее курсора со всех выборок, не больше limit."""
+    sources = [
+        newer_than(queryset, created, pk).values_list(
+            'created', 'pk'
+        )[:limit]
+        for queryset in querysets
+    ]
+    return list(islice(heapq.merge(*sources), limit))
+
+
+def newest_key(querysets):
+    """Пара (created, id) самого нового поста или None."""
+    keys = [
+        queryset.order_by(*FEED_ORDERING).values_list(
+            'created', 'pk'
+        ).first()
+        for queryset in querysets
+    ]
+    return max(filter(None, keys), default=None)
+
+
+class MergedFeed:
+    """Лента, собранная k-путевым слиянием отсортированных выборок.
+
+    Каждая выборка упорядочена по FEED_ORDERING; срез [start:stop] берёт
+    не больше stop строк из каждой выборки и сливает их через heapq.
+    Поддерживает count() и срезы, поэтому подходит для Paginator.
+    """
+
+    def __init__(self, querysets):
+        self.querysets = [qs.order_by(*FEED_ORDERING) for qs in querysets]
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start = index.start or 0
+            stop = index.stop
+            sources = [
+                queryset if stop is None else queryset[:stop]
+                for queryset in self.querysets
+            ]
+            merged = heapq.merge(*sources, key=feed_key, reverse=True)
+            return list(islice(merged, start, stop))
+        items = self[index:index + 1]
+        if not items:
+            raise IndexError('Индекс за пределами ленты')
+        return items[0]
+
+    def __iter__(self):
+        return iter(self[0:None])
+
+
+class KeysetSource:
+    """Отсортированный источник ленты, читаемый порциями по batch строк.
+
+    head — время самого нового поста источника: пока источник не
+    понадобился слиянию, он не делает ни одного запроса. Следующая
+    порция берётся по ключу последней прочитанной строки, поэтому в
+    памяти не больше batch строк источника.
+    """
+
+    def __init__(self, queryset, head, batch):
+        self.queryset = queryset
+        self.head = head
+        self.batch = batch
+        self.rows = deque()
+        self.last = None
+        self.exhausted = False
+
+    def fetch(self):
+        queryset = self.queryset.order_by(*FEED_ORDERING)
+        if self.last is not None:
+            queryset = older_than(queryset, *self.last)
+        rows = list(queryset[:self.batch])
+        self.exhausted = len(rows) < self.batch
+        if rows:
+            self.last = feed_key(rows[-1])
+        self.rows.extend(rows)
+
+    def next(self):
+        """Следующий пост источника или None, если они кончились."""
+        if not self.rows and not self.exhausted:
+            self.fetch()
+        return self.rows.popleft() if self.rows else None
+
+
+def merge_sources(sources, limit):
+    """Сливает источники KeysetSource по FEED_ORDERING, до limit постов.
+
+    В куче лежит по одной записи на источник: сначала оценка сверху
+    по head, затем настоящий очередной пост. Источник читается, только
+    когда его оценка оказалась наверху, поэтому число запросов растёт с
+    limit, а не с числом источников k, а слияние стоит O(limit · log k)
+    при O(k) памяти на кучу. Пост, пришедший
+    из двух источников, попадает в ленту один раз: его копии в куче
+    стоят подряд.
+    """
+    heap = [
+        (-timestamp_us(source.head), -HEAD_PK, index, None)
+        for index, source in enumerate(sources)
+    ]
+    heapq.heapify(heap)
+    posts = []
+    last_pk = None
+    while heap and limit:
+        _, _, index, post = heapq.heappop(heap)
+        if post is not None and post.pk != last_pk:
+            posts.append(post)
+            last_pk = post.pk
+            if len(posts) == limit:
+                break
+        following = sources[index].next()
+        if following is not None:
+            heapq.heappush(heap, (
+                -timestamp_us(following.created), -following.pk,
+                index, following,
+            ))
+    return posts
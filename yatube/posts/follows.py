@@ -0,0 +1,185 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F
+
+from core.db import atomic_write
+from core.versioning import bump
+
+from .graph import follow_graph
+from .models import Follow, FollowCounter, GroupFollow
+from .timeline import (backfill, forget_celebrities, schedule_restore,
+                       unfollow_authors)
+
+
+def supports_returning(connection):
+    """Умеет ли база ON CONFLICT DO NOTHING и RETURNING."""
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 35)
+    return False
+
+
+def _names(connection):
+    quote = connection.ops.quote_name
+    meta = Follow._meta
+    return (
+        quote(meta.db_table),
+        quote(meta.get_field('user').column),
+        quote(meta.get_field('author').column),
+    )
+
+
+def _existing(connection, user_id, author_ids):
+    return list(Follow.objects.using(connection.alias).filter(
+        user_id=user_id, author_id__in=author_ids
+    ).values_list('author_id', flat=True))
+
+
+def _insert(connection, user_id, author_ids):
+    """Вставляет подписки одним INSERT, пропуская уже существующие.
+
+    Возвращает id авторов, подписка на которых действительно появилась.
+    Базы без RETURNING сначала читают существующие подписки.
+    """
+    if not supports_returning(connection):
+        existing = set(_existing(connection, user_id, author_ids))
+        added = [
+            author_id for author_id in author_ids
+            if author_id not in existing
+        ]
+        Follow.objects.using(connection.alias).bulk_create(
+            [Follow(user_id=user_id, author_id=pk) for pk in added],
+            ignore_conflicts=True,
+        )
+        return added
+    table, user, author = _names(connection)
+    rows = ', '.join(['(%s, %s)'] * len(author_ids))
+    params = [
+        value for author_id in author_ids for value in (user_id, author_id)
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({user}, {author}) VALUES {rows} '
+            f'ON CONFLICT DO NOTHING RETURNING {author}',
+            params,
+        )
+        return [author_id for author_id, in cursor.fetchall()]
+
+
+def _delete(connection, user_id, author_ids):
+    """Удаляет подписки одним DELETE и возвращает id отписанных авторов.
+
+    Запрос идёт мимо сигналов ORM: счётчики меняет вызывающий.
+    """
+    table, user, author = _names(connection)
+    marks = ', '.join(['%s'] * len(author_ids))
+    sql = f'DELETE FROM {table} WHERE {user} = %s AND {author} IN ({marks})'
+    params = [user_id, *author_ids]
+    with connection.cursor() as cursor:
+        if supports_returning(connection):
+            cursor.execute(f'{sql} RETURNING {author}', params)
+            return [author_id for author_id, in cursor.fetchall()]
+        removed = _existing(connection, user_id, author_ids)
+        cursor.execute(sql, params)
+        return removed
+
+
+def count_follows(using, user_id, author_ids, delta):
+    """Сдвигает счётчики пользователя и авторов на delta за подписку.
+
+    Если автор пересёк порог раскладки, список знаменитостей
+    сбрасывается, а опустившимся ниже порога после коммита
+    раскладываются последние посты.
+    """
+    counters = FollowCounter.objects.using(using)
+    counters.filter(user_id=user_id).update(
+        following=F('following') + delta * len(author_ids)
+    )
+    authors = counters.filter(user_id__in=author_ids)
+    authors.update(followers=F('followers') + delta)
+    threshold = settings.TIMELINE_FANOUT_THRESHOLD
+    crossed = list(authors.filter(
+        followers=threshold if delta > 0 else threshold - 1
+    ).values_list('user_id', flat=True))
+    if not crossed:
+        return
+    forget_celebrities()
+    if delta > 0:
+        return
+    if settings.BACKGROUND_JOBS_EAGER:
+        schedule_restore(crossed)
+    else:
+        transaction.on_commit(partial(schedule_restore, crossed), using=using)
+
+
+def _changed(user_id, author_ids):
+    bump(
+        f'follows:{user_id}',
+        *(f'followers:{author_id}' for author_id in author_ids),
+    )
+
+
+def follow_many(user_id, author_ids):
+    """Подписывает пользователя на авторов; повторная подписка не ошибка.
+
+    Подписки вставляются одним запросом, а счётчики, лента и версии
+    ленты подписок меняются в той же транзакции. Возвращает id авторов, на
+    которых подписка действительно появилась.
+    """
+    author_ids = sorted(set(author_ids) - {user_id})
+    if not author_ids:
+        return []
+    using = router.db_for_write(Follow)
+    with atomic_write(using=using):
+        added = _insert(connections[using], user_id, author_ids)
+        if added:
+            count_follows(using, user_id, added, 1)
+            backfill(user_id, added)
+            _changed(user_id, added)
+            follow_graph.apply_on_commit(user_id, added, True, using)
+    return added
+
+
+def unfollow_many(user_id, author_ids):
+    """Отписывает пользователя от авторов, возвращает id отписанных."""
+    author_ids = sorted(set(author_ids))
+    if not author_ids:
+        return []
+    using = router.db_for_write(Follow)
+    with atomic_write(using=using):
+        removed = _delete(connections[using], user_id, author_ids)
+        if removed:
+            count_follows(using, user_id, removed, -1)
+            unfollow_authors(user_id, removed)
+            _changed(user_id, removed)
+            follow_graph.apply_on_commit(user_id, removed, False, using)
+    return removed
+
+
+def follow(user_id, author_id):
+    """Подписка на одного автора; True, если её ещё не было."""
+    return bool(follow_many(user_id, [author_id]))
+
+
+def unfollow(user_id, author_id):
+    """Отписка от одного автора; True, если подписка была."""
+    return bool(unfollow_many(user_id, [author_id]))
+
+
+def follow_group(user_id, group_id):
+    """Подписка на группу; True, если её ещё не было."""
+    _, created = GroupFollow.objects.get_or_create(
+        user_id=user_id, group_id=group_id
+    )
+    return created
+
+
+def unfollow_group(user_id, group_id):
+    """Отписка от группы; True, если подписка была."""
+    deleted, _ = GroupFollow.objects.filter(
+        user_id=user_id, group_id=group_id
+    ).delete()
+    return bool(deleted)
@@ -0,0 +1,188 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+
+from django.db import transaction
+
+from core.versioning import get_version, get_versions, versions_shared
+
+from .models import Follow
+
+EMPTY = array('i')
+
+
+def now_us():
+    return int(time.time() * 1_000_000)
+
+
+class Adjacency:
+    """Отсортированные списки соседей в array('i').
+
+    Базовый слой собирается одним проходом в формате CSR: соседи
+    вершины v лежат в targets[offsets[v]:offsets[v + 1]], так что на
+    ребро уходит четыре байта, а на вершину — ещё четыре. Изменённые и
+    перечитанные списки лежат в overlay отдельными массивами. Массивы
+    не меняются на месте, поэтому выданные наружу memoryview остаются
+    целыми.
+    """
+
+    def __init__(self, offsets=None, targets=None):
+        self.offsets = offsets or array('i', [0])
+        self.targets = targets or array('i')
+        self.overlay = {}
+
+    @classmethod
+    def from_sorted(cls, pairs):
+        """Собирает слой из пар (вершина, сосед), отсортированных по обоим."""
+        offsets = array('i', [0])
+        targets = array('i')
+        for source, target in pairs:
+            while len(offsets) <= source:
+                offsets.append(len(targets))
+            targets.append(target)
+        offsets.append(len(targets))
+        return cls(offsets, targets)
+
+    def _span(self, source):
+        if source in self.overlay:
+            neighbours = self.overlay[source]
+            return neighbours, 0, len(neighbours)
+        if source + 1 < len(self.offsets):
+            return (
+                self.targets, self.offsets[source], self.offsets[source + 1]
+            )
+        return EMPTY, 0, 0
+
+    def neighbours(self, source):
+        array_, low, high = self._span(source)
+        return memoryview(array_)[low:high]
+
+    def contains(self, source, target):
+        """Проверка ребра двоичным поиском, O(log n)."""
+        array_, low, high = self._span(source)
+        index = bisect_left(array_, target, low, high)
+        return index < high and array_[index] == target
+
+    def replace(self, source, targets):
+        self.overlay[source] = array('i', sorted(targets))
+
+    def add(self, source, target):
+        if not self.contains(source, target):
+            neighbours = array('i', self.neighbours(source))
+            insort(neighbours, target)
+            self.overlay[source] = neighbours
+
+    def remove(self, source, target):
+        if self.contains(source, target):
+            neighbours = array('i', self.neighbours(source))
+            neighbours.remove(target)
+            self.overlay[source] = neighbours
+
+    def nbytes(self):
+        arrays = (self.offsets, self.targets, *self.overlay.values())
+        return sum(len(part) * part.itemsize for part in arrays)
+
+
+class FollowGraph:
+    """Граф подписок процесса: кто на кого подписан и кто подписчики.
+
+    Списки пользователей подгружаются из таблицы подписок по первому
+    обращению или все сразу через build(). Свежесть проверяется по
+    версиям follows:<id> и followers:<id>: версия — время последнего
+    изменения, и список, загруженный раньше него, перечитывается, так
+    что подписки из других процессов тоже видны. Если версии у каждого
+    процесса свои, список перечитывается из базы при каждом обращении.
+    Подписки своего процесса применяются к графу сразу после коммита.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.following = Adjacency()
+        self.followers = Adjacency()
+        self.built_at = 0
+        self._loaded = {'following': {}, 'followers': {}}
+
+    def build(self, using=None):
+        """Перечитывает весь граф двумя упорядоченными проходами."""
+        started = now_us()
+        follows = Follow.objects.using(using)
+        following = Adjacency.from_sorted(
+            follows.order_by('user_id', 'author_id').values_list(
+                'user_id', 'author_id').iterator()
+        )
+        followers = Adjacency.from_sorted(
+            follows.order_by('author_id', 'user_id').values_list(
+                'author_id', 'user_id').iterator()
+        )
+        with self._lock:
+            self.following = following
+            self.followers = followers
+            self.built_at = started
+            self._loaded = {'following': {}, 'followers': {}}
+
+    def _fresh(self, direction, vertex):
+        scope = 'follows' if direction == 'following' else 'followers'
+        if versions_shared() and get_version(f'{scope}:{vertex}') <= (
+            self._loaded[direction].get(vertex, self.built_at)
+        ):
+            return getattr(self, direction)
+        loaded = now_us()
+        field, other = (
+            ('user_id', 'author_id') if direction == 'following'
+            else ('author_id', 'user_id')
+        )
+        ids = Follow.objects.filter(**{field: vertex}).values_list(
+            other, flat=True
+        )
+        adjacency = getattr(self, direction)
+        with self._lock:
+            adjacency.replace(vertex, ids)
+            self._loaded[direction][vertex] = loaded
+        return adjacency
+
+    def is_following(self, user_id, author_id):
+        return self._fresh('following', user_id).contains(user_id, author_id)
+
+    def following_ids(self, user_id):
+        return self._fresh('following', user_id).neighbours(user_id)
+
+    def follower_ids(self, author_id):
+        return self._fresh('followers', author_id).neighbours(author_id)
+
+    def _known(self, direction, vertex):
+        return self.built_at or vertex in self._loaded[direction]
+
+    def apply(self, user_id, author_ids, followed):
+        """Применяет подписки или отписки этого процесса к графу.
+
+        Вызывается после коммита, когда версии уже сдвинуты. Подписка
+        из другого процесса между коммитом и чтением версий заметна
+        только после следующего изменения того же пользователя.
+        """
+        versions = get_versions(
+            f'follows:{user_id}',
+            *(f'followers:{author_id}' for author_id in author_ids),
+        )
+        change = 'add' if followed else 'remove'
+        with self._lock:
+            if self._known('following', user_id):
+                for author_id in author_ids:
+                    getattr(self.following, change)(user_id, author_id)
+                self._loaded['following'][user_id] = versions[
+                    f'follows:{user_id}'
+                ]
+            for author_id in author_ids:
+                if self._known('followers', author_id):
+                    getattr(self.followers, change)(author_id, user_id)
+                    self._loaded['followers'][author_id] = versions[
+                        f'followers:{author_id}'
+                    ]
+
+    def apply_on_commit(self, user_id, author_ids, followed, using=None):
+        transaction.on_commit(
+            lambda: self.apply(user_id, author_ids, followed), using=using
+        )
+
+
+follow_graph = FollowGraph()
@@ -0,0 +1,80 @@
+from django.middleware.csrf import get_token
+
+from core.holes import register
+
+from .forms import CommentForm
+from .graph import follow_graph
+from .likes import like_counts, liked_ids
+from .models import GroupFollow
+from .suggestions import suggestions_for
+from .trending import view_post
+
+
+@register('switcher', 'posts/includes/switcher.html')
+def switcher(request):
+    return {}
+
+
+@register('follow_button', 'posts/includes/follow_button.html')
+def follow_button(request, author_id, username):
+    user = request.user
+    return {
+        'username': username,
+        'is_author': user.pk == int(author_id),
+        'following': user.is_authenticated and follow_graph.is_following(
+            user.pk, int(author_id)
+        ),
+    }
+
+
+@register('group_follow_button', 'posts/includes/group_follow_button.html')
+def group_follow_button(request, group_id, slug):
+    user = request.user
+    return {
+        'slug': slug,
+        'following': user.is_authenticated and GroupFollow.objects.filter(
+            user=user, group_id=int(group_id)
+        ).exists(),
+    }
+
+
+@register('follow_suggestions', 'posts/includes/follow_suggestions.html')
+def follow_suggestions(request):
+    if not request.user.is_authenticated:
+        return {'authors': []}
+    return {'authors': suggestions_for(request.user.pk)}
+
+
+@register('post_actions', 'posts/includes/post_actions.html')
+def post_actions(request, post_id, author_id):
+    return {
+        'post_id': post_id,
+        'is_author': request.user.pk == int(author_id),
+    }
+
+
+@register('post_views', 'posts/includes/post_views.html', guest_cache=False)
+def post_views(request, post_id):
+    # Просмотр считается на каждый запрос, поэтому страница поста гостям
+    # из кеша готовых страниц не отдаётся.
+    return {'views': view_post(int(post_id))}
+
+
+@register('likes', 'posts/includes/likes.html')
+def likes(request, ids):
+    # Числа отметок свежие на каждый запрос: отметка не сбрасывает
+    # закешированные страницы.
+    post_ids = [int(pk) for pk in ids.split(',') if pk]
+    context = {'counts': like_counts(post_ids)}
+    # Гостям кнопок нет: без cookie CSRF их страница попадает в кеш гостей.
+    if not request.user.is_authenticated:
+        return context
+    # Скрипт отметок берёт токен для POST из cookie, выставляемой здесь.
+    get_token(request)
+    context['liked'] = sorted(liked_ids(request.user.pk, post_ids))
+    return context
+
+
+@register('comment_form', 'posts/includes/comment_form.html')
+def comment_form(request, post_id):
+    return {'post_id': post_id, 'form': CommentForm()}
@@ -0,0 +1,128 @@
+import random
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.db.models import F, Sum
+
+from core.db import atomic_write
+from core.routers import reading_replicas
+from .models import Like, LikeCounter
+from .sharding import post_shard, shard_querysets
+
+
+def likes_key(post_id):
+    return f'likes:{post_id}'
+
+
+def _using(post_id):
+    return post_shard(post_id) or router.db_for_write(Like)
+
+
+def _count(using, post_id, delta):
+    """Прибавляет delta к случайной части счётчика отметок поста."""
+    slot = random.randrange(settings.LIKE_COUNTER_SLOTS)
+    counters = LikeCounter.objects.using(using).filter(
+        post_id=post_id, slot=slot
+    )
+    if not counters.update(count=F('count') + delta):
+        LikeCounter.objects.using(using).bulk_create(
+            [LikeCounter(post_id=post_id, slot=slot)], ignore_conflicts=True
+        )
+        counters.update(count=F('count') + delta)
+
+
+def _forget(using, post_id):
+    key = likes_key(post_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key), using=using)
+
+
+def set_like(user_id, post_id, liked=True):
+    """Ставит или снимает отметку; возвращает (стоит ли она, число).
+
+    Повтор того же действия ничего не меняет, а счётчик сдвигается только
+    за действительно вставленную или удалённую строку. Отметка и часть
+    счётчика меняются в одной транзакции шарда поста. Области страниц
+    не сдвигаются: карточки кешируются вместе с числом отметок, а
+    закешированные страницы получают свежие числа из дырки likes.
+    """
+    using = _using(post_id)
+    likes = Like.objects.using(using)
+    with atomic_write(using=using):
+        if liked:
+            _, changed = likes.get_or_create(user_id=user_id, post_id=post_id)
+        else:
+            changed, _ = likes.filter(
+                user_id=user_id, post_id=post_id
+            ).delete()
+        if changed:
+            _count(using, post_id, 1 if liked else -1)
+            _forget(using, post_id)
+        return liked, like_counts([post_id])[post_id]
+
+
+def remove_user_likes(user_id):
+    """Снимает все отметки пользователя на всех шардах.
+
+    Каскад удаления пользователя не сдвигает счётчики, поэтому отметки
+    удаляются заранее, а части счётчиков обновляются так же, как при
+    снятии отметки.
+    """
+    for likes in shard_querysets(Like.objects.filter(user_id=user_id)):
+        using = likes.db
+        with atomic_write(using=using):
+            post_ids = list(likes.values_list('post_id', flat=True))
+            if not post_ids:
+                continue
+            likes.delete()
+            for post_id in post_ids:
+                _count(using, post_id, -1)
+                _forget(using, post_id)
+
+
+def like_counts(post_ids):
+    """Число отметок постов: один get_many из кеша на всю страницу.
+
+    Недостающие числа читаются суммой частей счётчика — одним запросом
+    на шард — и кладутся в кеш одним set_many, если прочитаны не из
+    реплик: у числа отметок нет версии, по которой видно отставание.
+    """
+    keys = {likes_key(post_id): post_id for post_id in post_ids}
+    cached = cache.get_many(keys)
+    counts = {keys[key]: count for key, count in cached.items()}
+    by_shard = defaultdict(list)
+    for post_id in post_ids:
+        if post_id not in counts:
+            by_shard[post_shard(post_id)].append(post_id)
+    missing = {}
+    for alias, ids in by_shard.items():
+        rows = LikeCounter.objects.using(alias).filter(
+            post_id__in=ids
+        ).order_by().values_list('post_id').annotate(total=Sum('count'))
+        found = dict(rows)
+        missing.update({post_id: found.get(post_id, 0) for post_id in ids})
+    if missing and not reading_replicas() and not any(
+        connections[alias or DEFAULT_DB_ALIAS].in_atomic_block
+        for alias in by_shard
+    ):
+        cache.set_many(
+            {likes_key(pk): count for pk, count in missing.items()},
+            settings.LIKE_COUNT_TIMEOUT,
+        )
+    counts.update(missing)
+    return counts
+
+
+def liked_ids(user_id, post_ids):
+    """Какие из постов отметил пользователь: запрос на шард."""
+    by_shard = defaultdict(list)
+    for post_id in post_ids:
+        by_shard[post_shard(post_id)].append(post_id)
+    liked = set()
+    for alias, ids in by_shard.items():
+        liked.update(Like.objects.using(alias).filter(
+            user_id=user_id, post_id__in=ids
+        ).values_list('post_id', flat=True))
+    return liked
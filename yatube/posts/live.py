@@ -0,0 +1,130 @@
+import asyncio
+import json
+
+from django.conf import settings
+
+from core.asgi import (database_sync_to_async, get_user_id, header,
+                       query_params, send_response)
+from core.pubsub import Broker, Subscription
+
+from .models import Follow, Group, GroupFollow
+
+new_posts = Broker(history=settings.LIVE_HISTORY_SIZE)
+
+
+def publish_post(post):
+    new_posts.publish(
+        post_id=post.pk, author_id=post.author_id, group_id=post.group_id
+    )
+
+
+@database_sync_to_async
+def load_filter(params, user_id):
+    """Условие отбора событий: пост группы, из подписок или любой."""
+    if params.get('group'):
+        group_id = Group.objects.get(slug=params['group']).pk
+        return lambda event: event['group_id'] == group_id
+    if user_id is not None:
+        authors = set(Follow.objects.filter(user_id=user_id).values_list(
+            'author_id', flat=True
+        ))
+        groups = set(GroupFollow.objects.filter(
+            user_id=user_id
+        ).values_list('group_id', flat=True))
+        return lambda event: (
+            event['author_id'] in authors or event['group_id'] in groups
+        )
+    return lambda event: True
+
+
+def notification(events):
+    return json.dumps({'count': len(events), 'last': events[-1]['seq']})
+
+
+async def wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def stream(receive, send, match, last):
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    disconnected = asyncio.ensure_future(wait_disconnect(receive))
+    try:
+        with Subscription(new_posts, match) as subscription:
+            while True:
+                events = new_posts.since(last, match)
+                if events:
+                    last = events[-1]['seq']
+                    body = (
+                        f'id: {last}\nevent: new-posts\n'
+                        f'data: {notification(events)}\n\n'
+                    )
+                else:
+                    waiter = asyncio.ensure_future(
+                        subscription.wait(settings.LIVE_KEEPALIVE_SECONDS)
+                    )
+                    await asyncio.wait(
+                        {waiter, disconnected},
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                    if disconnected.done():
+                        waiter.cancel()
+                        return
+                    if waiter.result():
+                        continue
+                    body = ': keepalive\n\n'
+                await send({
+                    'type': 'http.response.body',
+                    'body': body.encode(),
+                    'more_body': True,
+                })
+    finally:
+        disconnected.cancel()
+
+
+async def long_poll(send, match, last):
+    events = new_posts.since(last, match)
+    if not events:
+        with Subscription(new_posts, match) as subscription:
+            await subscription.wait(settings.LIVE_POLL_TIMEOUT)
+        events = new_posts.since(last, match)
+    body = notification(events) if events else json.dumps(
+        {'count': 0, 'last': max(last, new_posts.last_seq)}
+    )
+    await send_response(send, 200, body.encode(), 'application/json')
+
+
+async def live_posts(scope, receive, send):
+    """ASGI-приложение уведомлений о новых постах.
+
+    По умолчанию отдаёт поток Server-Sent Events, с параметром poll=1
+    отвечает один раз, дождавшись новых постов (long polling).
+    Параметры group=<slug> и following=1 сужают поток до постов группы
+    или авторов и групп из подписок. Номер последнего события берётся из last
+    или заголовка Last-Event-ID.
+    """
+    if scope['method'] != 'GET':
+        return await send_response(send, 405)
+    params = query_params(scope)
+    user_id = None
+    if params.get('following'):
+        user_id = await get_user_id(scope)
+        if user_id is None:
+            return await send_response(send, 403)
+    try:
+        match = await load_filter(params, user_id)
+    except Group.DoesNotExist:
+        return await send_response(send, 404)
+    last = params.get('last') or header(scope, 'last-event-id') or ''
+    last = int(last) if last.isdigit() else new_posts.last_seq
+    if params.get('poll'):
+        return await long_poll(send, match, last)
+    return await stream(receive, send, match, last)
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.db import atomic_write
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет сохранённый HTML текста постов и комментариев, '
+        'записанных до его появления или в обход save().'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько строк обновлять в одной транзакции.'
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перерендерить все строки, а не только пустые.'
+        )
+
+    def backfill(self, model, using, batch_size, everything):
+        queryset = model.objects.using(using).order_by('pk')
+        if not everything:
+            queryset = queryset.filter(text_html='')
+        last_pk = 0
+        total = 0
+        while True:
+            batch = list(
+                queryset.filter(pk__gt=last_pk).only('pk', 'text')[
+                    :batch_size
+                ]
+            )
+            if not batch:
+                return total
+            for obj in batch:
+                obj.text_html = obj.render_text(obj.text)
+            with atomic_write(using=using):
+                model.objects.using(using).bulk_update(batch, ['text_html'])
+            last_pk = batch[-1].pk
+            total += len(batch)
+
+    def handle(self, *args, **options):
+        for using in settings.SHARD_DATABASES or ['default']:
+            for model in (Post, Comment):
+                total = self.backfill(
+                    model, using, options['batch_size'], options['all']
+                )
+                self.stdout.write(
+                    f'{model._meta.verbose_name_plural} ({using}): '
+                    f'обновлено {total}'
+                )
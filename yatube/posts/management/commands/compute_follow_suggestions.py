@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.suggestions import compute_suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации «кого почитать»: друзья друзей с '
+        'весом за общие группы, лучшие на каждого пользователя.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int,
+            default=settings.FOLLOW_SUGGESTIONS_CHUNK,
+            help='Сколько пользователей считать за один проход.'
+        )
+        parser.add_argument(
+            '--top', type=int, default=settings.FOLLOW_SUGGESTIONS_TOP,
+            help='Сколько рекомендаций хранить на пользователя.'
+        )
+
+    def progress(self, done, total):
+        self.stdout.write(f'{done}/{total}', ending='\r')
+        self.stdout.flush()
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = compute_suggestions(
+            options['chunk_size'], options['top'], progress=self.progress
+        )
+        self.stdout.write(
+            f'Записано рекомендаций: {total} '
+            f'за {time.monotonic() - started:.1f} с'
+        )
@@ -0,0 +1,28 @@
+import time
+from itertools import groupby
+from operator import itemgetter
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Follow
+from posts.timeline import backfill
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет ленты подписок последними постами авторов из '
+        'подписок; нужен один раз для подписок, созданных до лент.'
+    )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        follows = Follow.objects.order_by('user_id').values_list(
+            'user_id', 'author_id'
+        ).iterator()
+        users = 0
+        for user_id, pairs in groupby(follows, key=itemgetter(0)):
+            backfill(user_id, [author_id for _, author_id in pairs])
+            users += 1
+        self.stdout.write(
+            f'Заполнено лент: {users} за {time.monotonic() - started:.1f} с'
+        )
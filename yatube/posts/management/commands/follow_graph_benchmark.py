@@ -0,0 +1,76 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.management.commands.asgi_benchmark import rss_kb
+from posts.graph import Adjacency
+
+
+def sorted_edges(users, edges, seed):
+    """Случайные рёбра (вершина, сосед), отсортированные по обоим."""
+    rng = random.Random(seed)
+    degree = edges // users
+    for source in range(1, users + 1):
+        for target in sorted(rng.sample(range(1, users + 1), degree)):
+            yield source, target
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет граф подписок в памяти на синтетических данных: время '
+        'сборки, занятую память, проверку подписки и обход подписчиков.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--edges', type=int, default=10_000_000)
+        parser.add_argument('--users', type=int, default=1_000_000)
+        parser.add_argument('--lookups', type=int, default=1_000_000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        users = options['users']
+        base = rss_kb()
+        started = time.monotonic()
+        adjacency = Adjacency.from_sorted(
+            sorted_edges(users, options['edges'], options['seed'])
+        )
+        built = time.monotonic() - started
+        grown = (rss_kb() - base) / 1024
+        edges = len(adjacency.targets)
+        self.stdout.write(
+            f'{edges} рёбер, {users} вершин: сборка {built:.1f} с, '
+            f'массивы {adjacency.nbytes() / 2 ** 20:.1f} МБ '
+            f'({adjacency.nbytes() / edges:.2f} байта на ребро), '
+            f'прирост RSS {grown:.1f} МБ'
+        )
+
+        rng = random.Random(options['seed'])
+        pairs = []
+        for _ in range(options['lookups']):
+            source = rng.randint(1, users)
+            neighbours = adjacency.neighbours(source)
+            # Половина проверок попадает в существующие подписки.
+            if neighbours and rng.random() < 0.5:
+                pairs.append((source, rng.choice(neighbours)))
+            else:
+                pairs.append((source, rng.randint(1, users)))
+        started = time.monotonic()
+        found = sum(
+            adjacency.contains(source, target) for source, target in pairs
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'проверка подписки: {elapsed / len(pairs) * 1e9:.0f} нс, '
+            f'найдено {found} из {len(pairs)}'
+        )
+
+        sources = range(1, min(users, 100_000) + 1)
+        started = time.monotonic()
+        visited = sum(
+            1 for source in sources for _ in adjacency.neighbours(source)
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'обход соседей: {visited / elapsed / 1e6:.1f} млн в секунду'
+        )
@@ -0,0 +1,47 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    FollowCounter = apps.get_model('posts', 'FollowCounter')
+    using = schema_editor.connection.alias
+    users = User.objects.using(using).annotate(
+        followers=Count('following', distinct=True),
+        following_count=Count('follower', distinct=True),
+    ).values_list('pk', 'followers', 'following_count')
+    FollowCounter.objects.using(using).bulk_create(
+        [
+            FollowCounter(user_id=pk, followers=followers, following=following)
+            for pk, followers, following in users.iterator()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0026_post_created_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FollowCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='follow_counter', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('followers', models.PositiveIntegerField(default=0, verbose_name='Подписчики')),
+                ('following', models.PositiveIntegerField(default=0, verbose_name='Подписки')),
+            ],
+            options={
+                'verbose_name': 'Счётчик подписок',
+                'verbose_name_plural': 'Счётчики подписок',
+            },
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+READERS_BATCH = 1000
+
+
+def fill_timelines(apps, schema_editor):
+    """Раскладывает в ленты последние посты авторов из подписок.
+
+    Так же, как при подписке: до TIMELINE_BACKFILL постов на автора,
+    авторы от порога раскладки пропускаются. Когда посты лежат в
+    шардах, ленты заполняет команда fill_timelines.
+    """
+    if settings.SHARD_DATABASES:
+        return
+    using = schema_editor.connection.alias
+    Follow = apps.get_model('posts', 'Follow')
+    FollowCounter = apps.get_model('posts', 'FollowCounter')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    follows = Follow.objects.using(using)
+    celebrities = set(FollowCounter.objects.using(using).filter(
+        followers__gte=settings.TIMELINE_FANOUT_THRESHOLD
+    ).values_list('user_id', flat=True))
+    author_ids = follows.order_by().values_list(
+        'author_id', flat=True
+    ).distinct()
+    for author_id in author_ids:
+        if author_id in celebrities:
+            continue
+        posts = list(Post.objects.using(using).filter(
+            author_id=author_id
+        ).order_by('-created', '-pk').values_list(
+            'pk', 'group_id', 'created'
+        )[:settings.TIMELINE_BACKFILL])
+        if not posts:
+            continue
+        readers = list(follows.filter(author_id=author_id).values_list(
+            'user_id', flat=True
+        ))
+        for start in range(0, len(readers), READERS_BATCH):
+            TimelineEntry.objects.using(using).bulk_create(
+                [
+                    TimelineEntry(
+                        user_id=user_id, author_id=author_id, post_id=pk,
+                        group_id=group_id, created=created,
+                    )
+                    for user_id in readers[start:start + READERS_BATCH]
+                    for pk, group_id, created in posts
+                ],
+                batch_size=500,
+                ignore_conflicts=True,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0029_groupfollow'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_id', models.BigIntegerField(verbose_name='Пост')),
+                ('group_id', models.IntegerField(blank=True, null=True, verbose_name='Группа поста')),
+                ('created', models.DateTimeField(verbose_name='Дата публикации')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор поста')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='Читатель')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи лент',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'created', 'post_id'], name='timeline_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['post_id'], name='timeline_post_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post_id'), name='unique_timeline_post'),
+        ),
+        migrations.RunPython(
+            fill_timelines,
+            migrations.RunPython.noop,
+            hints={'model_name': 'timelineentry'},
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+PATH_STEP = 12
+
+
+def fill_paths(apps, schema_editor):
+    """Все прежние комментарии становятся корнями обсуждений."""
+    Comment = apps.get_model('posts', 'Comment')
+    comments = Comment.objects.using(schema_editor.connection.alias)
+    batch = []
+    for comment in comments.only('pk').iterator():
+        comment.path = f'{10 ** PATH_STEP - comment.pk:0{PATH_STEP}d}'
+        batch.append(comment)
+        if len(batch) == 500:
+            comments.bulk_update(batch, ['path'])
+            batch = []
+    comments.bulk_update(batch, ['path'])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0032_likes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Уровень вложенности'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='posts.Comment', verbose_name='Ответ на'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(default='', editable=False, max_length=255, verbose_name='Путь в обсуждении'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='replies_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Ответы'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comment_post_path_idx'),
+        ),
+        migrations.RunPython(
+            fill_paths,
+            migrations.RunPython.noop,
+            hints={'model_name': 'comment'},
+        ),
+    ]
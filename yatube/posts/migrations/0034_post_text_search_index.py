@@ -0,0 +1,32 @@
+# Generated by Django 2.2.16 on 2026-10-19 12:00
+
+from django.db import migrations
+
+INDEX = 'posts_post_text_search_idx'
+
+
+def create_index(apps, schema_editor):
+    """GIN-индекс по тексту постов для поиска в PostgreSQL."""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {INDEX} ON posts_post '
+            "USING GIN (to_tsvector('russian', text))"
+        )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0033_comment_threads'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_index, drop_index, hints={'model_name': 'post'}
+        ),
+    ]
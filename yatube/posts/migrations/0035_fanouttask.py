@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-19 10:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0034_post_text_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FanOutTask',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_id', models.BigIntegerField(unique=True, verbose_name='Пост')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Поставлена')),
+            ],
+            options={
+                'verbose_name': 'Раскладка поста',
+                'verbose_name_plural': 'Раскладки постов',
+            },
+        ),
+    ]
@@ -1,11 +1,59 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, router
+from django.db.models import F
+from django.template.defaultfilters import linebreaks_filter, linebreaksbr
+from django.utils.safestring import mark_safe
 
+from core.db import atomic_write
 from core.models import CreatedModel
 
 User = get_user_model()
 
 
+class RenderedTextModel(models.Model):
+    """Абстрактная модель. Хранит текст, уже переведённый в HTML.
+
+    HTML обновляется при сохранении; строки, записанные в обход save(),
+    рендерятся на лету, пока их не заполнит команда backfill_text_html.
+    """
+    text_html = models.TextField(
+        verbose_name='Текст в HTML',
+        blank=True,
+        editable=False,
+    )
+
+    class Meta:
+        abstract = True
+
+    render_text = staticmethod(linebreaks_filter)
+
+    def rendered_text(self):
+        return mark_safe(self.text_html or self.render_text(self.text))
+
+    def save(self, *args, **kwargs):
+        self.text_html = self.render_text(self.text)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'text' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'text_html'}
+        super().save(*args, **kwargs)
+
+
+class ShardedQuerySet(models.QuerySet):
+    """QuerySet, чей create выбирает шард по самому объекту.
+
+    Стандартный create сохраняет в базу менеджера, которую роутер
+    определяет без объекта и поэтому не знает шард автора.
+    """
+
+    def create(self, **kwargs):
+        if self._db is not None:
+            return super().create(**kwargs)
+        obj = self.model(**kwargs)
+        obj.save(force_insert=True)
+        return obj
+
+
 class Group(models.Model):
     title = models.CharField(
         max_length=200,
@@ -25,7 +73,15 @@ class Group(models.Model):
         return self.title
 
 
-class Post(CreatedModel):
+class PostIdSequence(models.Model):
+    """Счётчик для выдачи id постов при шардировании."""
+
+    class Meta:
+        verbose_name = 'Счётчик id постов'
+        verbose_name_plural = 'Счётчики id постов'
+
+
+class Post(CreatedModel, RenderedTextModel):
     text = models.TextField(
         verbose_name='Текст поста',
         help_text='Введите текст поста'
@@ -33,6 +89,7 @@ class Post(CreatedModel):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_constraint=settings.POSTS_FOREIGN_KEYS,
         related_name='posts',
         verbose_name='Автор'
     )
@@ -41,6 +98,7 @@ class Post(CreatedModel):
         blank=True,
         null=True,
         on_delete=models.SET_NULL,
+        db_constraint=settings.POSTS_FOREIGN_KEYS,
         related_name='posts',
         verbose_name='Группа',
         help_text='Группа, к которой будет относиться пост'
@@ -51,26 +109,100 @@ class Post(CreatedModel):
         blank=True,
         null=True
     )
+    views = models.PositiveIntegerField(
+        verbose_name='Просмотры',
+        default=0,
+        editable=False,
+    )
+
+    objects = ShardedQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['created', 'id'], name='post_created_idx'),
+            models.Index(
+                fields=['group', 'created', 'id'],
+                name='post_group_created_idx'
+            ),
+            models.Index(
+                fields=['author', 'created', 'id'],
+                name='post_author_created_idx'
+            ),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
     def __str__(self) -> str:
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        """Просмотры пишет только счётчик: обычное сохранение их не трогает."""
+        if not self._state.adding and not kwargs.get('force_insert') and (
+            kwargs.get('update_fields') is None
+        ):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'views'
+            ]
+        super().save(*args, **kwargs)
+
+
+PATH_STEP = 12
+PATH_ROOT = 10 ** PATH_STEP
+# Символ сразу после цифр: path < prefix + PATH_END отсекает поддерево.
+PATH_END = ':'
+
+
+def comment_path(pk, parent=None):
+    """Материализованный путь комментария: по PATH_STEP цифр на уровень.
+
+    Корень хранит дополнение id до PATH_ROOT, поэтому новые обсуждения
+    идут первыми, а ответы внутри обсуждения — по порядку написания.
+    Id вне 1..PATH_ROOT - 1 не помещается в шаг и ломает порядок.
+    """
+    if not 0 < pk < PATH_ROOT:
+        raise ValueError(f'id комментария {pk} не помещается в путь')
+    if parent is None:
+        return f'{PATH_ROOT - pk:0{PATH_STEP}d}'
+    return f'{parent.path}{pk:0{PATH_STEP}d}'
 
-class Comment(CreatedModel):
+
+class Comment(CreatedModel, RenderedTextModel):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
         related_name='comments',
         verbose_name='Название поста',
     )
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='replies',
+        verbose_name='Ответ на',
+    )
+    path = models.CharField(
+        verbose_name='Путь в обсуждении',
+        max_length=255,
+        default='',
+        editable=False,
+    )
+    depth = models.PositiveSmallIntegerField(
+        verbose_name='Уровень вложенности',
+        default=0,
+        editable=False,
+    )
+    replies_count = models.PositiveIntegerField(
+        verbose_name='Ответы',
+        default=0,
+        editable=False,
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_constraint=settings.POSTS_FOREIGN_KEYS,
         related_name='comments',
         verbose_name='Имя автора',
     )
@@ -78,14 +210,105 @@ class Comment(CreatedModel):
         verbose_name='Текст комментария',
     )
 
+    objects = ShardedQuerySet.as_manager()
+
+    render_text = staticmethod(linebreaksbr)
+
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', 'path'], name='comment_post_path_idx'
+            ),
+        ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
     def __str__(self) -> str:
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        """Новому комментарию после вставки записывает путь и уровень.
+
+        Путь строится из id, поэтому выставляется вторым запросом в той же
+        транзакции. Ответы глубже COMMENT_MAX_DEPTH прикрепляются к
+        родителю родителя, чтобы путь не рос без предела.
+        """
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        parent = self.parent
+        if parent is not None and parent.depth >= settings.COMMENT_MAX_DEPTH:
+            parent = self.parent = parent.parent
+        self.depth = parent.depth + 1 if parent else 0
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self
+        )
+        with atomic_write(using=using):
+            super().save(*args, **kwargs)
+            self.path = comment_path(self.pk, parent)
+            comments = type(self).objects.using(self._state.db)
+            comments.filter(pk=self.pk).update(path=self.path)
+            if parent is not None:
+                comments.filter(pk=parent.pk).update(
+                    replies_count=F('replies_count') + 1
+                )
+
+
+class Like(models.Model):
+    """Отметка «нравится»: не больше одной от пользователя на пост."""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='likes',
+        verbose_name='Пост',
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        db_constraint=settings.POSTS_FOREIGN_KEYS,
+        related_name='likes',
+        verbose_name='Пользователь',
+    )
+
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Отметка «нравится»'
+        verbose_name_plural = 'Отметки «нравится»'
+        constraints = (
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_like'
+            ),
+        )
+
+
+class LikeCounter(models.Model):
+    """Одна из LIKE_COUNTER_SLOTS частей счётчика отметок поста.
+
+    Отметка меняет случайную часть, поэтому одновременные отметки
+    популярного поста не ждут блокировки одной строки. Число отметок —
+    сумма частей.
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='like_counters',
+        verbose_name='Пост',
+    )
+    slot = models.PositiveSmallIntegerField(verbose_name='Часть')
+    count = models.IntegerField(verbose_name='Отметки', default=0)
+
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Счётчик отметок'
+        verbose_name_plural = 'Счётчики отметок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=['post', 'slot'], name='unique_like_counter_slot'
+            ),
+        )
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -113,3 +336,147 @@ class Follow(models.Model):
 
     def __str__(self) -> str:
         return f'{self.user.username} следит за {self.author.username}'
+
+
+class GroupFollow(models.Model):
+    """Подписка пользователя на группу: её посты попадают в ленту."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='group_follows',
+        verbose_name='Подписчик',
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='followers',
+        verbose_name='Группа',
+    )
+
+    class Meta:
+        verbose_name = 'Подписка на группу'
+        verbose_name_plural = 'Подписки на группы'
+        constraints = (
+            models.UniqueConstraint(
+                fields=['user', 'group'],
+                name='unique_group_following'
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f'{self.user.username} следит за группой {self.group.title}'
+
+
+class TimelineEntry(models.Model):
+    """Пост в ленте подписчика, разложенный туда при публикации.
+
+    Посты могут лежать в шардах, поэтому вместо внешнего ключа хранится
+    id поста, а время публикации и группа повторены для сортировки
+    и подсчёта ленты.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор поста',
+    )
+    post_id = models.BigIntegerField(verbose_name='Пост')
+    group_id = models.IntegerField(
+        verbose_name='Группа поста', null=True, blank=True
+    )
+    created = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+        constraints = (
+            models.UniqueConstraint(
+                fields=['user', 'post_id'], name='unique_timeline_post'
+            ),
+        )
+        indexes = [
+            models.Index(
+                fields=['user', 'created', 'post_id'],
+                name='timeline_user_created_idx'
+            ),
+            models.Index(fields=['post_id'], name='timeline_post_idx'),
+        ]
+
+
+class FollowCounter(models.Model):
+    """Счётчики подписчиков и подписок пользователя.
+
+    Меняются сервисом posts.follows в той же транзакции, что и подписки,
+    поэтому профилю не нужен COUNT по таблице подписок.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='follow_counter',
+        verbose_name='Пользователь',
+    )
+    followers = models.PositiveIntegerField(
+        verbose_name='Подписчики', default=0
+    )
+    following = models.PositiveIntegerField(
+        verbose_name='Подписки', default=0
+    )
+
+    class Meta:
+        verbose_name = 'Счётчик подписок'
+        verbose_name_plural = 'Счётчики подписок'
+
+
+class FanOutTask(models.Model):
+    """Пост, ещё не разложенный по лентам подписчиков.
+
+    Строка появляется вместе с постом и удаляется после раскладки,
+    поэтому раскладки, не выполненные до перезапуска, подхватывает
+    posts.timeline.resume_fan_outs.
+    """
+    post_id = models.BigIntegerField(verbose_name='Пост', unique=True)
+    created = models.DateTimeField(
+        verbose_name='Поставлена', auto_now_add=True
+    )
+
+    class Meta:
+        verbose_name = 'Раскладка поста'
+        verbose_name_plural = 'Раскладки постов'
+
+
+class FollowSuggestion(models.Model):
+    """Автор, на которого стоит подписаться пользователю.
+
+    Заполняется командой compute_follow_suggestions: лучшие
+    FOLLOW_SUGGESTIONS_TOP авторов на пользователя.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions',
+        verbose_name='Пользователь',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    score = models.FloatField(verbose_name='Оценка')
+
+    class Meta:
+        ordering = ['-score']
+        indexes = [
+            models.Index(
+                fields=['user', '-score'], name='suggestion_user_score_idx'
+            ),
+        ]
+        verbose_name = 'Рекомендация подписки'
+        verbose_name_plural = 'Рекомендации подписок'
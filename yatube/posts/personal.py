@@ -0,0 +1,92 @@
+from django.conf import settings
+from django.db.models import Max, Q
+
+from .feeds import KeysetSource, merge_sources
+from .sharding import author_querysets, shard_querysets
+
+
+def personal_querysets(queryset, author_ids, group_ids):
+    """Посты авторов и групп из подписок: одна выборка на шард."""
+    return shard_querysets(queryset.filter(
+        Q(author_id__in=list(author_ids)) | Q(group_id__in=group_ids)
+    ))
+
+
+def heads(queryset, field):
+    """Пары (значение field, время самого нового поста) одним запросом."""
+    return queryset.prefetch_related(None).order_by().values_list(
+        field
+    ).annotate(head=Max('created'))
+
+
+def personal_sources(queryset, author_ids, group_ids, batch,
+                     source_class=KeysetSource):
+    """Источники личной ленты: по одному на автора и на группу в шарде.
+
+    Время самого нового поста всех источников шарда читается одним
+    запросом по индексам (author, created) и (group, created); авторы и
+    группы без постов в слияние не попадают.
+    """
+    sources = []
+    by_field = (
+        ('author_id', author_querysets(queryset, author_ids)),
+        ('group_id', shard_querysets(
+            queryset.filter(group_id__in=group_ids)
+        )),
+    )
+    for field, querysets in by_field:
+        for shard in querysets:
+            base = queryset.using(shard.db)
+            sources += [
+                source_class(base.filter(**{field: value}), head, batch)
+                for value, head in heads(shard, field)
+            ]
+    return sources
+
+
+class PersonalFeed:
+    """Лента подписок на авторов и группы для Paginator.
+
+    Срез [start:stop] собирается слиянием merge_sources, поэтому не
+    зависит от того, на сколько источников подписан пользователь.
+    Количество считается одним COUNT на шард по объединённому условию,
+    так что пост автора из подписок в группе из подписок учтён один раз.
+    """
+
+    def __init__(self, queryset, author_ids, group_ids):
+        self.queryset = queryset
+        self.author_ids = list(author_ids)
+        self.group_ids = list(group_ids)
+
+    def sources(self, batch):
+        return personal_sources(
+            self.queryset, self.author_ids, self.group_ids, batch
+        )
+
+    def count(self):
+        return sum(
+            queryset.count() for queryset in personal_querysets(
+                self.queryset, self.author_ids, self.group_ids
+            )
+        )
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start = index.start or 0
+            stop = index.stop
+            if stop is None:
+                stop = self.count()
+            if stop <= start:
+                return []
+            sources = self.sources(min(stop, settings.FEED_SOURCE_BATCH))
+            return merge_sources(sources, stop)[start:]
+        items = self[index:index + 1]
+        if not items:
+            raise IndexError('Индекс за пределами ленты')
+        return items[0]
+
+    def __iter__(self):
+        return iter(self[0:None])
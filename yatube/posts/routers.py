@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from .sharding import shard_for_author
+
+SHARDED_MODELS = {
+    'posts.post', 'posts.comment', 'posts.like', 'posts.likecounter'
+}
+
+
+class AuthorShardRouter:
+    """Раскладывает посты и комментарии по шардам по id автора поста.
+
+    Комментарии и отметки хранятся рядом с постом, чтобы страница поста читала
+    один шард. Выборки без подсказки instance роутер не маршрутизирует,
+    их нужно явно направлять через posts.sharding.
+    """
+
+    def _shard(self, model, hints):
+        shards = settings.SHARD_DATABASES
+        instance = hints.get('instance')
+        if not shards or instance is None:
+            return None
+        if model._meta.label_lower not in SHARDED_MODELS:
+            if instance._state.db in shards:
+                return 'default'
+            return None
+        if isinstance(instance, get_user_model()):
+            return shard_for_author(instance.pk)
+        author_id = instance.__dict__.get('author_id')
+        if instance._meta.label_lower == 'posts.post' and author_id:
+            return shard_for_author(author_id)
+        post_field = getattr(type(instance), 'post', None)
+        if post_field is not None and post_field.is_cached(instance):
+            return shard_for_author(instance.post.author_id)
+        if instance._state.db in shards:
+            return instance._state.db
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._shard(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if settings.SHARD_DATABASES:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db not in settings.SHARD_DATABASES:
+            return None
+        return f'{app_label}.{model_name}' in SHARDED_MODELS
@@ -0,0 +1,82 @@
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'posts_post_fts'
+
+# Выражение должно совпадать с индексом из миграции 0034, иначе
+# PostgreSQL не сможет им воспользоваться.
+PG_VECTOR = "to_tsvector('russian', text)"
+
+FTS_SCHEMA = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+    "text, content='posts_post', content_rowid='id')",
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON posts_post '
+    f'BEGIN INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); '
+    'END',
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON posts_post '
+    f'BEGIN INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) '
+    "VALUES ('delete', old.id, old.text); END",
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au '
+    'AFTER UPDATE OF text ON posts_post '
+    f'BEGIN INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) '
+    "VALUES ('delete', old.id, old.text); "
+    f'INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); END',
+)
+
+
+def ensure_fts(using='default'):
+    """Создаёт полнотекстовый индекс постов для SQLite.
+
+    Django пересоздаёт таблицу при изменении схемы в SQLite и теряет
+    триггеры, поэтому функция вызывается после каждой миграции и
+    перестраивает индекс, если триггеров не было.
+    """
+    connection = connections[using]
+    if (
+        connection.vendor != 'sqlite'
+        or 'posts_post' not in connection.introspection.table_names()
+    ):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' "
+            'AND name LIKE %s',
+            [f'{FTS_TABLE}_%']
+        )
+        installed = cursor.fetchone()[0] == len(FTS_SCHEMA) - 1
+        if installed:
+            return
+        for statement in FTS_SCHEMA:
+            cursor.execute(statement)
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+        )
+
+
+def fts_query(search_term):
+    """Превращает строку поиска в запрос FTS5 по префиксам слов."""
+    words = search_term.replace('"', ' ').split()
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_posts(queryset, search_term):
+    """Полнотекстовый поиск по тексту постов.
+
+    Возвращает None, если СУБД не поддерживает полнотекстовый поиск.
+    """
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        query = fts_query(search_term)
+        if not query:
+            return queryset
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [query]
+        ))
+    if vendor == 'postgresql':
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT id FROM posts_post WHERE {PG_VECTOR} '
+            "@@ plainto_tsquery('russian', %s)",
+            [search_term]
+        ))
+    return None
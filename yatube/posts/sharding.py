@@ -0,0 +1,94 @@
+from django.conf import settings
+
+from .feeds import MergedFeed
+
+
+def shard_for_author(author_id):
+    """Шард, в котором хранятся посты автора и комментарии к ним."""
+    shards = settings.SHARD_DATABASES
+    return shards[author_id % len(shards)]
+
+
+def post_shard(post_id):
+    """Шард поста по его id или None без шардирования.
+
+    id постов выдаются так, что остаток от деления на число шардов равен
+    номеру шарда автора, поэтому пост находится без перебора шардов.
+    """
+    shards = settings.SHARD_DATABASES
+    if not shards:
+        return None
+    return shards[post_id % len(shards)]
+
+
+def allocate_post_id(author_id):
+    """Выдаёт глобально уникальный id поста, указывающий на шард автора."""
+    from .models import PostIdSequence
+
+    shards = len(settings.SHARD_DATABASES)
+    sequence = PostIdSequence.objects.using('default').create()
+    return sequence.pk * shards + author_id % shards
+
+
+def with_relations(queryset, *fields):
+    """Подгружает связанные объекты одним join или отдельными запросами.
+
+    Пользователи и группы живут в основной базе, поэтому при
+    шардировании join невозможен и используется prefetch_related.
+    """
+    if settings.SHARD_DATABASES:
+        return queryset.prefetch_related(*fields)
+    return queryset.select_related(*fields)
+
+
+def shard_querysets(queryset):
+    """Копии выборки для каждого шарда или сама выборка без шардов."""
+    shards = settings.SHARD_DATABASES
+    if not shards:
+        return [queryset]
+    return [queryset.using(alias) for alias in shards]
+
+
+def sharded(queryset):
+    """Собирает выборку постов со всех шардов.
+
+    Без шардирования возвращает queryset как есть.
+    """
+    if not settings.SHARD_DATABASES:
+        return queryset
+    return MergedFeed(shard_querysets(queryset))
+
+
+def author_querysets(queryset, author_ids):
+    """Выборки постов авторов author_ids: каждому шарду — только его авторы.
+
+    Без шардирования author_ids может быть подзапросом к основной базе.
+    """
+    if not settings.SHARD_DATABASES:
+        return [queryset.filter(author_id__in=author_ids)]
+    by_shard = {}
+    for author_id in author_ids:
+        by_shard.setdefault(shard_for_author(author_id), []).append(author_id)
+    return [
+        queryset.using(alias).filter(author_id__in=ids)
+        for alias, ids in sorted(by_shard.items())
+    ]
+
+
+def sharded_by_authors(queryset, author_ids):
+    """Посты авторов author_ids со всех шардов."""
+    querysets = author_querysets(queryset, author_ids)
+    if not settings.SHARD_DATABASES:
+        return querysets[0]
+    return MergedFeed(querysets)
+
+
+def load_posts(queryset, post_ids):
+    """Посты по id в том же порядке; удалённые пропускаются."""
+    by_shard = {}
+    for post_id in post_ids:
+        by_shard.setdefault(post_shard(post_id), []).append(post_id)
+    found = {}
+    for alias, ids in by_shard.items():
+        found.update(queryset.using(alias).in_bulk(ids))
+    return [found[post_id] for post_id in post_ids if post_id in found]
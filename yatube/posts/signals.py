@@ -0,0 +1,203 @@
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from core.versioning import bump
+
+from .follows import count_follows
+from .live import publish_post
+from .models import (Comment, FanOutTask, Follow, FollowCounter, Group,
+                     GroupFollow, Post)
+from .search import ensure_fts
+from .sharding import allocate_post_id, shard_for_author, shard_querysets
+from .timeline import (backfill, move_post, move_posts, remove_post,
+                       schedule_fan_out, unfollow_authors)
+
+User = get_user_model()
+
+
+def post_scopes(post):
+    """Области, которые затрагивает изменение поста."""
+    scopes = ['posts', f'author:{post.author_id}', f'post:{post.pk}']
+    if post.group_id:
+        scopes.append(f'group:{post.group_id}')
+    return scopes
+
+
+@receiver(pre_save, sender=Post)
+def assign_shard_id(sender, instance, **kwargs):
+    """При шардировании выдаёт новому посту id, указывающий на шард."""
+    if settings.SHARD_DATABASES and instance.pk is None:
+        instance.pk = allocate_post_id(instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_group(sender, instance, update_fields=None, **kwargs):
+    """Запоминает прежнюю группу, чтобы сбросить и её ленту.
+
+    Если группа не сохраняется, она не меняется и читать её не нужно.
+    """
+    instance._old_group_id = None
+    if update_fields is not None and 'group' not in update_fields:
+        instance._old_group_id = instance.group_id
+    elif not instance._state.adding:
+        instance._old_group_id = Post.objects.using(
+            instance._state.db
+        ).filter(pk=instance.pk).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, **kwargs):
+    scopes = post_scopes(instance)
+    old_group_id = getattr(instance, '_old_group_id', None)
+    if old_group_id and old_group_id != instance.group_id:
+        scopes.append(f'group:{old_group_id}')
+    bump(*scopes, using=instance._state.db)
+
+
+@receiver(post_save, sender=Post)
+def move_timeline_post(sender, instance, created, **kwargs):
+    """Переносит записи лент вслед за сменой группы поста."""
+    old_group_id = getattr(instance, '_old_group_id', None)
+    if not created and old_group_id != instance.group_id:
+        move_post(instance.pk, instance.group_id)
+
+
+@receiver(post_save, sender=Post)
+def announce_post(sender, instance, created, **kwargs):
+    """После коммита сообщает подписчикам живой ленты о новом посте."""
+    if created:
+        transaction.on_commit(
+            partial(publish_post, instance), using=instance._state.db
+        )
+
+
+@receiver(post_save, sender=Post)
+def push_post(sender, instance, created, raw=False, **kwargs):
+    """После коммита раскладывает новый пост по лентам подписчиков.
+
+    Задача раскладки записывается в базу, чтобы пережить перезапуск.
+    С BACKGROUND_JOBS_EAGER раскладка идёт сразу, в той же транзакции.
+    """
+    if not created or raw:
+        return
+    FanOutTask.objects.create(post_id=instance.pk)
+    if settings.BACKGROUND_JOBS_EAGER:
+        schedule_fan_out(instance)
+    else:
+        transaction.on_commit(
+            partial(schedule_fan_out, instance), using=instance._state.db
+        )
+
+
+@receiver(post_delete, sender=Post)
+def remove_timeline_post(sender, instance, **kwargs):
+    remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    bump(f'post:{instance.post_id}', using=instance._state.db)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_reply(sender, instance, **kwargs):
+    """Уменьшает счётчик ответов родителя, если тот ещё не удалён."""
+    if instance.parent_id:
+        Comment.objects.using(instance._state.db).filter(
+            pk=instance.parent_id
+        ).update(replies_count=F('replies_count') - 1)
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, **kwargs):
+    bump(f'user:{instance.pk}')
+
+
+@receiver(post_save, sender=User)
+def create_follow_counter(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        FollowCounter.objects.create(user=instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    bump('groups', f'group:{instance.pk}')
+
+
+@receiver(pre_delete, sender=Group)
+def ungroup_posts(sender, instance, **kwargs):
+    """Убирает группу у постов на всех шардах и в лентах.
+
+    SET_NULL Django обновляет только основную базу и не трогает ленты.
+    """
+    for posts in shard_querysets(Post.objects.filter(group_id=instance.pk)):
+        rows = list(posts.values_list('pk', 'author_id'))
+        if not rows:
+            continue
+        posts.update(group_id=None)
+        move_posts([pk for pk, _ in rows], None)
+        bump('posts', *{f'author:{author_id}' for _, author_id in rows})
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    bump(f'follows:{instance.user_id}', f'followers:{instance.author_id}')
+
+
+@receiver(post_save, sender=GroupFollow)
+@receiver(post_delete, sender=GroupFollow)
+def group_follow_changed(sender, instance, **kwargs):
+    """Подписки на группы меняют ленту подписок пользователя."""
+    bump(f'follows:{instance.user_id}')
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, raw=False, **kwargs):
+    """Подписки, созданные через ORM, а не posts.follows, тоже считаются."""
+    if created and not raw:
+        count_follows(
+            kwargs['using'], instance.user_id, [instance.author_id], 1
+        )
+        backfill(instance.user_id, [instance.author_id])
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, using, **kwargs):
+    count_follows(using, instance.user_id, [instance.author_id], -1)
+    unfollow_authors(instance.user_id, [instance.author_id])
+
+
+@receiver(pre_delete, sender=User)
+def delete_likes(sender, instance, **kwargs):
+    """До каскада снимает отметки пользователя со сдвигом счётчиков."""
+    from .likes import remove_user_likes
+
+    remove_user_likes(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def delete_sharded_posts(sender, instance, **kwargs):
+    """Удаляет посты автора и его комментарии со всех шардов: каскад
+    Django видит только основную базу."""
+    if settings.SHARD_DATABASES:
+        Post.objects.using(shard_for_author(instance.pk)).filter(
+            author_id=instance.pk
+        ).delete()
+        comments = Comment.objects.filter(author_id=instance.pk)
+        for queryset in shard_querysets(comments):
+            queryset.delete()
+
+
+def create_search_index(sender, using, **kwargs):
+    ensure_fts(using)
@@ -0,0 +1,131 @@
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Max
+from scipy import sparse
+
+from core.db import atomic_write
+
+from .graph import follow_graph
+from .models import Follow, FollowSuggestion, Post
+from .sharding import shard_querysets
+
+User = get_user_model()
+
+
+def follow_matrix(size):
+    """Разреженная матрица подписок: строка — подписчик, столбец — автор."""
+    pairs = np.array(
+        list(Follow.objects.values_list('user_id', 'author_id').iterator()),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    return sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.float32), (pairs[:, 0], pairs[:, 1])),
+        shape=(size, size),
+    )
+
+
+def group_matrix(size):
+    """Пользователь × группа: 1, если пользователь писал в группу."""
+    pairs = set()
+    for queryset in shard_querysets(Post.objects.filter(group__isnull=False)):
+        pairs.update(
+            queryset.order_by().values_list('author_id', 'group_id')
+            .distinct().iterator()
+        )
+    pairs = np.array(sorted(pairs), dtype=np.int64).reshape(-1, 2)
+    groups = int(pairs[:, 1].max()) + 1 if len(pairs) else 1
+    return sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.float32), (pairs[:, 0], pairs[:, 1])),
+        shape=(size, groups),
+    )
+
+
+def top_per_row(rows, cols, scores, top):
+    """Оставляет в каждой строке top пар с наибольшей оценкой."""
+    order = np.lexsort((cols, -scores, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    lengths = np.diff(np.r_[starts, len(rows)])
+    rank = np.arange(len(rows)) - np.repeat(starts, lengths)
+    keep = rank < top
+    return rows[keep], cols[keep], scores[keep]
+
+
+def score_chunk(follows, groups, start, stop, top, group_weight):
+    """Рекомендации для пользователей с id из [start, stop).
+
+    Кандидаты — авторы, на которых подписаны те, на кого подписан
+    пользователь: число таких путей даёт произведение матриц подписок.
+    Оценка растёт на group_weight за каждую общую с автором группу.
+    Себя и уже отслеживаемых авторов в рекомендациях нет.
+    """
+    chunk = follows[start:stop]
+    paths = (chunk @ follows).tocoo()
+    rows, cols = paths.row, paths.col
+    if not len(rows):
+        return rows, cols, paths.data
+    followed = np.asarray(chunk[rows, cols]).ravel() > 0
+    keep = ~followed & (rows + start != cols)
+    rows, cols, counts = rows[keep], cols[keep], paths.data[keep]
+    shared = np.asarray(
+        groups[rows + start].multiply(groups[cols]).sum(axis=1)
+    ).ravel()
+    scores = counts * (1 + group_weight * shared)
+    rows, cols, scores = top_per_row(rows, cols, scores, top)
+    return rows + start, cols, scores
+
+
+def compute_suggestions(chunk_size=None, top=None, group_weight=None,
+                        progress=None):
+    """Пересчитывает рекомендации подписок для всех пользователей.
+
+    Матрицы подписок и групп строятся один раз, пользователи
+    обрабатываются кусками по chunk_size id, и рекомендации каждого
+    куска заменяются в своей транзакции. Возвращает число записанных
+    рекомендаций.
+    """
+    chunk_size = chunk_size or settings.FOLLOW_SUGGESTIONS_CHUNK
+    top = top or settings.FOLLOW_SUGGESTIONS_TOP
+    if group_weight is None:
+        group_weight = settings.FOLLOW_SUGGESTIONS_GROUP_WEIGHT
+    size = (User.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+    follows = follow_matrix(size)
+    groups = group_matrix(size)
+    total = 0
+    for start in range(0, size, chunk_size):
+        stop = min(start + chunk_size, size)
+        users, authors, scores = score_chunk(
+            follows, groups, start, stop, top, group_weight
+        )
+        with atomic_write():
+            FollowSuggestion.objects.filter(
+                user_id__gte=start, user_id__lt=stop
+            ).delete()
+            FollowSuggestion.objects.bulk_create(
+                [
+                    FollowSuggestion(
+                        user_id=user_id, author_id=author_id, score=score
+                    )
+                    for user_id, author_id, score in zip(
+                        users.tolist(), authors.tolist(), scores.tolist()
+                    )
+                ],
+                batch_size=1000,
+            )
+        total += len(users)
+        if progress:
+            progress(stop, size)
+    return total
+
+
+def suggestions_for(user_id, limit=None):
+    """Рекомендованные авторы без тех, на кого пользователь уже подписан."""
+    limit = limit or settings.FOLLOW_SUGGESTIONS_SHOWN
+    suggestions = FollowSuggestion.objects.filter(
+        user_id=user_id
+    ).select_related('author')
+    return [
+        suggestion.author for suggestion in suggestions
+        if not follow_graph.is_following(user_id, suggestion.author_id)
+    ][:limit]
@@ -0,0 +1,70 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core.routers import replica_fresh
+from core.versioning import get_versions
+from posts.likes import like_counts
+
+register = template.Library()
+
+CARD_TEMPLATE = 'includes/post_card.html'
+
+
+def card_scopes(post):
+    """Области, от которых зависит карточка поста."""
+    scopes = [f'post:{post.pk}', f'user:{post.author_id}']
+    if post.group_id:
+        scopes.append(f'group:{post.group_id}')
+    return scopes
+
+
+def card_key(post, versions, flags, likes):
+    parts = (f'{scope}={versions[scope]}' for scope in card_scopes(post))
+    return ':'.join((f'card:{flags}', *parts, f'likes={likes}'))
+
+
+@register.simple_tag
+def post_cards(posts, not_show_profile_page=False, group_page=False):
+    """Возвращает HTML карточек постов, каждая рендерится раз на версию.
+
+    Готовый HTML карточек берётся из кеша одним get_many, недостающие
+    карточки рендерятся и сохраняются одним set_many. Число отметок
+    всех постов страницы тоже берётся одним get_many и входит в ключ
+    карточки.
+    """
+    posts = list(posts)
+    flags = f'{int(not_show_profile_page)}{int(group_page)}'
+    versions = get_versions(
+        *{scope for post in posts for scope in card_scopes(post)}
+    )
+    likes = like_counts([post.pk for post in posts])
+    keys = [
+        card_key(post, versions, flags, likes[post.pk]) for post in posts
+    ]
+    cards = cache.get_many(keys)
+    missing = {}
+    for key, post in zip(keys, posts):
+        if key not in cards:
+            missing[key] = render_to_string(CARD_TEMPLATE, {
+                'post': post,
+                'likes': likes[post.pk],
+                'not_show_profile_page': not_show_profile_page,
+                'group_page': group_page,
+            })
+    if (
+        missing and not connection.in_atomic_block
+        and replica_fresh(versions.values())
+    ):
+        cache.set_many(missing, settings.POST_CARD_TIMEOUT)
+    cards.update(missing)
+    return [mark_safe(cards[key]) for key in keys]
+
+
+@register.filter
+def post_ids(posts):
+    """id постов через запятую — аргумент дырки likes."""
+    return ','.join(str(post.pk) for post in posts)
@@ -0,0 +1,177 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.jobs import get_progress
+
+from posts.models import Comment, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class PostAdminTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@yatube.ru', password='admin'
+        )
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Уникальный тестовый пост',
+            group=cls.group,
+        )
+
+    def setUp(self):
+        self.admin_client = Client()
+        self.admin_client.force_login(self.admin)
+
+    def add_rows(self, start, stop):
+        """Добавляет посты, комментарии и подписки разных авторов."""
+        for number in range(start, stop):
+            author = User.objects.create_user(username=f'user_{number}')
+            group = Group.objects.create(
+                title=f'Группа {number}',
+                slug=f'group_{number}',
+                description='Описание',
+            )
+            post = Post.objects.create(
+                author=author, text=f'Пост {number}', group=group
+            )
+            Comment.objects.create(post=post, author=author, text='Текст')
+            Follow.objects.create(user=author, author=self.user)
+
+    def test_changelist_query_budget(self):
+        """Количество запросов списка не зависит от количества строк."""
+        urls = (
+            reverse('admin:posts_post_changelist'),
+            reverse('admin:posts_comment_changelist'),
+            reverse('admin:posts_follow_changelist'),
+        )
+        self.add_rows(0, 2)
+        budget = {}
+        for url in urls:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.admin_client.get(url)
+            self.assertEqual(response.status_code, 200)
+            budget[url] = len(queries)
+        self.add_rows(2, 12)
+        for url in urls:
+            with self.subTest(url=url):
+                with self.assertNumQueries(budget[url]):
+                    self.admin_client.get(url)
+
+    def test_full_text_search(self):
+        """Поиск в админке находит пост по началу слова."""
+        response = self.admin_client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'уникальн'}
+        )
+        self.assertIn(self.post, response.context['cl'].result_list)
+        response = self.admin_client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'отсутствует'}
+        )
+        self.assertEqual(len(response.context['cl'].result_list), 0)
+
+
+@override_settings(BACKGROUND_JOBS_EAGER=True, BULK_ACTION_BATCH_SIZE=2)
+class BackgroundActionsTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@yatube.ru', password='admin'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [Post.objects.create(
+            author=cls.admin, text=f'Пост {number}'
+        ) for number in range(5)]
+        for post in cls.posts:
+            Comment.objects.create(post=post, author=cls.admin, text='Текст')
+
+    def setUp(self):
+        self.admin_client = Client()
+        self.admin_client.force_login(self.admin)
+
+    def run_action(self, action, **data):
+        response = self.admin_client.post(
+            reverse('admin:posts_post_changelist'),
+            {
+                'action': action,
+                '_selected_action': [post.pk for post in self.posts],
+                **data,
+            },
+            follow=True,
+        )
+        message = str(list(response.context['messages'])[0])
+        progress_url = message.rsplit(' ', 1)[-1]
+        return self.admin_client.get(progress_url).json()
+
+    def test_delete_in_background(self):
+        """Удаление в фоне удаляет посты с комментариями пакетами."""
+        progress = self.run_action('delete_in_background')
+        self.assertEqual(progress['status'], 'done')
+        self.assertEqual(progress['done'], len(self.posts))
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Comment.objects.exists())
+
+    def test_move_to_group(self):
+        """Перенос меняет группу у выбранных постов и их записей в лентах."""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.admin)
+        progress = self.run_action('move_to_group', group=self.group.pk)
+        self.assertEqual(progress['status'], 'done')
+        self.assertEqual(
+            Post.objects.filter(group=self.group).count(), len(self.posts)
+        )
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(user=reader).values_list(
+                'group_id', flat=True
+            )),
+            [self.group.pk] * len(self.posts),
+        )
+
+    def test_move_without_group(self):
+        """Без группы или с неизвестной группой перенос не запускается."""
+        for group in (0, ''):
+            with self.subTest(group=group):
+                self.post_group(self.group)
+                response = self.admin_client.post(
+                    reverse('admin:posts_post_changelist'),
+                    {
+                        'action': 'move_to_group',
+                        '_selected_action': [post.pk for post in self.posts],
+                        'group': group,
+                    },
+                    follow=True,
+                )
+                self.assertNotContains(response, 'запущена')
+                self.assertEqual(
+                    Post.objects.filter(group=self.group).count(),
+                    len(self.posts),
+                )
+        self.assertContains(response, 'Выберите группу для переноса')
+
+    def post_group(self, group):
+        Post.objects.filter(
+            pk__in=[post.pk for post in self.posts]
+        ).update(group=group)
+
+    def test_unknown_job(self):
+        """Состояние неизвестной задачи недоступно."""
+        self.assertIsNone(get_progress('unknown'))
+        response = self.admin_client.get(
+            reverse('admin:posts_post_job', args=('unknown',))
+        )
+        self.assertEqual(response.status_code, 404)
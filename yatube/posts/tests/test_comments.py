@@ -0,0 +1,148 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Max
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..comments import first_replies, subtree, threads
+from ..models import PATH_ROOT, Comment, Post, comment_path
+
+User = get_user_model()
+
+
+class CommentThreadTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def comment(self, text, parent=None):
+        return Comment.objects.create(
+            post=self.post, author=self.author, text=text, parent=parent
+        )
+
+    def test_path_orders_threads_and_replies(self):
+        """Новые обсуждения идут первыми, ответы — по порядку написания."""
+        old = self.comment('Старое')
+        new = self.comment('Новое')
+        first = self.comment('Первый', old)
+        second = self.comment('Второй', old)
+        nested = self.comment('Вложенный', first)
+        self.assertEqual(
+            list(Comment.objects.order_by('path')),
+            [new, old, first, nested, second],
+        )
+        nested.refresh_from_db()
+        self.assertEqual(nested.depth, 2)
+        self.assertTrue(nested.path.startswith(first.path))
+        old.refresh_from_db()
+        self.assertEqual(old.replies_count, 2)
+        second.delete()
+        old.refresh_from_db()
+        self.assertEqual(old.replies_count, 1)
+
+    def test_path_rejects_too_large_id(self):
+        """Id, который не помещается в шаг пути, отвергается."""
+        self.assertEqual(len(comment_path(PATH_ROOT - 1)), 12)
+        for pk in (0, PATH_ROOT):
+            with self.assertRaises(ValueError):
+                comment_path(pk)
+
+    @override_settings(COMMENT_MAX_DEPTH=2)
+    def test_depth_is_capped(self):
+        """Ответ глубже предела прикрепляется к родителю родителя."""
+        parent = self.comment('Корень')
+        for _ in range(3):
+            parent = self.comment('Ответ', parent)
+        self.assertEqual(parent.depth, 2)
+        self.assertEqual(
+            Comment.objects.aggregate(depth=Max('depth'))['depth'], 2
+        )
+
+    @override_settings(COMMENT_THREADS=2, COMMENT_REPLIES_SHOWN=1)
+    def test_threads_in_three_queries(self):
+        """Обсуждения, их первые ответы и авторы — три запроса."""
+        roots = [self.comment(f'Корень {number}') for number in range(3)]
+        replies = [self.comment('Ответ', roots[2]) for _ in range(2)]
+        self.comment('Глубже', replies[0])
+        self.comment('Ответ старому', roots[0])
+        with CaptureQueriesContext(connection) as queries:
+            comments, after = threads(self.post.pk)
+            shown = [
+                [reply.pk for reply in root.shown_replies]
+                for root in comments
+            ]
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(comments, [roots[2], roots[1]])
+        self.assertEqual(shown, [[replies[0].pk], []])
+        self.assertEqual(comments[0].hidden_replies, 1)
+        self.assertEqual(comments[0].shown_replies[0].hidden_replies, 1)
+        comments, after = threads(self.post.pk, after=after)
+        self.assertEqual(comments, [roots[0]])
+        self.assertIsNone(after)
+
+    def test_first_replies_are_capped_in_sql(self):
+        """База отдаёт не больше limit ответов на каждое обсуждение."""
+        roots = [self.comment(f'Корень {number}') for number in range(2)]
+        for root in roots:
+            for _ in range(4):
+                self.comment('Ответ', root)
+        roots.reverse()
+        replies = first_replies(self.post.pk, roots, 2)
+        self.assertEqual(
+            [reply.parent_id for reply in replies],
+            [roots[0].pk] * 2 + [roots[1].pk] * 2,
+        )
+        self.assertEqual(first_replies(self.post.pk, [], 2), [])
+
+    @override_settings(COMMENT_FRAGMENT_DEPTH=2)
+    def test_replies_fragment(self):
+        """Глубокие ветки подгружаются фрагментом по нескольку уровней."""
+        root = self.comment('Корень')
+        parent = root
+        for number in range(4):
+            parent = self.comment(f'Уровень {number + 1}', parent)
+        replies = subtree(root)
+        self.assertEqual(replies[0].shown_replies[0].hidden_replies, 1)
+        url = reverse('posts:comment_replies', args=[self.post.pk, root.pk])
+        response = self.client.get(url)
+        self.assertContains(response, 'Уровень 2')
+        self.assertNotContains(response, 'Уровень 3')
+        self.assertNotContains(response, '<html')
+        missing = reverse('posts:comment_replies', args=[self.post.pk, 0])
+        self.assertEqual(self.client.get(missing).status_code, 404)
+
+    def test_reply_through_form(self):
+        """Ответ отправляется той же формой с id родителя."""
+        root = self.comment('Корень')
+        url = reverse('posts:add_comment', args=[self.post.pk])
+        response = self.client.post(
+            url, {'text': 'Ответ', 'parent': root.pk},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertContains(
+            response, f'data-parent="{root.pk}"', status_code=201
+        )
+        self.assertTrue(root.replies.filter(text='Ответ').exists())
+        other = Post.objects.create(author=self.author, text='Другой')
+        foreign = Comment.objects.create(
+            post=other, author=self.author, text='Чужой'
+        )
+        response = self.client.post(
+            url, {'text': 'Ответ', 'parent': foreign.pk}
+        )
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse(
+            'posts:post_detail', args=[self.post.pk]
+        ))
+        self.assertContains(response, f'id="replies-{root.pk}"')
+        self.assertContains(response, 'href="{}#comment-form"'.format(
+            reverse('posts:post_detail', args=[self.post.pk])
+        ))
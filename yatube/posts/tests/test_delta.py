@@ -0,0 +1,124 @@
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.versioning import get_versions
+
+from ..feeds import decode_cursor, encode_cursor
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class DeltaTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.old = Post.objects.create(author=cls.author, text='Старый')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.cursor = encode_cursor(self.old.created, self.old.pk)
+
+    def test_cursor_roundtrip(self):
+        """Курсор сохраняет время до микросекунд."""
+        self.assertEqual(
+            decode_cursor(self.cursor), (self.old.created, self.old.pk)
+        )
+
+    def test_without_cursor_returns_newest(self):
+        """Без курсора отдаётся курсор самого нового поста."""
+        response = self.client.get(reverse('posts:index_delta'))
+        self.assertEqual(
+            response.json(), {'cursor': self.cursor, 'ids': [], 'more': False}
+        )
+
+    def test_new_posts_after_cursor(self):
+        """Отдаются id новых постов от старых к новым."""
+        first = Post.objects.create(author=self.author, text='Первый')
+        second = Post.objects.create(author=self.author, text='Второй')
+        response = self.client.get(
+            reverse('posts:index_delta'), {'after': self.cursor}
+        )
+        data = response.json()
+        self.assertEqual(data['ids'], [first.pk, second.pk])
+        self.assertEqual(
+            data['cursor'], encode_cursor(second.created, second.pk)
+        )
+        self.assertFalse(data['more'])
+
+    @override_settings(DELTA_LIMIT=1)
+    def test_more_posts(self):
+        """При превышении лимита ответ помечается флагом more."""
+        first = Post.objects.create(author=self.author, text='Первый')
+        Post.objects.create(author=self.author, text='Второй')
+        data = self.client.get(
+            reverse('posts:index_delta'), {'after': self.cursor}
+        ).json()
+        self.assertEqual(data['ids'], [first.pk])
+        self.assertTrue(data['more'])
+
+    def test_nothing_new_is_cheap(self):
+        """С общими версиями 204 отдаётся без запросов к базе."""
+        with tempfile.TemporaryDirectory() as location, override_settings(
+            CACHES={'default': {
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': location,
+            }}
+        ):
+            get_versions('posts')
+            cursor = encode_cursor(timezone.now(), 0)
+            with self.assertNumQueries(0):
+                response = self.client.get(
+                    reverse('posts:index_delta'), {'after': cursor}
+                )
+        self.assertEqual(response.status_code, 204)
+
+    def test_local_versions_are_not_trusted(self):
+        """Версии из кеша процесса не заменяют запрос к базе."""
+        post = Post.objects.create(author=self.author, text='Новый')
+        cache.set('version:posts', 0, None)
+        data = self.client.get(
+            reverse('posts:index_delta'), {'after': self.cursor}
+        ).json()
+        self.assertEqual(data['ids'], [post.pk])
+
+    def test_feeds_are_filtered(self):
+        """Ленты группы, профиля и подписок отдают только свои посты."""
+        in_group = Post.objects.create(
+            author=self.reader, text='В группе', group=self.group
+        )
+        by_author = Post.objects.create(author=self.author, text='Автора')
+        urls = {
+            reverse('posts:group_delta', args=[self.group.slug]): in_group,
+            reverse('posts:profile_delta', args=[self.author]): by_author,
+        }
+        for url, post in urls.items():
+            with self.subTest(url=url):
+                data = self.client.get(url, {'after': self.cursor}).json()
+                self.assertEqual(data['ids'], [post.pk])
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.reader)
+        data = self.client.get(
+            reverse('posts:follow_delta'), {'after': self.cursor}
+        ).json()
+        self.assertEqual(data['ids'], [by_author.pk])
+
+    def test_bad_cursor(self):
+        """Испорченный курсор — ошибка 400, лента подписок — для своих."""
+        response = self.client.get(
+            reverse('posts:index_delta'), {'after': 'abc'}
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('posts:follow_delta'))
+        self.assertEqual(response.status_code, 302)
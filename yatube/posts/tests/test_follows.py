@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..follows import follow, follow_many, unfollow, unfollow_many
+from ..models import Follow, FollowCounter
+
+User = get_user_model()
+
+
+def counts(user):
+    counter = FollowCounter.objects.get(user=user)
+    return counter.followers, counter.following
+
+
+class FollowServiceTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)
+        ]
+
+    def test_follow_is_one_idempotent_statement(self):
+        """Подписка — один запрос к подпискам, повтор ничего не меняет."""
+        author = self.authors[0]
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(follow(self.reader.pk, author.pk))
+        follow_queries = [
+            query for query in queries.captured_queries
+            if '"posts_follow"' in query['sql']
+        ]
+        self.assertEqual(len(follow_queries), 1)
+        self.assertFalse(follow(self.reader.pk, author.pk))
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(counts(author), (1, 0))
+        self.assertEqual(counts(self.reader), (0, 1))
+
+    def test_unfollow_returns_whether_deleted(self):
+        """Отписка удаляет подписку и уменьшает счётчики один раз."""
+        author = self.authors[0]
+        follow(self.reader.pk, author.pk)
+        self.assertTrue(unfollow(self.reader.pk, author.pk))
+        self.assertFalse(unfollow(self.reader.pk, author.pk))
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(counts(author), (0, 0))
+        self.assertEqual(counts(self.reader), (0, 0))
+
+    def test_bulk_follow(self):
+        """Массовая подписка пропускает себя и уже существующие подписки."""
+        ids = [author.pk for author in self.authors]
+        follow(self.reader.pk, ids[0])
+        added = follow_many(self.reader.pk, [*ids, self.reader.pk])
+        self.assertEqual(added, ids[1:])
+        self.assertEqual(counts(self.reader), (0, 3))
+        self.assertEqual(unfollow_many(self.reader.pk, ids[:2]), ids[:2])
+        self.assertEqual(counts(self.reader), (0, 1))
+        self.assertEqual(counts(self.authors[2]), (1, 0))
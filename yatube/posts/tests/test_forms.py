@@ -178,3 +178,28 @@ class PostCreateFormTests(TestCase):
                 text=self.comment_form_data['text'],
             ).exists()
         )
+
+    def test_ajax_comment_returns_fragment(self):
+        """AJAX-комментарий возвращает только свой HTML, без перехода."""
+        url = reverse(
+            'posts:add_comment',
+            kwargs={'post_id': PostCreateFormTests.post.id}
+        )
+        response = self.authorized_client.post(
+            url, data=self.comment_form_data,
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertContains(
+            response, self.comment_form_data['text'], status_code=201
+        )
+        self.assertNotContains(response, '<html', status_code=201)
+        self.assertTrue(Comment.objects.filter(
+            text=self.comment_form_data['text']
+        ).exists())
+
+        response = self.authorized_client.post(
+            url, data={'text': ''}, HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('text', response.json()['errors'])
@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from core.tests.utils import use_shared_cache
+
+from ..graph import Adjacency, FollowGraph
+from ..models import Follow
+
+User = get_user_model()
+
+
+class AdjacencyTest(TestCase):
+    def test_sorted_lists(self):
+        """Списки соседей собираются из пар и меняются без порчи выданных."""
+        adjacency = Adjacency.from_sorted([(1, 2), (1, 5), (3, 1)])
+        self.assertEqual(list(adjacency.neighbours(1)), [2, 5])
+        self.assertEqual(list(adjacency.neighbours(2)), [])
+        self.assertEqual(list(adjacency.neighbours(9)), [])
+        self.assertTrue(adjacency.contains(3, 1))
+        self.assertFalse(adjacency.contains(1, 3))
+        before = adjacency.neighbours(1)
+        adjacency.add(1, 3)
+        adjacency.remove(1, 5)
+        self.assertEqual(list(adjacency.neighbours(1)), [2, 3])
+        self.assertEqual(list(before), [2, 5])
+
+
+class FollowGraphTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        cache.clear()
+        self.graph = FollowGraph()
+
+    def test_changes_from_other_processes(self):
+        """Подписки, сделанные мимо графа, видны по версиям."""
+        self.assertFalse(
+            self.graph.is_following(self.reader.pk, self.author.pk)
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertTrue(
+            self.graph.is_following(self.reader.pk, self.author.pk)
+        )
+        self.assertEqual(
+            list(self.graph.follower_ids(self.author.pk)), [self.reader.pk]
+        )
+        follow.delete()
+        self.assertEqual(list(self.graph.follower_ids(self.author.pk)), [])
+
+    def test_local_versions_are_not_trusted(self):
+        """С версиями в кеше процесса списки читаются из базы."""
+        self.graph.build()
+        Follow.objects.bulk_create(
+            [Follow(user=self.reader, author=self.author)]
+        )
+        self.assertTrue(
+            self.graph.is_following(self.reader.pk, self.author.pk)
+        )
+
+    def test_checks_without_queries(self):
+        """Свежий граф с общими версиями отвечает без запросов к базе."""
+        use_shared_cache(self)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.graph.build()
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                self.graph.is_following(self.reader.pk, self.author.pk)
+            )
+            self.assertEqual(
+                list(self.graph.following_ids(self.reader.pk)),
+                [self.author.pk],
+            )
+            self.graph.apply(self.reader.pk, [self.author.pk], False)
+            self.assertFalse(
+                self.graph.is_following(self.reader.pk, self.author.pk)
+            )
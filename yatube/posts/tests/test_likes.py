@@ -0,0 +1,113 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.tests.utils import use_shared_cache
+from core.versioning import get_versions
+
+from ..likes import like_counts, set_like
+from ..models import Group, Like, LikeCounter, Post
+
+User = get_user_model()
+
+
+class LikeTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.readers = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(5)
+        ]
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.readers[0])
+
+    def test_like_is_ajax_and_idempotent(self):
+        """POST ставит отметку, DELETE снимает; повтор ничего не меняет."""
+        url = reverse('posts:post_like', args=[self.post.pk])
+        for _ in range(2):
+            response = self.client.post(url)
+            self.assertEqual(response.json(), {'liked': True, 'likes': 1})
+        for _ in range(2):
+            response = self.client.delete(url)
+            self.assertEqual(response.json(), {'liked': False, 'likes': 0})
+        self.assertFalse(Like.objects.exists())
+        self.assertEqual(self.client.get(url).status_code, 405)
+        missing = reverse('posts:post_like', args=[0])
+        self.assertEqual(self.client.post(missing).status_code, 404)
+
+    @override_settings(LIKE_COUNTER_SLOTS=4)
+    def test_counter_is_split_into_slots(self):
+        """Отметки расходятся по частям счётчика, сумма — их число."""
+        for reader in self.readers:
+            set_like(reader.pk, self.post.pk)
+        set_like(self.readers[0].pk, self.post.pk, liked=False)
+        self.assertLessEqual(LikeCounter.objects.count(), 4)
+        self.assertEqual(like_counts([self.post.pk]), {self.post.pk: 4})
+
+    def test_page_reads_counts_at_once(self):
+        """Карточки показывают число отметок, отмеченные выделены."""
+        set_like(self.readers[0].pk, self.post.pk)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '♥ <span>1</span>')
+        self.assertContains(
+            response,
+            f'<script id="liked-posts" type="application/json">'
+            f'[{self.post.pk}]</script>',
+            html=False,
+        )
+
+    @override_settings(PAGE_CACHE_TIMEOUT=60)
+    def test_like_keeps_cached_pages(self):
+        """Отметка не сбрасывает страницы: свежее число даёт дырка."""
+        use_shared_cache(self)
+        group = Group.objects.create(title='Группа', slug='group')
+        post = Post.objects.create(author=self.author, text='В группе',
+                                   group=group)
+        url = reverse('posts:group_list', args=[group.slug])
+        etag = self.client.get(url)['ETag']
+        versions = get_versions('posts', f'group:{group.pk}')
+        set_like(self.readers[1].pk, post.pk)
+        self.assertEqual(
+            get_versions('posts', f'group:{group.pk}'), versions
+        )
+        response = self.client.get(url)
+        self.assertEqual(response['ETag'], etag)
+        self.assertContains(
+            response,
+            f'<script id="like-counts" type="application/json">'
+            f'{{"{post.pk}": 1}}</script>',
+            html=False,
+        )
+
+    @override_settings(PAGE_CACHE_TIMEOUT=60)
+    def test_empty_page_keeps_likes_hole(self):
+        """Закешированная страница без постов заполняет дырку отметок."""
+        group = Group.objects.create(title='Пустая', slug='empty')
+        url = reverse('posts:group_list', args=[group.slug])
+        for _ in range(2):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_guests_get_no_button(self):
+        """Гость видит число отметок без кнопки и без cookie CSRF."""
+        set_like(self.readers[1].pk, self.post.pk)
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, '♥ <span>1</span>')
+        self.assertNotContains(response, 'liked-posts')
+        self.assertNotIn(settings.CSRF_COOKIE_NAME, response.cookies)
+
+    def test_deleted_user_likes_are_uncounted(self):
+        """Удаление пользователя снимает его отметки и сдвигает счётчик."""
+        leaving = User.objects.create_user(username='leaving')
+        set_like(leaving.pk, self.post.pk)
+        set_like(self.readers[1].pk, self.post.pk)
+        self.assertEqual(like_counts([self.post.pk]), {self.post.pk: 2})
+        leaving.delete()
+        self.assertEqual(like_counts([self.post.pk]), {self.post.pk: 1})
+        self.assertEqual(Like.objects.count(), 1)
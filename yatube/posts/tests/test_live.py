@@ -0,0 +1,107 @@
+import asyncio
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client, TransactionTestCase
+
+from posts.live import live_posts, new_posts
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class LivePostsTest(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.other = User.objects.create_user(username='other')
+        self.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+
+    def request(self, query='', action=None, headers=()):
+        """Вызывает приложение и возвращает отправленные сообщения."""
+        if 'last=' not in query:
+            query = f'{query}&last={new_posts.last_seq}'
+
+        async def run():
+            sent = []
+            got_body = asyncio.Event()
+            disconnect = asyncio.Event()
+
+            async def receive():
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+                if message['type'] == 'http.response.body':
+                    got_body.set()
+
+            task = asyncio.ensure_future(live_posts({
+                'type': 'http',
+                'method': 'GET',
+                'path': '/live/posts/',
+                'query_string': query.encode(),
+                'headers': list(headers),
+            }, receive, send))
+            await asyncio.sleep(0.2)
+            if action:
+                action()
+            await asyncio.wait_for(got_body.wait(), 2)
+            disconnect.set()
+            await asyncio.wait_for(task, 2)
+            return sent
+
+        return asyncio.run(run())
+
+    def body(self, sent):
+        return b''.join(message.get('body', b'') for message in sent).decode()
+
+    def test_stream_sends_new_posts(self):
+        """Поток SSE сообщает о новых постах выбранной группы."""
+        def action():
+            Post.objects.create(author=self.author, text='Без группы')
+            Post.objects.create(
+                author=self.author, text='В группе', group=self.group
+            )
+
+        sent = self.request('group=group', action)
+        self.assertIn(
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            sent[0]['headers'],
+        )
+        body = self.body(sent)
+        self.assertIn('event: new-posts', body)
+        self.assertIn('"count": 1', body)
+
+    def test_following_needs_session(self):
+        """Лента подписок доступна только вошедшему пользователю."""
+        sent = self.request('following=1')
+        self.assertEqual(sent[0]['status'], 403)
+        client = Client()
+        client.force_login(self.reader)
+        session = client.cookies[settings.SESSION_COOKIE_NAME].value
+        cookie = f'{settings.SESSION_COOKIE_NAME}={session}'.encode()
+
+        def action():
+            Post.objects.create(author=self.other, text='Чужой')
+            Post.objects.create(author=self.author, text='Из подписок')
+
+        sent = self.request(
+            'following=1&poll=1', action, headers=((b'cookie', cookie),)
+        )
+        self.assertEqual(json.loads(self.body(sent))['count'], 1)
+
+    def test_long_poll_returns_missed_events(self):
+        """Long polling сразу отдаёт события после last."""
+        last = new_posts.last_seq
+        Post.objects.create(author=self.author, text='Первый')
+        Post.objects.create(author=self.other, text='Второй')
+        sent = self.request(f'poll=1&last={last}')
+        self.assertEqual(
+            json.loads(self.body(sent)),
+            {'count': 2, 'last': new_posts.last_seq},
+        )
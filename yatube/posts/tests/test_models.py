@@ -1,6 +1,11 @@
+from io import StringIO
+
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from posts.models import Comment, Follow, Group, Post
 
@@ -152,3 +157,47 @@ class FollowModelTest(TestCase):
             with self.subTest(value=value):
                 self.assertEqual(
                     follow._meta.get_field(value).verbose_name, expected)
+
+
+class RenderedTextTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+
+    def test_html_is_rendered_on_save(self):
+        """HTML текста обновляется при сохранении и экранирует разметку."""
+        post = Post.objects.create(author=self.user, text='<b>Раз</b>\nДва')
+        self.assertEqual(
+            post.text_html, '<p>&lt;b&gt;Раз&lt;/b&gt;<br>Два</p>'
+        )
+        comment = Comment.objects.create(
+            author=self.user, post=post, text='Раз\nДва'
+        )
+        self.assertEqual(comment.text_html, 'Раз<br>Два')
+        post.text = 'Три'
+        post.save(update_fields=['text'])
+        post.refresh_from_db()
+        self.assertEqual(post.text_html, '<p>Три</p>')
+
+    def test_text_save_skips_group_read(self):
+        """Сохранение без группы не перечитывает её из базы."""
+        post = Post.objects.create(author=self.user, text='Раз')
+        post.text = 'Два'
+        with CaptureQueriesContext(connection) as queries:
+            post.save(update_fields=['text'])
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if query['sql'].startswith('SELECT "posts_post"."group_id"')
+        ])
+
+    def test_backfill_command(self):
+        """Команда заполняет HTML строк, записанных в обход save()."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {number}')
+            for number in range(3)
+        )
+        post = Post.objects.first()
+        self.assertEqual(post.text_html, '')
+        self.assertEqual(post.rendered_text(), f'<p>{post.text}</p>')
+        call_command('backfill_text_html', batch_size=2, stdout=StringIO())
+        self.assertFalse(Post.objects.filter(text_html='').exists())
@@ -0,0 +1,118 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from core.tests.utils import use_shared_cache
+from posts.models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=60)
+class PageCacheTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.post = Post.objects.create(author=self.author, text='Первый')
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_cached_page_skips_view(self):
+        """Повторный запрос гостя не обращается к базе."""
+        self.guest_client.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Первый')
+        self.assertContains(response, 'Войти')
+
+    def test_holes_are_filled_per_user(self):
+        """Пользователь получает общую страницу со своими частями."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        self.guest_client.get(url)
+        response = self.reader_client.get(url)
+        self.assertContains(response, 'Пользователь: reader')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertNotContains(response, 'редактировать запись')
+        self.assertNotContains(response, '<!--hole:')
+        author_client = Client()
+        author_client.force_login(self.author)
+        self.assertContains(author_client.get(url), 'редактировать запись')
+
+    def test_follow_button_per_user(self):
+        """Кнопка подписки зависит от пользователя, а не от кеша."""
+        url = reverse('posts:profile', args=(self.author.username,))
+        self.assertContains(self.guest_client.get(url), 'Подписаться')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertContains(self.reader_client.get(url), 'Отписаться')
+
+    def test_changes_invalidate_pages(self):
+        """Новые посты и комментарии сбрасывают закешированные страницы."""
+        profile = reverse('posts:profile', args=(self.author.username,))
+        detail = reverse('posts:post_detail', args=(self.post.pk,))
+        self.guest_client.get(profile)
+        self.guest_client.get(detail)
+        Post.objects.create(author=self.author, text='Второй')
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        self.assertContains(self.guest_client.get(profile), 'Второй')
+        self.assertContains(self.guest_client.get(detail), 'Комментарий')
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Первый')
+
+    def setUp(self):
+        use_shared_cache(self)
+        self.guest_client = Client()
+        self.url = reverse('posts:profile', args=(self.author.username,))
+
+    def test_matching_etag_returns_304(self):
+        """Совпавший ETag даёт 304 без основного запроса и шаблонов."""
+        etag = self.guest_client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.guest_client.get(
+                self.url, HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+
+    def test_last_modified_for_guests(self):
+        """Гость получает Last-Modified и 304 по If-Modified-Since."""
+        modified = self.guest_client.get(self.url)['Last-Modified']
+        response = self.guest_client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=modified
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_no_validators_with_local_versions(self):
+        """С версиями в кеше процесса ETag и Last-Modified не отдаются."""
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }}):
+            response = self.guest_client.get(self.url)
+        self.assertNotIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+
+    def test_validators_change(self):
+        """ETag меняется с данными, пользователем и номером страницы."""
+        etag = self.guest_client.get(self.url)['ETag']
+        self.assertNotEqual(
+            self.guest_client.get(self.url, {'page': 2})['ETag'], etag
+        )
+        reader_client = Client()
+        reader_client.force_login(
+            User.objects.create_user(username='reader')
+        )
+        response = reader_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+        Post.objects.create(author=self.author, text='Второй')
+        response = self.guest_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
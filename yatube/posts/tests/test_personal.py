@@ -0,0 +1,87 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..follows import follow_many
+from ..models import Group, GroupFollow, Post
+from ..personal import PersonalFeed
+
+User = get_user_model()
+
+
+class PersonalFeedTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(30)
+        ]
+        cls.stranger = User.objects.create_user(username='stranger')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        for number in range(3):
+            for author in cls.authors:
+                Post.objects.create(author=author, text=f'Пост {number}')
+        cls.group_posts = [
+            Post.objects.create(
+                author=author, text='В группе', group=cls.group
+            )
+            for author in (cls.stranger, cls.authors[0])
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed(self):
+        return PersonalFeed(
+            Post.objects.all(),
+            [author.pk for author in self.authors],
+            [self.group.pk],
+        )
+
+    def test_merge_matches_database_order(self):
+        """Слияние отдаёт посты авторов и групп в порядке ленты, без дублей."""
+        expected = list(Post.objects.order_by('-created', '-pk'))
+        feed = self.feed()
+        self.assertEqual(feed.count(), len(expected))
+        self.assertEqual(list(feed), expected)
+        self.assertEqual(feed[10:20], expected[10:20])
+
+    def test_page_does_not_read_every_source(self):
+        """Первая страница читает не все 31 источник ленты."""
+        with CaptureQueriesContext(connection) as queries:
+            posts = self.feed()[0:5]
+        self.assertEqual(len(posts), 5)
+        self.assertLess(len(queries.captured_queries), 10)
+
+    def test_group_follow(self):
+        """Подписка на группу добавляет её посты в ленту подписок."""
+        url = reverse('posts:follow_index')
+        self.assertEqual(len(self.client.get(url).context['page_obj']), 0)
+        self.client.get(reverse('posts:group_follow', args=['group']))
+        self.assertTrue(GroupFollow.objects.filter(user=self.reader).exists())
+        page = self.client.get(url).context['page_obj']
+        self.assertEqual(list(page), self.group_posts[::-1])
+        follow_many(self.reader.pk, [self.authors[0].pk])
+        page = self.client.get(url).context['page_obj']
+        self.assertEqual(len(page), 5)
+        self.assertEqual(page.paginator.count, 5)
+        self.assertEqual(page[0], self.group_posts[1])
+        self.client.get(reverse('posts:group_unfollow', args=['group']))
+        page = self.client.get(url).context['page_obj']
+        self.assertEqual(page.paginator.count, 4)
+        self.assertFalse(GroupFollow.objects.exists())
+
+    def test_group_follow_button(self):
+        """На странице группы кнопка подписки отражает состояние."""
+        url = reverse('posts:group_list', args=['group'])
+        self.assertContains(self.client.get(url), 'Подписаться на группу')
+        GroupFollow.objects.create(user=self.reader, group=self.group)
+        self.assertContains(self.client.get(url), 'Отписаться от группы')
@@ -0,0 +1,57 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TransactionTestCase
+
+from posts.models import Group, Post
+from posts.templatetags.post_cards import post_cards
+
+User = get_user_model()
+
+
+class PostCardsTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Текст'
+        )
+
+    def render(self, **flags):
+        posts = Post.objects.select_related('author', 'group')
+        return ''.join(post_cards(posts, **flags))
+
+    def test_cards_are_rendered_once(self):
+        """Карточка рендерится один раз на версию поста."""
+        html = self.render()
+        with mock.patch(
+            'posts.templatetags.post_cards.render_to_string'
+        ) as render_to_string:
+            self.assertEqual(self.render(), html)
+        render_to_string.assert_not_called()
+
+    def test_flags_have_own_variants(self):
+        """Для флагов шаблона хранятся разные варианты карточки."""
+        self.assertIn('все записи группы', self.render())
+        self.assertNotIn('все записи группы', self.render(group_page=True))
+        self.assertNotIn(
+            'все посты пользователя',
+            self.render(not_show_profile_page=True)
+        )
+
+    def test_changes_invalidate_cards(self):
+        """Изменения поста, группы и имени автора обновляют карточку."""
+        self.render()
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertIn('Новый текст', self.render())
+        self.author.first_name = 'Лев'
+        self.author.save()
+        self.assertIn('Лев', self.render())
+        self.group.slug = 'renamed'
+        self.group.save()
+        self.assertIn('/group/renamed/', self.render())
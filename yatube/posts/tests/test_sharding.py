@@ -0,0 +1,89 @@
+from django.contrib.auth import get_user_model
+from django.db import connection, router
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from posts.feeds import MergedFeed
+from posts.models import Comment, Group, Post
+from posts.sharding import post_shard, sharded
+
+User = get_user_model()
+
+
+class MergedFeedTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.first = User.objects.create_user(username='first')
+        cls.second = User.objects.create_user(username='second')
+        for number in range(6):
+            Post.objects.create(
+                author=cls.first if number % 2 else cls.second,
+                text=f'Пост {number}',
+            )
+
+    def setUp(self):
+        self.feed = MergedFeed([
+            Post.objects.filter(author=self.first),
+            Post.objects.filter(author=self.second),
+        ])
+
+    def test_merge_keeps_feed_order(self):
+        """Слияние выборок сохраняет порядок ленты."""
+        expected = list(Post.objects.order_by('-created', '-pk'))
+        self.assertEqual(list(self.feed), expected)
+        self.assertEqual(self.feed.count(), 6)
+
+    def test_slices(self):
+        """Срезы и индексы берутся из слитой ленты."""
+        expected = list(Post.objects.order_by('-created', '-pk'))
+        self.assertEqual(self.feed[2:5], expected[2:5])
+        self.assertEqual(self.feed[0], expected[0])
+        with self.assertRaises(IndexError):
+            self.feed[10]
+
+    def test_unsharded_queryset_is_untouched(self):
+        """Без шардов выборка не оборачивается."""
+        queryset = Post.objects.all()
+        self.assertIs(sharded(queryset), queryset)
+        self.assertIsNone(post_shard(1))
+
+
+class ForeignKeysTest(TestCase):
+    def test_single_database_keeps_foreign_keys(self):
+        """Без шардов у постов остаются внешние ключи в базе."""
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Post._meta.db_table
+            )
+        targets = {
+            constraint['foreign_key'] for constraint in constraints.values()
+            if constraint['foreign_key']
+        }
+        self.assertIn(('auth_user', 'id'), targets)
+        self.assertIn((Group._meta.db_table, 'id'), targets)
+
+
+@override_settings(SHARD_DATABASES=['shard_0', 'shard_1'])
+class AuthorShardRouterTest(SimpleTestCase):
+    def test_post_goes_to_author_shard(self):
+        """Пост и комментарии к нему пишутся в шард автора поста."""
+        post = Post(pk=7, author_id=3, text='Текст')
+        self.assertEqual(router.db_for_write(Post, instance=post), 'shard_1')
+        self.assertEqual(post_shard(post.pk), 'shard_1')
+        comment = Comment(post=post, author_id=2, text='Комментарий')
+        self.assertEqual(
+            router.db_for_write(Comment, instance=comment), 'shard_1'
+        )
+
+    def test_migrations_on_shards(self):
+        """На шардах создаются только таблицы постов и комментариев."""
+        self.assertTrue(router.allow_migrate_model('shard_0', Post))
+        self.assertTrue(router.allow_migrate_model('shard_0', Comment))
+        self.assertFalse(router.allow_migrate_model('shard_0', Group))
+        self.assertFalse(router.allow_migrate_model('shard_0', User))
+        self.assertTrue(router.allow_migrate_model('default', Group))
+
+    def test_related_objects_stay_in_default(self):
+        """Группы читаются из основной базы даже по подсказке шарда."""
+        post = Post(pk=2, author_id=2, text='Текст')
+        post._state.db = 'shard_0'
+        self.assertEqual(router.db_for_read(Group, instance=post), 'default')
@@ -0,0 +1,61 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Follow, FollowSuggestion, Group, Post
+from ..suggestions import compute_suggestions
+
+User = get_user_model()
+
+
+class SuggestionsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader, cls.friend, cls.first, cls.second, cls.third = [
+            User.objects.create_user(username=name)
+            for name in ('reader', 'friend', 'first', 'second', 'third')
+        ]
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        for author in (cls.reader, cls.second):
+            Post.objects.create(author=author, text='Пост', group=group)
+        Follow.objects.create(user=cls.reader, author=cls.friend)
+        Follow.objects.create(user=cls.reader, author=cls.third)
+        for author in (cls.first, cls.second, cls.third, cls.reader):
+            Follow.objects.create(user=cls.friend, author=author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_friends_of_friends_weighted_by_groups(self):
+        """Друзья друзей, общая группа выше, без себя и подписок."""
+        compute_suggestions(chunk_size=2, top=10, group_weight=0.5)
+        suggestions = FollowSuggestion.objects.filter(user=self.reader)
+        self.assertEqual(
+            [(s.author_id, s.score) for s in suggestions],
+            [(self.second.pk, 1.5), (self.first.pk, 1.0)],
+        )
+        compute_suggestions(chunk_size=100, top=1, group_weight=0.5)
+        self.assertEqual(
+            list(FollowSuggestion.objects.filter(
+                user=self.reader).values_list('author_id', flat=True)),
+            [self.second.pk],
+        )
+
+    def test_sidebar(self):
+        """Боковой блок показывает рекомендации без уже отслеживаемых."""
+        compute_suggestions()
+        client = Client()
+        client.force_login(self.reader)
+        url = reverse('posts:follow_suggestions')
+        response = client.get(url)
+        self.assertContains(response, 'second')
+        Follow.objects.create(user=self.reader, author=self.second)
+        response = client.get(url)
+        self.assertNotContains(response, 'second')
+        self.assertContains(
+            client.get(reverse('posts:profile', args=['friend'])),
+            'Кого почитать'
+        )
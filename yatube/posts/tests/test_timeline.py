@@ -0,0 +1,162 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..follows import follow, unfollow
+from ..models import FanOutTask, Group, GroupFollow, Post, TimelineEntry
+from ..timeline import resume_fan_outs, timeline_metrics
+
+User = get_user_model()
+
+
+@override_settings(BACKGROUND_JOBS_EAGER=True)
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+
+    def setUp(self):
+        cache.clear()
+        timeline_metrics.reset()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed(self):
+        return self.client.get(
+            reverse('posts:follow_index')
+        ).context['page_obj']
+
+    def test_posts_are_pushed_to_followers(self):
+        """Пост обычного автора раскладывается в ленты подписчиков."""
+        follow(self.reader.pk, self.author.pk)
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post_id=post.pk)
+            .exists()
+        )
+        self.assertEqual(list(self.feed()), [post])
+        self.assertEqual(timeline_metrics.snapshot()['pushed_entries'], 1)
+        unfollow(self.reader.pk, self.author.pk)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(len(self.feed()), 0)
+
+    @override_settings(TIMELINE_BATCH_SIZE=1)
+    def test_large_fan_out_goes_in_batches(self):
+        """Раскладка больше одного пакета идёт пакетами в пуле лент."""
+        other = User.objects.create_user(username='other')
+        follow(self.reader.pk, self.author.pk)
+        follow(other.pk, self.author.pk)
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertEqual(
+            TimelineEntry.objects.filter(post_id=post.pk).count(), 2
+        )
+        self.assertFalse(FanOutTask.objects.exists())
+
+    def test_interrupted_fan_out_is_resumed(self):
+        """Раскладка, не выполненная до перезапуска, выполняется снова."""
+        follow(self.reader.pk, self.author.pk)
+        with self.settings(BACKGROUND_JOBS_EAGER=False):
+            post = Post.objects.create(author=self.author, text='Пост')
+        self.assertTrue(FanOutTask.objects.filter(post_id=post.pk).exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+        resume_fan_outs()
+        self.assertEqual(list(self.feed()), [post])
+        self.assertFalse(FanOutTask.objects.exists())
+
+    @override_settings(FEED_SOURCE_BATCH=2)
+    def test_missing_posts_do_not_end_feed(self):
+        """Порция из одних удалённых постов не обрывает ленту."""
+        follow(self.reader.pk, self.author.pk)
+        post = Post.objects.create(author=self.author, text='Пост')
+        TimelineEntry.objects.bulk_create([
+            TimelineEntry(
+                user=self.reader, author=self.author, post_id=10 ** 9 + pk,
+                created=post.created + timedelta(minutes=pk),
+            )
+            for pk in range(3)
+        ])
+        self.assertEqual(list(self.feed()), [post])
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=1)
+    def test_celebrity_posts_are_pulled(self):
+        """Посты автора выше порога подмешиваются при чтении ленты."""
+        follow(self.reader.pk, self.author.pk)
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(list(self.feed()), [post])
+        metrics = timeline_metrics.snapshot()
+        self.assertEqual(metrics['pulled_posts'], 1)
+        self.assertEqual(metrics['pull_fetch_count'], 1)
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=2)
+    def test_posts_stay_after_author_drops_below_threshold(self):
+        """Посты, прочитанные при показе, остаются в ленте после отписок."""
+        other = User.objects.create_user(username='other')
+        follow(self.reader.pk, self.author.pk)
+        follow(other.pk, self.author.pk)
+        post = Post.objects.create(author=self.author, text='Знаменитость')
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(list(self.feed()), [post])
+        unfollow(other.pk, self.author.pk)
+        self.assertEqual(list(self.feed()), [post])
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post_id=post.pk
+        ).exists())
+
+    @override_settings(TIMELINE_BACKFILL=2)
+    def test_follow_backfills_recent_posts(self):
+        """При подписке в ленту попадают последние посты автора."""
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+            for number in range(3)
+        ]
+        follow(self.reader.pk, self.author.pk)
+        self.assertEqual(
+            set(TimelineEntry.objects.values_list('post_id', flat=True)),
+            {posts[1].pk, posts[2].pk},
+        )
+
+    def test_group_posts_are_counted_once(self):
+        """Пост в группе из подписок не считается дважды."""
+        follow(self.reader.pk, self.author.pk)
+        GroupFollow.objects.create(user=self.reader, group=self.group)
+        post = Post.objects.create(author=self.author, text='Пост')
+        post.group = self.group
+        post.save()
+        self.assertEqual(
+            TimelineEntry.objects.get(post_id=post.pk).group_id,
+            self.group.pk,
+        )
+        page = self.feed()
+        self.assertEqual(page.paginator.count, 1)
+        self.assertEqual(list(page), [post])
+        post.delete()
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_group_delete_ungroups_posts_and_entries(self):
+        """Удаление группы убирает её у постов и у записей лент."""
+        follow(self.reader.pk, self.author.pk)
+        group = Group.objects.create(title='Другая', slug='other')
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=group
+        )
+        group.delete()
+        post.refresh_from_db()
+        self.assertIsNone(post.group_id)
+        self.assertIsNone(TimelineEntry.objects.get(post_id=post.pk).group_id)
+
+    def test_metrics_are_staff_only(self):
+        """Метрики ленты видны только сотрудникам."""
+        url = reverse('posts:timeline_stats')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.reader.is_staff = True
+        self.reader.save()
+        self.feed()
+        self.assertIn('page_count', self.client.get(url).json())
@@ -0,0 +1,97 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.tests.utils import use_shared_cache
+
+from ..models import Post
+from ..trending import counter_key, post_views, rank, write_views
+
+User = get_user_model()
+
+
+class PostViewsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {number}')
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        post_views.flush()
+        Post.objects.update(views=0)
+        self.client = Client()
+
+    def test_views_are_buffered_and_flushed(self):
+        """Просмотры видны сразу, а в базу попадают при сбросе."""
+        post = self.posts[0]
+        url = reverse('posts:post_detail', args=[post.pk])
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertContains(response, 'Просмотров: 2')
+        post.refresh_from_db()
+        self.assertEqual(post.views, 0)
+        post_views.flush()
+        post.refresh_from_db()
+        self.assertEqual(post.views, 2)
+
+    def test_revalidation_counts_views(self):
+        """Страница поста без валидаторов: каждый запрос — просмотр."""
+        use_shared_cache(self)
+        url = reverse('posts:post_detail', args=[self.posts[0].pk])
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('ETag'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH='*')
+        self.assertContains(response, 'Просмотров: 2')
+
+    def test_equal_deltas_share_one_update(self):
+        """Посты с одинаковым приращением обновляются одним запросом."""
+        deltas = {counter_key(post.pk): 1 for post in self.posts}
+        deltas[counter_key(self.posts[0].pk)] = 5
+        with CaptureQueriesContext(connection) as queries:
+            write_views(deltas)
+        updates = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE')
+        ]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list('views', flat=True)),
+            [5, 1, 1],
+        )
+
+    def test_edit_keeps_views(self):
+        """Сохранение поста не затирает записанные счётчиком просмотры."""
+        post = Post.objects.get(pk=self.posts[0].pk)
+        write_views({counter_key(post.pk): 7})
+        post.text = 'Новый текст'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual((post.text, post.views), ('Новый текст', 7))
+
+    def test_trending_decays_with_age(self):
+        """Свежий пост обгоняет старый с большим числом просмотров."""
+        now = timezone.now()
+        old, fresh, unseen = self.posts
+        Post.objects.filter(pk=old.pk).update(
+            views=100, created=now - timedelta(hours=40)
+        )
+        Post.objects.filter(pk=fresh.pk).update(
+            views=20, created=now - timedelta(hours=1)
+        )
+        self.assertEqual(rank(now), [fresh.pk, old.pk])
+        response = self.client.get(
+            reverse('api:v1:trending'), {'fields': 'id,views'}
+        )
+        self.assertEqual(response.json()['results'], [
+            {'id': fresh.pk, 'views': 20}, {'id': old.pk, 'views': 100}
+        ])
@@ -0,0 +1,81 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TransactionTestCase, override_settings
+
+from core.tests.utils import use_shared_cache
+from posts.models import Post
+from posts.utils import CachedCountPaginator, estimate_count
+
+User = get_user_model()
+
+
+class CachedCountPaginatorTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create([Post(
+            author=self.user,
+            text=f'Текст поста номер {count}',
+        ) for count in range(3)])
+
+    def test_count_is_cached(self):
+        """Повторный подсчёт берётся из кеша без запроса к БД."""
+        posts = Post.objects.all()
+        self.assertEqual(
+            CachedCountPaginator(posts, 10, scopes=('posts',)).count, 3
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                CachedCountPaginator(posts, 10, scopes=('posts',)).count, 3
+            )
+
+    def test_local_versions_shorten_timeout(self):
+        """С версиями в кеше процесса количество хранится недолго."""
+        posts = Post.objects.all()
+        with mock.patch.object(cache, 'set') as cache_set:
+            CachedCountPaginator(posts, 10, scopes=('posts',)).count
+        self.assertEqual(
+            cache_set.call_args.args[2],
+            settings.PAGINATOR_LOCAL_COUNT_TIMEOUT,
+        )
+        use_shared_cache(self)
+        with mock.patch.object(cache, 'set') as cache_set:
+            CachedCountPaginator(posts, 10, scopes=('posts',)).count
+        self.assertEqual(
+            cache_set.call_args.args[2], settings.PAGINATOR_COUNT_TIMEOUT
+        )
+
+    def test_count_invalidated_by_post_signals(self):
+        """Создание поста сбрасывает закешированное количество."""
+        posts = Post.objects.all()
+        CachedCountPaginator(posts, 10, scopes=('posts',)).count
+        Post.objects.create(author=self.user, text='Новый пост')
+        self.assertEqual(
+            CachedCountPaginator(posts, 10, scopes=('posts',)).count, 4
+        )
+
+    def test_count_not_cached_inside_transaction(self):
+        """Количество внутри незавершённой транзакции не кешируется."""
+        posts = Post.objects.all()
+        with transaction.atomic():
+            CachedCountPaginator(posts, 10, scopes=('posts',)).count
+        with self.assertNumQueries(2):
+            CachedCountPaginator(posts, 10, scopes=('posts',)).count
+
+    @override_settings(PAGINATOR_ESTIMATE_THRESHOLD=1)
+    def test_large_table_uses_estimate(self):
+        """Для больших таблиц используется статистика СУБД."""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        estimate = estimate_count(Post.objects.all())
+        self.assertEqual(estimate, 3)
+        self.assertIsNone(estimate_count(Post.objects.filter(pk=1)))
+        paginator = CachedCountPaginator(
+            Post.objects.all(), 10, scopes=('posts',)
+        )
+        with self.assertNumQueries(2):
+            self.assertEqual(paginator.count, 3)
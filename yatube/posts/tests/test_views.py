@@ -290,6 +290,7 @@ class PaginatorViewsTest(TestCase):
                     )
 
 
+@override_settings(BACKGROUND_JOBS_EAGER=True)
 class FollowViewsTests(TestCase):
     @classmethod
     def setUpClass(cls) -> None:
@@ -0,0 +1,300 @@
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from core.db import atomic_write
+from core.jobs import run_later
+from core.metrics import Metrics
+from core.versioning import make_key
+
+from .feeds import FEED_ORDERING, KeysetSource
+from .models import (FanOutTask, Follow, FollowCounter, Post,
+                     TimelineEntry)
+from .personal import PersonalFeed, personal_querysets, personal_sources
+from .sharding import author_querysets, load_posts
+
+timeline_metrics = Metrics()
+
+
+@contextmanager
+def timed(name):
+    """Добавляет время блока в timeline_metrics под именем name."""
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        timeline_metrics.timing(name, time.monotonic() - started)
+
+
+def celebrity_ids():
+    """Авторы, у которых подписчиков не меньше порога раскладки.
+
+    Список один на процессы и кешируется на TIMELINE_CELEBRITY_TIMEOUT,
+    чтобы запись и чтение ленты одинаково решали, кого раскладывать.
+    """
+    key = make_key('timeline-celebrities')
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(FollowCounter.objects.filter(
+            followers__gte=settings.TIMELINE_FANOUT_THRESHOLD
+        ).values_list('user_id', flat=True))
+        cache.set(key, ids, settings.TIMELINE_CELEBRITY_TIMEOUT)
+    return ids
+
+
+def forget_celebrities():
+    cache.delete(make_key('timeline-celebrities'))
+
+
+def is_celebrity(author_id):
+    """Решение при записи поста: не раскладывать ли посты автора.
+
+    Читается из базы, а не из кеша celebrity_ids: автор, опустившийся
+    ниже порога, сразу снова получает раскладку.
+    """
+    return FollowCounter.objects.filter(
+        user_id=author_id,
+        followers__gte=settings.TIMELINE_FANOUT_THRESHOLD,
+    ).exists()
+
+
+def entries(posts, user_ids):
+    return [
+        TimelineEntry(
+            user_id=user_id, author_id=post.author_id, post_id=post.pk,
+            group_id=post.group_id, created=post.created,
+        )
+        for post in posts for user_id in user_ids
+    ]
+
+
+def push_to_followers(author_id, posts):
+    """Кладёт posts в ленты всех подписчиков автора.
+
+    Подписчики читаются из базы пакетами по TIMELINE_BATCH_SIZE, и
+    каждый пакет вставляется в своей транзакции. Граф подписок
+    процесса здесь не годится: подписок из других процессов он может
+    ещё не знать.
+    """
+    followers = Follow.objects.filter(author_id=author_id).order_by(
+        'user_id'
+    ).values_list('user_id', flat=True)
+    last = 0
+    while True:
+        batch = list(
+            followers.filter(user_id__gt=last)[:settings.TIMELINE_BATCH_SIZE]
+        )
+        if not batch:
+            return
+        with timed('fan_out'), atomic_write():
+            TimelineEntry.objects.bulk_create(
+                entries(posts, batch), ignore_conflicts=True
+            )
+        timeline_metrics.incr('pushed_entries', len(batch) * len(posts))
+        last = batch[-1]
+
+
+def fan_out(post_id):
+    """Раскладывает пост в ленты подписчиков и снимает его задачу.
+
+    Посты авторов с подписчиками от TIMELINE_FANOUT_THRESHOLD не
+    раскладываются: их читатели получают при чтении ленты.
+    """
+    posts = load_posts(
+        Post.objects.only('author', 'group', 'created'), [post_id]
+    )
+    if posts and is_celebrity(posts[0].author_id):
+        timeline_metrics.incr('pulled_posts')
+    elif posts:
+        timeline_metrics.incr('pushed_posts')
+        push_to_followers(posts[0].author_id, posts)
+    FanOutTask.objects.filter(post_id=post_id).delete()
+
+
+def schedule_fan_out(post):
+    """Раскладывает пост сразу или в пуле лент из TIMELINE_WORKERS потоков.
+
+    Подписчики, умещающиеся в один пакет TIMELINE_BATCH_SIZE, получают
+    пост сразу, одной вставкой; большие раскладки уходят в пул. У
+    автора без подписчиков задача просто снимается: подписавшиеся позже
+    получат пост при подписке.
+    """
+    followers = Follow.objects.filter(author_id=post.author_id)
+    count = followers[:settings.TIMELINE_BATCH_SIZE + 1].count()
+    if not count:
+        FanOutTask.objects.filter(post_id=post.pk).delete()
+    elif count <= settings.TIMELINE_BATCH_SIZE:
+        fan_out(post.pk)
+    else:
+        run_later('fan-out', settings.TIMELINE_WORKERS, fan_out, post.pk)
+
+
+def _resume():
+    for post_id in FanOutTask.objects.values_list('post_id', flat=True):
+        run_later('fan-out', settings.TIMELINE_WORKERS, fan_out, post_id)
+
+
+def resume_fan_outs():
+    """Заново запускает раскладки, прерванные перезапуском процесса.
+
+    Вызывается при старте приложения; задачи читаются в пуле лент.
+    Повторная раскладка безопасна: уже вставленные записи пропускаются.
+    """
+    run_later('fan-out', settings.TIMELINE_WORKERS, _resume)
+
+
+def recent_posts(author_id):
+    """Последние TIMELINE_BACKFILL постов автора для записей лент."""
+    queryset, = author_querysets(Post.objects.all(), [author_id])
+    return list(queryset.order_by(*FEED_ORDERING).only(
+        'author', 'group', 'created'
+    )[:settings.TIMELINE_BACKFILL])
+
+
+def restore_authors(author_ids):
+    """Раскладывает последние посты авторов, опустившихся ниже порога.
+
+    Пока автор был выше TIMELINE_FANOUT_THRESHOLD, его посты
+    подмешивались при чтении; без раскладки они пропали бы из лент,
+    как только лента перестанет считать его знаменитостью.
+    """
+    forget_celebrities()
+    for author_id in author_ids:
+        posts = recent_posts(author_id)
+        if posts:
+            push_to_followers(author_id, posts)
+
+
+def schedule_restore(author_ids):
+    run_later(
+        'fan-out', settings.TIMELINE_WORKERS, restore_authors, author_ids
+    )
+
+
+def remove_post(post_id):
+    TimelineEntry.objects.filter(post_id=post_id).delete()
+
+
+def move_posts(post_ids, group_id):
+    TimelineEntry.objects.filter(post_id__in=post_ids).update(
+        group_id=group_id
+    )
+
+
+def move_post(post_id, group_id):
+    move_posts([post_id], group_id)
+
+
+def backfill(user_id, author_ids):
+    """Кладёт в ленту последние TIMELINE_BACKFILL постов новых авторов."""
+    celebrities = celebrity_ids()
+    author_ids = [pk for pk in author_ids if pk not in celebrities]
+    with timed('backfill'):
+        for author_id in author_ids:
+            TimelineEntry.objects.bulk_create(
+                entries(recent_posts(author_id), [user_id]),
+                ignore_conflicts=True,
+            )
+
+
+def unfollow_authors(user_id, author_ids):
+    TimelineEntry.objects.filter(
+        user_id=user_id, author_id__in=author_ids
+    ).delete()
+
+
+class TimelineSource(KeysetSource):
+    """Лента читателя из TimelineEntry, порциями по batch постов."""
+
+    def __init__(self, queryset, user_id, batch):
+        super().__init__(queryset, None, batch)
+        self.user_id = user_id
+
+    def fetch(self):
+        """Читает порции, пока не найдёт посты или записи не кончатся.
+
+        Записи удалённых постов и постов, не найденных в шарде,
+        пропускаются; пустая порция не значит, что лента кончилась.
+        """
+        with timed('timeline_fetch'):
+            while not self.rows and not self.exhausted:
+                self.fetch_batch()
+
+    def fetch_batch(self):
+        timeline = TimelineEntry.objects.filter(user_id=self.user_id)
+        if self.last is not None:
+            created, post_id = self.last
+            timeline = timeline.filter(created__lte=created).exclude(
+                created=created, post_id__gte=post_id
+            )
+        keys = list(timeline.order_by(
+            '-created', '-post_id'
+        ).values_list('created', 'post_id')[:self.batch])
+        self.exhausted = len(keys) < self.batch
+        if keys:
+            self.last = keys[-1]
+        self.rows.extend(load_posts(self.queryset, [pk for _, pk in keys]))
+
+
+class PulledSource(KeysetSource):
+    """Посты знаменитости или группы, читаемые при показе ленты."""
+
+    def fetch(self):
+        with timed('pull_fetch'):
+            super().fetch()
+
+
+class TimelineFeed(PersonalFeed):
+    """Лента подписок: разложенные посты плюс знаменитости и группы.
+
+    Посты обычных авторов читаются из TimelineEntry одним источником,
+    а знаменитости и группы из подписок, как в PersonalFeed, вливаются
+    отдельными источниками при чтении. Порог раскладки задаёт
+    TIMELINE_FANOUT_THRESHOLD: 0 — всё читается при показе, очень
+    большой порог — всё раскладывается при записи.
+    """
+
+    def __init__(self, queryset, user_id, author_ids, group_ids):
+        super().__init__(queryset, author_ids, group_ids)
+        self.user_id = user_id
+
+    @cached_property
+    def pulled_ids(self):
+        celebrities = celebrity_ids()
+        return [pk for pk in self.author_ids if pk in celebrities]
+
+    def count(self):
+        """Записи ленты плюс посты знаменитостей и групп.
+
+        Записи, которые придут и из подмешиваемых источников, — посты
+        в группах из подписок и старые посты ставших знаменитыми
+        авторов — не считаются дважды.
+        """
+        pushed = TimelineEntry.objects.filter(user_id=self.user_id).exclude(
+            Q(group_id__in=self.group_ids) | Q(author_id__in=self.pulled_ids)
+        )
+        pulled = personal_querysets(
+            self.queryset, self.pulled_ids, self.group_ids
+        )
+        return pushed.count() + sum(queryset.count() for queryset in pulled)
+
+    def sources(self, batch):
+        with timed('sources'):
+            timeline = TimelineSource(self.queryset, self.user_id, batch)
+            timeline.fetch()
+            sources = personal_sources(
+                self.queryset, self.pulled_ids, self.group_ids, batch,
+                source_class=PulledSource,
+            )
+        if timeline.rows:
+            timeline.head = timeline.rows[0].created
+            sources.append(timeline)
+        return sources
+
+    def __getitem__(self, index):
+        with timed('page'):
+            return super().__getitem__(index)
@@ -0,0 +1,97 @@
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import F
+from django.utils import timezone
+
+from core.counters import BufferedCounter
+from core.db import atomic_write
+from core.versioning import make_key
+
+from .models import Post
+from .sharding import post_shard, shard_querysets
+
+
+def counter_key(post_id):
+    """Ключ счётчика: шард, имя его базы и id поста.
+
+    Имя базы не даёт сбросить просмотры в другую базу с тем же
+    псевдонимом — например, при выходе после тестов.
+    """
+    alias = post_shard(post_id) or DEFAULT_DB_ALIAS
+    return alias, connections[alias].settings_dict['NAME'], post_id
+
+
+def write_views(deltas):
+    """Прибавляет просмотры: транзакция на шард, UPDATE на приращение.
+
+    Большинство постов набирает за интервал одинаково мало просмотров,
+    поэтому посты с равным приращением обновляются одним запросом.
+    """
+    by_shard = defaultdict(lambda: defaultdict(list))
+    for (alias, name, post_id), delta in deltas.items():
+        if connections[alias].settings_dict['NAME'] == name:
+            by_shard[alias][delta].append(post_id)
+    for alias, by_delta in by_shard.items():
+        posts = Post.objects.using(alias)
+        with atomic_write(using=alias):
+            for delta, post_ids in by_delta.items():
+                posts.filter(pk__in=post_ids).update(
+                    views=F('views') + delta
+                )
+
+
+post_views = BufferedCounter(write_views)
+
+
+def view_post(post_id):
+    """Засчитывает просмотр и возвращает число просмотров поста."""
+    key = counter_key(post_id)
+    post_views.incr(key)
+    views = Post.objects.using(post_shard(post_id)).filter(
+        pk=post_id
+    ).values_list('views', flat=True).first() or 0
+    return views + post_views.pending(key)
+
+
+def score(views, created, now):
+    """Просмотры, затухающие со временем: views / (часы + 2) ** g."""
+    hours = (now - created).total_seconds() / 3600
+    return views / (hours + 2) ** settings.TRENDING_GRAVITY
+
+
+def rank(now=None):
+    """id популярных постов за TRENDING_WINDOW_HOURS.
+
+    С каждого шарда берутся TRENDING_CANDIDATES самых просматриваемых
+    свежих постов, из них по затухающей оценке выбираются TRENDING_SIZE.
+    """
+    now = now or timezone.now()
+    recent = Post.objects.filter(
+        created__gte=now - timedelta(hours=settings.TRENDING_WINDOW_HOURS),
+        views__gt=0,
+    )
+    candidates = []
+    for queryset in shard_querysets(recent):
+        candidates += queryset.order_by('-views').values_list(
+            'pk', 'views', 'created'
+        )[:settings.TRENDING_CANDIDATES]
+    best = heapq.nlargest(
+        settings.TRENDING_SIZE, candidates,
+        key=lambda row: score(row[1], row[2], now),
+    )
+    return [pk for pk, _, _ in best]
+
+
+def trending_ids():
+    """Популярные посты, пересчитываемые раз в TRENDING_TIMEOUT секунд."""
+    key = make_key('trending')
+    ids = cache.get(key)
+    if ids is None:
+        ids = rank()
+        cache.set(key, ids, settings.TRENDING_TIMEOUT)
+    return ids
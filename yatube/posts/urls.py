@@ -6,15 +6,50 @@ app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('updates/', views.index_delta, name='index_delta'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path(
+        'group/<slug:slug>/updates/', views.group_delta, name='group_delta'
+    ),
+    path(
+        'group/<slug:slug>/follow/', views.group_follow, name='group_follow'
+    ),
+    path(
+        'group/<slug:slug>/unfollow/',
+        views.group_unfollow,
+        name='group_unfollow'
+    ),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path(
+        'profile/<str:username>/updates/',
+        views.profile_delta,
+        name='profile_delta'
+    ),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path(
         'posts/<int:post_id>/comment/', views.add_comment, name='add_comment'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.comment_threads,
+        name='comment_threads'
+    ),
+    path(
+        'posts/<int:post_id>/comments/<int:comment_id>/replies/',
+        views.comment_replies,
+        name='comment_replies'
+    ),
+    path('posts/<int:post_id>/like/', views.post_like, name='post_like'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/updates/', views.follow_delta, name='follow_delta'),
+    path('follow/metrics/', views.timeline_stats, name='timeline_stats'),
+    path(
+        'follow/suggestions/',
+        views.follow_suggestions,
+        name='follow_suggestions'
+    ),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
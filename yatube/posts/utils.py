@@ -1,8 +1,107 @@
+import json
+
+from django.conf import settings
+from django.core.cache import cache
 from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+from core.routers import replica_fresh
+from core.versioning import get_versions, make_key, versions_shared
+
+
+def estimate_count(queryset):
+    """Оценивает количество строк по статистике СУБД.
+
+    Возвращает None, если оценка недоступна: для SQLite и MySQL оценивается
+    только вся таблица целиком, PostgreSQL берёт оценку планировщика.
+    """
+    if not isinstance(queryset, QuerySet):
+        return None
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    try:
+        if connection.vendor == 'postgresql':
+            plan = json.loads(queryset.order_by().explain(format='json'))
+            return int(plan[0]['Plan']['Plan Rows'])
+        if queryset.query.where:
+            return None
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+                )
+                if cursor.fetchone() is None:
+                    return None
+                cursor.execute(
+                    'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                    [table]
+                )
+                row = cursor.fetchone()
+                return int(row[0].split()[0]) if row else None
+            if connection.vendor == 'mysql':
+                cursor.execute(
+                    'SELECT table_rows FROM information_schema.tables '
+                    'WHERE table_schema = DATABASE() AND table_name = %s',
+                    [table]
+                )
+                row = cursor.fetchone()
+                return int(row[0]) if row and row[0] is not None else None
+    except DatabaseError:
+        return None
+    return None
+
+
+def count_timeout():
+    if versions_shared():
+        return settings.PAGINATOR_COUNT_TIMEOUT
+    return settings.PAGINATOR_LOCAL_COUNT_TIMEOUT
+
+
+class CachedCountPaginator(Paginator):
+    """Пагинатор с кешируемым количеством объектов.
+
+    Для выборок больше PAGINATOR_ESTIMATE_THRESHOLD используется оценка
+    СУБД. Если переданы области scopes, количество хранится в кеше под
+    ключом, зависящим от их версий, и сбрасывается сигналами моделей.
+    Если версии живут в кеше процесса, изменения из других процессов их
+    не сдвигают, и количество хранится лишь PAGINATOR_LOCAL_COUNT_TIMEOUT.
+    Количество, посчитанное внутри незавершённой транзакции или по
+    отстающей реплике, не кешируется.
+    """
+
+    def __init__(self, *args, scopes=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.scopes = scopes
+
+    @property
+    def db(self):
+        return getattr(self.object_list, 'db', 'default')
+
+    def estimate_or_count(self):
+        count = estimate_count(self.object_list)
+        if count is None or count < settings.PAGINATOR_ESTIMATE_THRESHOLD:
+            count = super().count
+        return count
+
+    @cached_property
+    def count(self):
+        if not self.scopes:
+            return self.estimate_or_count()
+        key = make_key('count', *self.scopes)
+        count = cache.get(key)
+        if count is None:
+            count = self.estimate_or_count()
+            if not connections[self.db].in_atomic_block and replica_fresh(
+                get_versions(*self.scopes).values()
+            ):
+                cache.set(key, count, count_timeout())
+        return count
 
 
-def paginate(request, obj, amount):
-    paginator = Paginator(obj, amount)
+def paginate(request, obj, amount, scopes=None):
+    paginator = CachedCountPaginator(obj, amount, scopes=scopes)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
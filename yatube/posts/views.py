@@ -1,34 +1,99 @@
 from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import require_GET, require_http_methods
 
+from core.pagecache import cache_page_with_holes, conditional_page
+from core.versioning import get_versions, versions_shared
+from core.writequeue import execute_write
+
+from .comments import subtree, threads
+from .feeds import (decode_cursor, encode_cursor, newer_keys, newest_key,
+                    timestamp_us)
+from .follows import follow, follow_group, unfollow, unfollow_group
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post
+from .graph import follow_graph
+from .likes import set_like
+from .models import Comment, Group, Post
+from .personal import personal_querysets
+from .sharding import post_shard, shard_querysets, sharded, with_relations
+from .suggestions import suggestions_for
+from .timeline import TimelineFeed, timeline_metrics
 from .utils import paginate
 
 User = get_user_model()
 
+INDEX_FRAGMENT_TIMEOUT = 20
+
+
+def index_scopes():
+    return ('posts', 'groups')
+
+
+def group_scopes(slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    if group_id is None:
+        return None
+    return (f'group:{group_id}',)
+
+
+def profile_scopes(username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    if author_id is None:
+        return None
+    return ('groups', f'author:{author_id}', f'user:{author_id}')
+
+
+def post_detail_scopes(post_id):
+    author_id = Post.objects.using(post_shard(post_id)).filter(
+        pk=post_id).values_list('author_id', flat=True).first()
+    if author_id is None:
+        return None
+    return (
+        'groups', f'post:{post_id}', f'author:{author_id}',
+        f'user:{author_id}'
+    )
+
+
+def comment_scopes(post_id, comment_id=None):
+    return (f'post:{post_id}',)
+
+
+def followed_group_ids(user):
+    return list(user.group_follows.values_list('group_id', flat=True))
 
+
+@conditional_page(index_scopes, max_age=INDEX_FRAGMENT_TIMEOUT)
+@cache_page_with_holes(index_scopes, max_age=INDEX_FRAGMENT_TIMEOUT)
 def index(request):
     template = 'posts/index.html'
-    posts = (
-        Post.objects.select_related('author', 'group')
+    posts = sharded(with_relations(Post.objects.all(), 'author', 'group'))
+    page_obj = paginate(
+        request, posts, settings.AMOUNT_POSTS, scopes=('posts',)
     )
-    page_obj = paginate(request, posts, settings.AMOUNT_POSTS)
     context = {
         'page_obj': page_obj,
+        'fragment_timeout': INDEX_FRAGMENT_TIMEOUT,
     }
     return render(request, template, context)
 
 
+@conditional_page(group_scopes)
+@cache_page_with_holes(group_scopes)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = (
-        group.posts.select_related('author', 'group')
+    posts = sharded(
+        with_relations(Post.objects.filter(group=group), 'author', 'group')
+    )
+    page_obj = paginate(
+        request, posts, settings.AMOUNT_POSTS, scopes=(f'group:{group.pk}',)
     )
-    page_obj = paginate(request, posts, settings.AMOUNT_POSTS)
     context = {
         'page_obj': page_obj,
         'group': group,
@@ -36,13 +101,17 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@conditional_page(profile_scopes)
+@cache_page_with_holes(profile_scopes)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
     template = 'posts/profile.html'
-    posts = author.posts.select_related('author', 'group')
-    page_obj = paginate(request, posts, settings.AMOUNT_POSTS)
-    following = request.user.is_authenticated and author.following.filter(
-        user=request.user).exists()
+    posts = with_relations(author.posts.all(), 'author', 'group')
+    page_obj = paginate(
+        request, posts, settings.AMOUNT_POSTS, scopes=(f'author:{author.pk}',)
+    )
+    following = request.user.is_authenticated and follow_graph.is_following(
+        request.user.pk, author.pk)
     context = {
         'page_obj': page_obj,
         'author': author,
@@ -51,19 +120,49 @@ def profile(request, username):
     return render(request, template, context)
 
 
+# Без conditional_page: каждый запрос считает просмотр в дырке post_views,
+# и ответ 304 оставил бы его неучтённым.
+@cache_page_with_holes(post_detail_scopes)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.using(post_shard(post_id)), pk=post_id
+    )
     form = CommentForm()
-    comments = post.comments.select_related('author', 'post')
+    comments, after = threads(post.pk)
     context = {
         'post': post,
         'form': form,
         'comments': comments,
+        'after': after,
     }
     return render(request, template, context)
 
 
+@require_GET
+@conditional_page(comment_scopes)
+def comment_threads(request, post_id):
+    """Фрагмент со следующей порцией обсуждений после пути ?after=."""
+    get_object_or_404(
+        Post.objects.using(post_shard(post_id)).only('pk'), pk=post_id
+    )
+    comments, after = threads(post_id, after=request.GET.get('after'))
+    context = {'post_id': post_id, 'comments': comments, 'after': after}
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
+@require_GET
+@conditional_page(comment_scopes)
+def comment_replies(request, post_id, comment_id):
+    """Фрагмент с ответами на комментарий для подгрузки глубоких веток."""
+    comment = get_object_or_404(
+        Comment.objects.using(post_shard(post_id)),
+        pk=comment_id, post_id=post_id,
+    )
+    context = {'post_id': post_id, 'comments': subtree(comment)}
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
 @login_required
 def post_create(request):
     template = 'posts/create_post.html'
@@ -75,7 +174,7 @@ def post_create(request):
         if form.is_valid():
             post = form.save(commit=False)
             post.author = request.user
-            post.save()
+            execute_write(post.save)
             return redirect('posts:profile', request.user)
         return render(request, template, {'form': form})
     form = PostForm()
@@ -85,7 +184,9 @@ def post_create(request):
 @login_required
 def post_edit(request, post_id):
     template = 'posts/create_post.html'
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.using(post_shard(post_id)), pk=post_id
+    )
     if request.user != post.author:
         return redirect('posts:post_detail', post.pk)
     if request.method == "POST":
@@ -95,7 +196,7 @@ def post_edit(request, post_id):
             instance=post
         )
         if form.is_valid():
-            post.save()
+            execute_write(post.save)
             return redirect('posts:post_detail', post.pk)
         return render(request, template, {'form': form})
     form = PostForm(
@@ -112,21 +213,64 @@ def post_edit(request, post_id):
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    """Сохраняет комментарий или ответ и возвращает на страницу поста.
+
+    AJAX-запрос получает только HTML нового комментария со статусом 201
+    или ошибки формы в JSON со статусом 400.
+    """
+    post = get_object_or_404(
+        Post.objects.using(post_shard(post_id)).only('author'), pk=post_id
+    )
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        parent_id = request.POST.get('parent')
+        if parent_id:
+            comment.parent = get_object_or_404(
+                Comment.objects.using(post_shard(post_id)),
+                pk=parent_id if parent_id.isdigit() else 0, post_id=post_id,
+            )
+        execute_write(comment.save)
+        if request.is_ajax():
+            return render(
+                request, 'posts/includes/comment.html',
+                {'comment': comment}, status=201,
+            )
+    elif request.is_ajax():
+        return JsonResponse({'errors': form.errors}, status=400)
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@login_required
+@require_http_methods(['POST', 'DELETE'])
+def post_like(request, post_id):
+    """POST ставит отметку, DELETE снимает; ответ в JSON, без перехода."""
+    post = get_object_or_404(
+        Post.objects.using(post_shard(post_id)).only('pk'), pk=post_id
+    )
+    liked, likes = execute_write(
+        set_like, request.user.pk, post.pk, request.method == 'POST'
+    )
+    return JsonResponse({'liked': liked, 'likes': likes})
+
+
 @login_required
 def follow_index(request):
     template = 'posts/follow.html'
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginate(request, posts, settings.AMOUNT_POSTS)
+    posts = TimelineFeed(
+        with_relations(Post.objects.all(), 'author', 'group'),
+        request.user.pk,
+        follow_graph.following_ids(request.user.pk),
+        followed_group_ids(request.user),
+    )
+    page_obj = paginate(
+        request,
+        posts,
+        settings.AMOUNT_POSTS,
+        scopes=('posts', f'follows:{request.user.pk}')
+    )
     context = {
         'page_obj': page_obj,
     }
@@ -135,25 +279,115 @@ def follow_index(request):
 
 @login_required
 def profile_follow(request, username):
-    user = request.user
     author = get_object_or_404(User, username=username)
-    follower = Follow.objects.filter(
-        user=user, author=author
-    )
-    if user != author and not follower.exists():
-        Follow.objects.get_or_create(
-            user=user,
-            author=author,
-        )
+    execute_write(follow, request.user.pk, author.pk)
     return redirect('posts:profile', username)
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    follower = Follow.objects.filter(
-        user=request.user, author=author
-    )
-    if follower.exists():
-        follower.delete()
+    execute_write(unfollow, request.user.pk, author.pk)
     return redirect('posts:profile', username)
+
+
+@login_required
+def group_follow(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    execute_write(follow_group, request.user.pk, group.pk)
+    return redirect('posts:group_list', slug)
+
+
+@login_required
+def group_unfollow(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    execute_write(unfollow_group, request.user.pk, group.pk)
+    return redirect('posts:group_list', slug)
+
+
+@staff_member_required
+def timeline_stats(request):
+    """Метрики ленты процесса: раскладка, чтение ленты и подмешивание."""
+    return JsonResponse(timeline_metrics.snapshot())
+
+
+@login_required
+def follow_suggestions(request):
+    """Блок «кого почитать» для боковой панели профиля."""
+    return render(request, 'posts/includes/follow_suggestions.html', {
+        'authors': suggestions_for(request.user.pk),
+    })
+
+
+def posts_delta(request, querysets, scopes):
+    """Отвечает id постов ленты, появившихся после курсора after.
+
+    Без курсора отдаёт курсор самого нового поста. Если версии общие
+    для всех процессов и ни одна из областей ленты не менялась после
+    времени курсора, отвечает 204, не обращаясь к базе; иначе читает
+    только (created, id) по индексу.
+    """
+    cursor = request.GET.get('after')
+    if not cursor:
+        key = newest_key(querysets)
+        return delta_response(encode_cursor(*key) if key else None, [])
+    try:
+        created, pk = decode_cursor(cursor)
+    except ValueError:
+        return HttpResponseBadRequest()
+    if versions_shared() and (
+        max(get_versions(*scopes).values()) <= timestamp_us(created)
+    ):
+        return HttpResponse(status=204)
+    limit = settings.DELTA_LIMIT
+    keys = newer_keys(querysets, created, pk, limit + 1)
+    if not keys:
+        return HttpResponse(status=204)
+    more = len(keys) > limit
+    keys = keys[:limit]
+    return delta_response(
+        encode_cursor(*keys[-1]), [pk for _, pk in keys], more
+    )
+
+
+def delta_response(cursor, ids, more=False):
+    return JsonResponse(
+        {'cursor': cursor, 'ids': ids, 'more': more},
+        json_dumps_params={'separators': (',', ':')},
+    )
+
+
+@require_GET
+def index_delta(request):
+    return posts_delta(
+        request, shard_querysets(Post.objects.all()), ('posts',)
+    )
+
+
+@require_GET
+def group_delta(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return posts_delta(
+        request,
+        shard_querysets(Post.objects.filter(group=group)),
+        (f'group:{group.pk}',),
+    )
+
+
+@require_GET
+def profile_delta(request, username):
+    author = get_object_or_404(User, username=username)
+    return posts_delta(
+        request, [author.posts.all()], (f'author:{author.pk}',)
+    )
+
+
+@login_required
+@require_GET
+def follow_delta(request):
+    querysets = personal_querysets(
+        Post.objects.all(),
+        follow_graph.following_ids(request.user.pk),
+        followed_group_ids(request.user),
+    )
+    return posts_delta(request, querysets, ('posts',))
@@ -0,0 +1,20 @@
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+django_application = get_wsgi_application()
+
+from core.asgi import GuestPageCache, PathRouter, PooledWsgiToAsgi  # noqa
+from core.counters import start_flushing  # noqa: E402
+from posts.live import live_posts  # noqa: E402
+from posts.timeline import resume_fan_outs  # noqa: E402
+
+start_flushing()
+resume_fan_outs()
+
+application = PathRouter(
+    {'/live/posts/': live_posts},
+    default=GuestPageCache(PooledWsgiToAsgi(django_application)),
+)
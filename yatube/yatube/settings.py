@@ -30,6 +30,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
     'debug_toolbar',
 ]
@@ -40,6 +41,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaPinningMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
@@ -69,11 +71,66 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'PRAGMAS': {
+            'busy_timeout': 5000,
+        },
     }
 }
 
+"""Количество реплик SQLite, которые копирует команда copy_replicas."""
+REPLICAS_COUNT = int(os.getenv('DATABASE_REPLICAS', default=0))
+
+REPLICA_DATABASES = [f'replica_{number}' for number in range(REPLICAS_COUNT)]
+
+for replica in REPLICA_DATABASES:
+    DATABASES[replica] = {
+        **DATABASES['default'],
+        'NAME': os.path.join(BASE_DIR, f'db_{replica}.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+"""Количество шардов для постов и комментариев, 0 — без шардирования."""
+POSTS_SHARDS_COUNT = int(os.getenv('POSTS_SHARDS', default=0))
+
+SHARD_DATABASES = [f'shard_{number}' for number in range(POSTS_SHARDS_COUNT)]
+
+"""Внешние ключи постов на пользователей и группы: только без шардов."""
+POSTS_FOREIGN_KEYS = not SHARD_DATABASES
+
+for shard in SHARD_DATABASES:
+    DATABASES[shard] = {
+        **DATABASES['default'],
+        'NAME': os.path.join(BASE_DIR, f'db_{shard}.sqlite3'),
+    }
+
+DATABASE_ROUTERS = [
+    'posts.routers.AuthorShardRouter',
+    'core.routers.PrimaryReplicaRouter',
+]
+
+"""Представления, которые читают из реплик."""
+REPLICA_READ_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:follow_index',
+)
+
+"""Приложения, модели которых читаются из реплик.
+
+Сессии и пользователи всегда читаются из основной базы: отставшая
+реплика без свежей сессии разлогинила бы пользователя.
+"""
+REPLICA_READ_APPS = ('posts',)
+
+"""Сколько секунд после записи пользователь читает из основной базы."""
+REPLICA_PIN_SECONDS = 10
+
+REPLICA_PIN_COOKIE = 'pin_primary'
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -104,6 +161,133 @@ STATIC_URL = '/static/'
 """Константа определяет кол-во отображаемых постов, используется в viwes.py."""
 AMOUNT_POSTS = 10
 
+"""Время хранения в кеше количества постов для пагинатора, в секундах."""
+PAGINATOR_COUNT_TIMEOUT = 60 * 60
+
+"""То же при версиях в кеше процесса, где чужие изменения не видны."""
+PAGINATOR_LOCAL_COUNT_TIMEOUT = 10
+
+"""Начиная с какого количества строк пагинатор доверяет оценке СУБД."""
+PAGINATOR_ESTIMATE_THRESHOLD = 100_000
+
+"""Время хранения готового HTML карточек постов в кеше, в секундах."""
+POST_CARD_TIMEOUT = 60 * 60 * 24
+
+"""Размер пула потоков ASGI-развёртывания для Django, ORM и кеша."""
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', default=8))
+
+"""Через сколько секунд тишины поток живой ленты шлёт keepalive."""
+LIVE_KEEPALIVE_SECONDS = 15
+
+"""Сколько секунд long polling ждёт новых постов."""
+LIVE_POLL_TIMEOUT = 25
+
+"""Сколько последних событий живой ленты хранится для переподключений."""
+LIVE_HISTORY_SIZE = 1000
+
+"""Сколько id новых постов отдаёт за раз эндпоинт обновлений ленты."""
+DELTA_LIMIT = 100
+
+"""Сколько постов за запрос читает один источник личной ленты."""
+FEED_SOURCE_BATCH = 10
+
+"""С какого числа подписчиков посты автора не раскладываются по лентам,
+а подмешиваются при чтении."""
+TIMELINE_FANOUT_THRESHOLD = 10000
+
+"""Сколько секунд кешируется список таких авторов."""
+TIMELINE_CELEBRITY_TIMEOUT = 60
+
+"""Сколько последних постов автора попадает в ленту при подписке."""
+TIMELINE_BACKFILL = 50
+
+"""Сколько записей ленты вставляется одним пакетом фоновой раскладки."""
+TIMELINE_BATCH_SIZE = 1000
+
+"""Количество потоков раскладки постов по лентам."""
+TIMELINE_WORKERS = 2
+
+"""Раз во сколько секунд счётчики просмотров сбрасываются в базу."""
+COUNTER_FLUSH_SECONDS = 5
+
+"""За сколько последних часов посты попадают в популярное."""
+TRENDING_WINDOW_HOURS = 48
+
+"""Насколько быстро со временем затухают просмотры в популярном."""
+TRENDING_GRAVITY = 1.5
+
+"""Сколько самых просматриваемых постов шарда оценивается."""
+TRENDING_CANDIDATES = 1000
+
+"""Сколько постов в популярном."""
+TRENDING_SIZE = 20
+
+"""Сколько секунд популярное не пересчитывается."""
+TRENDING_TIMEOUT = 60
+
+"""На сколько строк делится счётчик отметок поста."""
+LIKE_COUNTER_SLOTS = 8
+
+"""Сколько секунд число отметок поста хранится в кеше."""
+LIKE_COUNT_TIMEOUT = 60 * 60
+
+"""Сколько обсуждений показывается на странице поста за раз."""
+COMMENT_THREADS = 20
+
+"""Сколько первых ответов показывается под каждым обсуждением."""
+COMMENT_REPLIES_SHOWN = 3
+
+"""Сколько уровней ответов подгружает фрагмент ответов за раз."""
+COMMENT_FRAGMENT_DEPTH = 3
+
+"""Наибольший уровень вложенности ответов."""
+COMMENT_MAX_DEPTH = 8
+
+"""Размер страницы JSON API по умолчанию."""
+API_PAGE_SIZE = 20
+
+"""Наибольший размер страницы JSON API, который можно запросить limit=."""
+API_MAX_LIMIT = 1000
+
+"""Наибольшее число подзапросов в одном пакетном запросе к API."""
+API_BATCH_LIMIT = 20
+
+"""Страницы JSON API больше этого числа строк отдаются потоком."""
+API_STREAM_FROM = 100
+
+"""Сколько рекомендаций подписок хранить на пользователя."""
+FOLLOW_SUGGESTIONS_TOP = 10
+
+"""Сколько рекомендаций подписок показывать в профиле."""
+FOLLOW_SUGGESTIONS_SHOWN = 5
+
+"""Прибавка к оценке рекомендации за каждую общую с автором группу."""
+FOLLOW_SUGGESTIONS_GROUP_WEIGHT = 0.5
+
+"""По сколько id пользователей считать рекомендации за проход."""
+FOLLOW_SUGGESTIONS_CHUNK = 10000
+
+"""Время хранения страниц в кеше страниц, в секундах, 0 — кеш выключен."""
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', default=0))
+
+"""Размер пакета для массовых действий в админке."""
+BULK_ACTION_BATCH_SIZE = 500
+
+"""Количество потоков для фоновых задач."""
+BACKGROUND_JOBS_WORKERS = 1
+
+"""Выполнять фоновые задачи сразу в текущем потоке (для тестов)."""
+BACKGROUND_JOBS_EAGER = False
+
+"""Выполнять записи из представлений через единый поток-писатель."""
+WRITE_QUEUE_ENABLED = os.getenv('WRITE_QUEUE_ENABLED', default='0') == '1'
+
+"""Сколько записей писатель объединяет в одну транзакцию."""
+WRITE_QUEUE_BATCH_SIZE = 50
+
+"""Сколько секунд представление ждёт результата записи."""
+WRITE_QUEUE_TIMEOUT = 30
+
 """Константа является множителем для символов, используется в тестах."""
 SYMBOL_MULTIPLIER = 100
 
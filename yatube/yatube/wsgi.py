@@ -5,3 +5,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+from core.counters import start_flushing  # noqa: E402
+from posts.timeline import resume_fan_outs  # noqa: E402
+
+start_flushing()
+resume_fan_outs()